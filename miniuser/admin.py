@@ -4,16 +4,71 @@
 This file provides all specific classes and functions, that are used in Django's
 admin backend."""
 
+# Python imports
+import base64
+import json
+
 # Django imports
 from django.conf import settings
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.admin.options import IncorrectLookupParameters
 from django.contrib.admin.templatetags.admin_list import _boolean_icon
-from django.utils.html import format_html
-from django.utils.translation import ugettext_lazy as _
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import (
+    FieldDoesNotExist, PermissionDenied, ValidationError,
+)
+from django.core.paginator import InvalidPage
+from django.core.signals import setting_changed
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+from django.utils.translation import ugettext_lazy as _, ungettext
 
 # app imports
+from . import counts, jobs, search
+from .export import iter_csv, iter_values
 from .models import MiniUser
 
+STATUS_MARKUP = {}
+"""The markup of the status columns, see get_status_markup()"""
+
+
+def get_status_markup():
+    """Returns the parts of the status columns, that do not depend on the user
+
+    These parts only depend on the app's settings and the static files, so they
+    are rendered once and reused for every row of the list view."""
+
+    if not STATUS_MARKUP:
+        STATUS_MARKUP.update({
+            'color': {
+                'superuser': format_html(
+                    '<span style="color: {};">', settings.MINIUSER_ADMIN_STATUS_COLOR_SUPERUSER),
+                'staff': format_html('<span style="color: {};">', settings.MINIUSER_ADMIN_STATUS_COLOR_STAFF),
+            },
+            'character': {
+                'superuser': '[{}] '.format(settings.MINIUSER_ADMIN_STATUS_CHAR_SUPERUSER),
+                'staff': '[{}] '.format(settings.MINIUSER_ADMIN_STATUS_CHAR_STAFF),
+            },
+            'verified': {
+                True: _boolean_icon(True) + mark_safe(' '),
+                False: _boolean_icon(False) + mark_safe(' '),
+            },
+        })
+
+    return STATUS_MARKUP
+
+
+def reset_status_markup(**kwargs):
+    """Discards the rendered markup, if the settings are changed (i.e. in tests)"""
+    STATUS_MARKUP.clear()
+
+
+setting_changed.connect(reset_status_markup, dispatch_uid='miniuser_reset_status_markup')
+
 
 class MiniUserAdminStaffStatusFilter(admin.SimpleListFilter):
     """Custom SimpleListFilter to filter on user's status"""
@@ -51,6 +106,204 @@ class MiniUserAdminStaffStatusFilter(admin.SimpleListFilter):
         return queryset
 
 
+# the parameters in the URL, that hold the cursors of the keyset pagination
+CURSOR_AFTER_VAR = 'after'
+CURSOR_BEFORE_VAR = 'before'
+
+
+class MiniUserChangeList(ChangeList):
+    """Custom ChangeList, that provides the keyset pagination
+
+    Django's admin paginates with OFFSET, so the database has to skip all rows
+    of the previous pages, which gets slower with every page. If
+    MINIUSER_ADMIN_KEYSET_PAGINATION is enabled, pages are determined by the
+    values of the ordering fields of the last (or first) row of the previous
+    page instead. These values are passed as cursor in the URL and every page
+    is retrieved by a seek on the indexes of the ordering (see MiniUser.Meta),
+    just as cheap as the first page.
+
+    The keyset pagination is only applied to the default ordering; if the list
+    is sorted by a column, the default pagination is used."""
+
+    @property
+    def keyset_pagination(self):
+        """The keyset pagination is applied with the default ordering only"""
+        return settings.MINIUSER_ADMIN_KEYSET_PAGINATION and ORDER_VAR not in self.params and not self.show_all
+
+    def get_queryset(self, request):
+        """Loads only the fields, that are required to render the list view
+
+        This includes the fields of the keyset, that are read from the first
+        and last row of the page."""
+
+        queryset = super(MiniUserChangeList, self).get_queryset(request)
+        columns = list(self.list_display) + [field.lstrip('-') for field in self.get_keyset()]
+
+        return queryset.only(*self.model_admin.get_model_fields(columns, self.model_admin.list_display_fields))
+
+    def get_filters_params(self, params=None):
+        """Removes the cursors from the parameters, that are used as lookups"""
+
+        lookup_params = super(MiniUserChangeList, self).get_filters_params(params)
+        for var in (CURSOR_AFTER_VAR, CURSOR_BEFORE_VAR):
+            lookup_params.pop(var, None)
+
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        """Removes the cursors from all links, that do not provide a new one
+
+        Changing filters or the ordering starts at the first page."""
+
+        new_params = new_params or {}
+        remove = list(remove or [])
+        remove.extend(var for var in (CURSOR_AFTER_VAR, CURSOR_BEFORE_VAR) if var not in new_params)
+
+        return super(MiniUserChangeList, self).get_query_string(new_params, remove)
+
+    def get_keyset(self):
+        """Returns the ordering, that is used as seek key (unique, by appending the pk)"""
+        return list(self.model_admin.ordering) + ['-pk']
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, field.lstrip('-')) for field in self.get_keyset()]
+        return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, cursor):
+        """Returns the values of the keyset, that are provided by cursor
+
+        The cursor is provided by the user, so every value is converted by its
+        field. Malformed cursors raise IncorrectLookupParameters, just like
+        invalid filters."""
+
+        keyset = self.get_keyset()
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError):
+            raise IncorrectLookupParameters
+        if not isinstance(values, list) or len(values) != len(keyset):
+            raise IncorrectLookupParameters
+
+        result = []
+        for name, value in zip(keyset, values):
+            name = name.lstrip('-')
+            field = self.model._meta.pk if name == 'pk' else self.model._meta.get_field(name)
+            try:
+                value = field.to_python(value)
+            except (ValidationError, ValueError, TypeError):
+                raise IncorrectLookupParameters
+            if value is None and not field.null:
+                raise IncorrectLookupParameters
+            result.append(value)
+
+        return result
+
+    def get_seek_filter(self, values, backwards=False):
+        """Returns the filter for the rows after (or before) the given values
+
+        For the keyset (a, -b, c), the rows after (x, y, z) are
+            a > x OR (a = x AND b < y) OR (a = x AND b = y AND c > z)
+        The first column is additionally bounded (a >= x), so the database can
+        start the index scan at the cursor."""
+
+        keyset = self.get_keyset()
+
+        seek = Q()
+        for i, field in enumerate(keyset):
+            lookup = 'lt' if field.startswith('-') != backwards else 'gt'
+            condition = Q(**{'{}__{}'.format(field.lstrip('-'), lookup): values[i]})
+            for previous, value in zip(keyset[:i], values[:i]):
+                condition &= Q(**{previous.lstrip('-'): value})
+            seek |= condition
+
+        lookup = 'lte' if keyset[0].startswith('-') != backwards else 'gte'
+        return Q(**{'{}__{}'.format(keyset[0].lstrip('-'), lookup): values[0]}) & seek
+
+    def get_results(self, request):
+        """Retrieves the counts and the objects of the current page
+
+        This replaces Django's implementation to apply MINIUSER_ADMIN_COUNT_MODE
+        (see counts.py) and the keyset pagination."""
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+
+        # Get the number of objects, with admin filters applied.
+        result_count = paginator.count = counts.count(self.queryset)
+
+        # Get the total number of objects, with no admin filters applied.
+        if not self.model_admin.show_full_result_count:
+            full_result_count = None
+        elif not (self.get_filters_params() or self.query):
+            full_result_count = result_count
+        else:
+            full_result_count = counts.count(self.root_queryset)
+
+        self.result_count = result_count
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        # Admin actions are shown if there is at least one entry
+        # or if entries are not counted because show_full_result_count is disabled
+        self.show_admin_actions = not self.show_full_result_count or bool(full_result_count)
+        self.full_result_count = full_result_count
+        self.paginator = paginator
+
+        if self.keyset_pagination:
+            self.get_keyset_results()
+            return
+
+        can_show_all = result_count <= self.list_max_show_all
+        multi_page = result_count > self.list_per_page
+
+        # Get the list of objects to display on this page.
+        if (self.show_all and can_show_all) or not multi_page:
+            result_list = self.queryset._clone()
+        else:
+            try:
+                result_list = paginator.page(self.page_num + 1).object_list
+            except InvalidPage:
+                raise IncorrectLookupParameters
+
+        self.result_list = result_list
+        self.can_show_all = can_show_all
+        self.multi_page = multi_page
+
+    def get_keyset_results(self):
+        """Retrieves the objects of the current page by a seek on the keyset"""
+
+        keyset = self.get_keyset()
+        after = self.params.get(CURSOR_AFTER_VAR)
+        before = self.params.get(CURSOR_BEFORE_VAR)
+
+        if before:
+            # fetch the previous page in reverse order
+            reverse_keyset = [field[1:] if field.startswith('-') else '-' + field for field in keyset]
+            result_list = list(
+                self.queryset.order_by(*reverse_keyset)
+                .filter(self.get_seek_filter(self.decode_cursor(before), backwards=True))[:self.list_per_page + 1]
+            )
+            has_previous = len(result_list) > self.list_per_page
+            result_list = result_list[:self.list_per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.queryset.order_by(*keyset)
+            if after:
+                queryset = queryset.filter(self.get_seek_filter(self.decode_cursor(after)))
+            result_list = list(queryset[:self.list_per_page + 1])
+            has_next = len(result_list) > self.list_per_page
+            result_list = result_list[:self.list_per_page]
+            has_previous = bool(after)
+
+        self.previous_page_url = None
+        self.next_page_url = None
+        if result_list and has_previous:
+            self.previous_page_url = self.get_query_string({CURSOR_BEFORE_VAR: self.encode_cursor(result_list[0])})
+        if result_list and has_next:
+            self.next_page_url = self.get_query_string({CURSOR_AFTER_VAR: self.encode_cursor(result_list[-1])})
+
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = has_previous or has_next
+
+
 @admin.register(MiniUser)
 class MiniUserAdmin(admin.ModelAdmin):
     """Represents MiniUser in Django's admin interface"""
@@ -98,7 +351,40 @@ class MiniUserAdmin(admin.ModelAdmin):
         setattr(settings, 'MINIUSER_ADMIN_SHOW_SEARCHBOX', False)  # pragma: nocover
 
     # admin actions (these will be accessible for bulk editing in list view)
-    actions = ['action_activate_user', 'action_deactivate_user']
+    actions = ['action_activate_user', 'action_deactivate_user', 'action_delete_users', 'action_export_csv']
+
+    # maps the enhanced fields of MINIUSER_ADMIN_LIST_DISPLAY to the database
+    #   fields, that are exported by action_export_csv()
+    export_fields = {
+        'username_color_status': ('username',),
+        'username_character_status': ('username',),
+        'email_with_status': ('email', 'email_is_verified'),
+        'status_aggregated': ('is_staff', 'is_superuser'),
+    }
+
+    # maps the enhanced fields of MINIUSER_ADMIN_LIST_DISPLAY to the database
+    #   fields, that are required to render them in the list view
+    list_display_fields = {
+        'username_color_status': ('username', 'is_staff', 'is_superuser'),
+        'username_character_status': ('username', 'is_staff', 'is_superuser'),
+        'email_with_status': ('email', 'email_is_verified'),
+        'status_aggregated': ('is_staff', 'is_superuser'),
+    }
+
+    def get_search_results(self, request, queryset, search_term):
+        """Applies the search strategy of MINIUSER_ADMIN_SEARCH_MODE (see search.py)"""
+
+        if search_term and settings.MINIUSER_ADMIN_SEARCH_MODE == 'prefix':
+            return search.prefix_search(queryset, search_term), False
+        if search_term and settings.MINIUSER_ADMIN_SEARCH_MODE == 'fts5':
+            return search.fts5_search(queryset, search_term), False
+
+        # 'default' and 'trigram' use Django's search
+        return super(MiniUserAdmin, self).get_search_results(request, queryset, search_term)
+
+    def get_changelist(self, request, **kwargs):
+        """Returns the custom ChangeList, that provides the keyset pagination"""
+        return MiniUserChangeList
 
     def get_actions(self, request):  # pragma: nocover
         """Override the default get_actions()-method to exclude delete objects
@@ -113,8 +399,31 @@ class MiniUserAdmin(admin.ModelAdmin):
 
         if 'delete_selected' in actions:
             del actions['delete_selected']
+        if 'action_delete_users' in actions and not self.has_delete_permission(request):
+            del actions['action_delete_users']
         return actions
 
+    def action_checkbox(self, obj):
+        """Returns the checkbox to select the user for actions (HTML)
+
+        Django renders a form widget (and its template) for every row, this
+        provides the same markup at a fraction of the costs."""
+
+        return format_html(
+            '<input type="checkbox" name="{}" value="{}" class="action-select">', ACTION_CHECKBOX_NAME, obj.pk
+        )
+    action_checkbox.short_description = admin.ModelAdmin.action_checkbox.short_description
+
+    @staticmethod
+    def get_status(obj):
+        """Returns the status of the user as key of get_status_markup()"""
+
+        if obj.is_superuser:
+            return 'superuser'
+        if obj.is_staff:
+            return 'staff'
+        return None
+
     def status_aggregated(self, obj):
         """Returns the status of the user"""
 
@@ -130,45 +439,80 @@ class MiniUserAdmin(admin.ModelAdmin):
     def username_color_status(self, obj):
         """Returns a colored username according to his status (HTML)"""
 
-        if obj.is_superuser:
-            color = settings.MINIUSER_ADMIN_STATUS_COLOR_SUPERUSER
-        elif obj.is_staff:
-            color = settings.MINIUSER_ADMIN_STATUS_COLOR_STAFF
-        else:
+        markup = get_status_markup()['color'].get(self.get_status(obj))
+        if markup is None:
             return obj.username
 
-        return format_html('<span style="color: {};">{}</span>', color, obj.username)
+        return markup + conditional_escape(obj.username) + mark_safe('</span>')
     username_color_status.short_description = _('Username (status)')
     username_color_status.admin_order_field = '-username'
 
     def username_character_status(self, obj):
         """Returns the prefixed username with status indicating characters"""
 
-        if obj.is_superuser:
-            status = settings.MINIUSER_ADMIN_STATUS_CHAR_SUPERUSER
-        elif obj.is_staff:
-            status = settings.MINIUSER_ADMIN_STATUS_CHAR_STAFF
-        else:
+        markup = get_status_markup()['character'].get(self.get_status(obj))
+        if markup is None:
             return obj.username
 
-        return '[{}] {}'.format(status, obj.username)
+        return markup + obj.username
     username_character_status.short_description = _('Username (status)')
     username_character_status.admin_order_field = '-username'
 
     def email_with_status(self, obj):
         """Combines email-address and verification status in one field"""
 
-        # get the icon (with Django's template tag)
-        icon = _boolean_icon(obj.email_is_verified)
-
-        return format_html('{} {}', icon, obj.email)
+        # the icon is rendered once with Django's template tag
+        return get_status_markup()['verified'][bool(obj.email_is_verified)] + conditional_escape(obj.email)
     email_with_status.short_description = _('EMail')
     email_with_status.admin_order_field = '-email'
 
+    def process_selection(self, request, queryset, description, function, *args):
+        """Processes the selected users, large selections in the background
+
+        function is a method of MiniUserManager, that processes the users in
+        batches (i.e. update_status()). It is called with queryset, args and
+        MINIUSER_ADMIN_ACTION_CHUNK_SIZE as batch size.
+
+        Returns the result of function or None, if the selection exceeds
+        MINIUSER_ADMIN_BACKGROUND_THRESHOLD and a background job was started
+        (see jobs.py)."""
+
+        args = (queryset, ) + args + (settings.MINIUSER_ADMIN_ACTION_CHUNK_SIZE, )
+        total = queryset.count()
+        if total <= settings.MINIUSER_ADMIN_BACKGROUND_THRESHOLD:
+            return function(*args)
+
+        jobs.start_job(request.user.pk, description, total, function, *args)
+        self.message_user(
+            request, _('{}: {} users are processed in the background.').format(description, total)
+        )
+        return None
+
+    def message_jobs(self, request):
+        """Reports the progress of the requesting user's background jobs"""
+
+        for job in jobs.pop_jobs(request.user.pk):
+            if not job['finished']:
+                self.message_user(request, _('{description}: {processed} of {total} users processed.').format(**job))
+            elif job['failed']:
+                self.message_user(
+                    request, _('{description} failed after {processed} of {total} users.').format(**job),
+                    messages.ERROR
+                )
+            else:
+                self.message_user(
+                    request, _('{description} finished: {processed} users processed.').format(**job),
+                    messages.SUCCESS
+                )
+
     def action_activate_user(self, request, queryset):
         """Performs bulk activation of users in Django admin"""
 
-        updated = queryset.update(is_active=True)
+        updated = self.process_selection(
+            request, queryset, _('Activation of users'), self.model.objects.update_status, {'is_active': True}
+        )
+        if updated is None:
+            return
 
         if updated == 1:
             msg = _('1 user was activated successfully.')
@@ -180,7 +524,11 @@ class MiniUserAdmin(admin.ModelAdmin):
     def action_deactivate_user(self, request, queryset):
         """Performs bulk deactivation of users in Django admin"""
 
-        updated = queryset.update(is_active=False)
+        updated = self.process_selection(
+            request, queryset, _('Deactivation of users'), self.model.objects.update_status, {'is_active': False}
+        )
+        if updated is None:
+            return
 
         if updated == 1:
             msg = _('1 user was deactivated successfully.')
@@ -189,6 +537,85 @@ class MiniUserAdmin(admin.ModelAdmin):
         self.message_user(request, msg)
     action_deactivate_user.short_description = _('Deactivate selected users')
 
+    def action_delete_users(self, request, queryset):
+        """Deletes the selected users in chunks, after a confirmation
+
+        Django's delete_selected collects and displays all related objects of
+        the selection, which is not feasible for large selections. Instead,
+        the confirmation displays the number of selected users only and the
+        users are deleted in chunks (see MiniUserManager.delete_users())."""
+
+        if not self.has_delete_permission(request):
+            raise PermissionDenied
+
+        if request.POST.get('post'):
+            deleted = self.process_selection(
+                request, queryset, _('Deletion of users'), self.model.objects.delete_users
+            )
+            if deleted is not None:
+                self.message_user(
+                    request,
+                    ungettext(
+                        '1 user was deleted successfully.', '{} users were deleted successfully.', deleted
+                    ).format(deleted),
+                    messages.SUCCESS
+                )
+            return None
+
+        # the selection is passed on as it was posted, so 'select all' does
+        #   not list all users
+        context = self.admin_site.each_context(request)
+        context.update({
+            'title': _('Are you sure?'),
+            'opts': self.model._meta,
+            'count': queryset.count(),
+            'select_across': request.POST.get('select_across') == '1',
+            'selected': request.POST.getlist(ACTION_CHECKBOX_NAME),
+            'action_checkbox_name': ACTION_CHECKBOX_NAME,
+            'media': self.media,
+        })
+        request.current_app = self.admin_site.name
+
+        return TemplateResponse(request, 'admin/miniuser/miniuser/delete_users_confirmation.html', context)
+    action_delete_users.short_description = _('Delete selected users')
+
+    def get_export_fields(self):
+        """Returns the database fields of the columns in MINIUSER_ADMIN_LIST_DISPLAY"""
+        return self.get_model_fields(settings.MINIUSER_ADMIN_LIST_DISPLAY, self.export_fields)
+
+    def get_model_fields(self, columns, mapping):
+        """Returns the database fields of columns, resolving the enhanced ones by mapping
+
+        Columns, that do not correspond to any database field, are omitted."""
+
+        fields = []
+        for column in columns:
+            for field in mapping.get(column, (column,)):
+                try:
+                    self.model._meta.get_field(field)
+                except FieldDoesNotExist:
+                    continue
+                if field not in fields:
+                    fields.append(field)
+
+        return fields
+
+    def action_export_csv(self, request, queryset):
+        """Exports the selected users as CSV
+
+        The response is streamed and the rows are fetched without creating
+        model instances, so that large selections may be exported."""
+
+        fields = self.get_export_fields()
+
+        response = StreamingHttpResponse(
+            iter_csv(iter_values(queryset, fields), fields),
+            content_type='text/csv'
+        )
+        response['Content-Disposition'] = 'attachment; filename="users.csv"'
+        return response
+    action_export_csv.short_description = _('Export selected users as CSV')
+
     def get_miniuser_legend(self):
         """Returns relevant information from the app's settings to enhance the context"""
 
@@ -214,7 +641,11 @@ class MiniUserAdmin(admin.ModelAdmin):
         """Override changelist_view()-method to pass some more context to the view
 
         This is used to:
-            - provide the legend (at the foot of the list view)"""
+            - provide the legend (at the foot of the list view)
+            - report the progress of background jobs"""
+
+        if request.method == 'GET':
+            self.message_jobs(request)
 
         extra_context = extra_context or {}
         extra_context['miniuser_legend'] = self.get_miniuser_legend()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Asynchronous authentication
+
+Django's authenticate() looks up the user and hashes the password, which ties
+up the calling thread. Under ASGI, aauthenticate() runs it in the app's login
+thread pool instead (see hashing.py), so the event loop keeps serving other
+requests:
+
+    user = await aauthenticate(request, username=username, password=password)
+
+Django's ORM has no asynchronous API (yet), so the lookup of the user is
+performed by the pool's threads aswell.
+
+This requires asyncio (Python 3.4+); the functions return asyncio futures, so
+they may be used with 'await' or 'yield from'."""
+
+# Django imports
+import django
+from django.contrib.auth import authenticate
+
+# app imports
+from . import hashing
+from .exceptions import (
+    MiniUserConfigurationException, MiniUserSaturatedException,
+)
+
+try:
+    import asyncio
+except ImportError:  # pragma: nocover
+    # Python 2
+    asyncio = None
+
+
+def run_in_login_executor(function, *args, **kwargs):
+    """Returns a future of function(*args, **kwargs), that is run by the login thread pool
+
+    MiniUserSaturatedException is raised, if the pool does not accept further
+    logins (see hashing.submit_login())."""
+
+    if asyncio is None:  # pragma: nocover
+        raise MiniUserConfigurationException(
+            "Asynchronous authentication requires 'asyncio'."
+        )
+
+    return asyncio.wrap_future(hashing.submit_login(function, *args, **kwargs), loop=asyncio.get_event_loop())
+
+
+def submit_authentication(function, request, *args, **kwargs):
+    """Returns a future of function(*args, **kwargs), that authenticates the login of request
+
+    Unlike run_in_login_executor(), the login is rejected, if the pool is
+    saturated (see hashing.reject_saturated_login()), and the future resolves
+    to None at once."""
+
+    try:
+        return run_in_login_executor(function, *args, **kwargs)
+    except MiniUserSaturatedException:
+        hashing.reject_saturated_login(request)
+        future = asyncio.Future(loop=asyncio.get_event_loop())
+        future.set_result(None)
+        return future
+
+
+def aauthenticate(request=None, **credentials):
+    """Returns a future of Django's authenticate()
+
+    If the login thread pool is saturated, the future resolves to None."""
+
+    if django.VERSION < (1, 11):
+        # authenticate() does not accept the request
+        return submit_authentication(authenticate, request, **credentials)
+    return submit_authentication(authenticate, request, request, **credentials)
@@ -11,9 +11,23 @@ import re
 # Django imports
 from django.apps import AppConfig
 from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
 from django.core.checks import Error, Info, Warning, register
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
 from django.utils.translation import ugettext_lazy as _
 
+# app imports
+from .search import SEARCH_MODE_VENDORS
+from .signals import (
+    invalidate_natural_key_cache_on_delete,
+    invalidate_natural_key_cache_on_save, invalidate_user_cache_on_delete,
+    invalidate_user_cache_on_save, invalidate_user_cache_on_status_update,
+    status_updated, update_autocomplete_index_on_delete,
+    update_autocomplete_index_on_save, update_last_login,
+    update_login_filter_on_save,
+)
+
 MESSAGE_BOOL = "Value of {} has to be a boolean value."
 HINT_BOOL = "Please check your settings and ensure, that {} is a boolean value (True of False)."
 
@@ -107,6 +121,236 @@ E011 = Error(
     id='miniuser.e011',
 )
 
+E012 = Error(
+    _(MESSAGE_BOOL.format('MINIUSER_NATURAL_KEY_CACHE')),
+    hint=_(HINT_BOOL.format('MINIUSER_NATURAL_KEY_CACHE')),
+    id='miniuser.e012',
+)
+
+E013 = Error(
+    _("Value of MINIUSER_CACHE_ALIAS is not a configured cache."),
+    hint=_(
+        "Please check your settings and ensure, that MINIUSER_CACHE_ALIAS is "
+        "one of the aliases of your CACHES setting."),
+    id='miniuser.e013',
+)
+
+E014 = Error(
+    _("Value of MINIUSER_NATURAL_KEY_CACHE_TIMEOUT has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_NATURAL_KEY_CACHE_TIMEOUT is given in seconds."),
+    id='miniuser.e014',
+)
+
+E015 = Error(
+    _(MESSAGE_BOOL.format('MINIUSER_USER_CACHE')),
+    hint=_(HINT_BOOL.format('MINIUSER_USER_CACHE')),
+    id='miniuser.e015',
+)
+
+E016 = Error(
+    _("Value of MINIUSER_USER_CACHE_TIMEOUT has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_USER_CACHE_TIMEOUT is given in seconds."),
+    id='miniuser.e016',
+)
+
+E017 = Error(
+    _(MESSAGE_BOOL.format('MINIUSER_ADMIN_KEYSET_PAGINATION')),
+    hint=_(HINT_BOOL.format('MINIUSER_ADMIN_KEYSET_PAGINATION')),
+    id='miniuser.e017',
+)
+
+E018 = Error(
+    _("Value of MINIUSER_ADMIN_COUNT_MODE is not valid."),
+    hint=_(
+        "Please check your settings and ensure, that MINIUSER_ADMIN_COUNT_MODE "
+        "is one of 'exact', 'estimate' or 'cached'."),
+    id='miniuser.e018',
+)
+
+E019 = Error(
+    _("Value of MINIUSER_ADMIN_COUNT_TIMEOUT has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_ADMIN_COUNT_TIMEOUT is given in seconds."),
+    id='miniuser.e019',
+)
+
+E020 = Error(
+    _("Value of MINIUSER_ADMIN_SEARCH_MODE is not valid."),
+    hint=_(
+        "Please check your settings and ensure, that MINIUSER_ADMIN_SEARCH_MODE "
+        "is one of 'default', 'prefix', 'trigram' or 'fts5'."),
+    id='miniuser.e020',
+)
+
+E021 = Error(
+    _("Value of MINIUSER_ADMIN_SEARCH_MODE is not supported by your database."),
+    hint=_(
+        "MINIUSER_ADMIN_SEARCH_MODE = 'trigram' requires PostgreSQL, 'fts5' "
+        "requires SQLite. Please check your settings!"),
+    id='miniuser.e021',
+)
+
+E022 = Error(
+    _(MESSAGE_BOOL.format('MINIUSER_AUTOCOMPLETE')),
+    hint=_(HINT_BOOL.format('MINIUSER_AUTOCOMPLETE')),
+    id='miniuser.e022',
+)
+
+E023 = Error(
+    _("Value of MINIUSER_AUTOCOMPLETE_INDEX_TIMEOUT has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_AUTOCOMPLETE_INDEX_TIMEOUT is given in seconds."),
+    id='miniuser.e023',
+)
+
+E024 = Error(
+    _("Value of MINIUSER_ADMIN_ACTION_CHUNK_SIZE has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_ADMIN_ACTION_CHUNK_SIZE is a positive integer."),
+    id='miniuser.e024',
+)
+
+E025 = Error(
+    _("Value of MINIUSER_ADMIN_BACKGROUND_THRESHOLD has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_ADMIN_BACKGROUND_THRESHOLD is a positive integer."),
+    id='miniuser.e025',
+)
+
+E026 = Error(
+    _(MESSAGE_BOOL.format('MINIUSER_LAST_LOGIN_BUFFER')),
+    hint=_(HINT_BOOL.format('MINIUSER_LAST_LOGIN_BUFFER')),
+    id='miniuser.e026',
+)
+
+E027 = Error(
+    _("Value of MINIUSER_LAST_LOGIN_GRANULARITY has to be a non-negative integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_LAST_LOGIN_GRANULARITY is given in minutes."),
+    id='miniuser.e027',
+)
+
+E028 = Error(
+    _("Value of MINIUSER_LAST_LOGIN_FLUSH_INTERVAL has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_LAST_LOGIN_FLUSH_INTERVAL is given in seconds."),
+    id='miniuser.e028',
+)
+
+E029 = Error(
+    _("Value of MINIUSER_LAST_LOGIN_FLUSH_THRESHOLD has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_LAST_LOGIN_FLUSH_THRESHOLD is a positive integer."),
+    id='miniuser.e029',
+)
+
+E030 = Error(
+    _(MESSAGE_BOOL.format('MINIUSER_LOGIN_THROTTLE')),
+    hint=_(HINT_BOOL.format('MINIUSER_LOGIN_THROTTLE')),
+    id='miniuser.e030',
+)
+
+E031 = Error(
+    _("Value of MINIUSER_LOGIN_THROTTLE_USERNAME_LIMIT has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_LOGIN_THROTTLE_USERNAME_LIMIT is a positive integer."),
+    id='miniuser.e031',
+)
+
+E032 = Error(
+    _("Value of MINIUSER_LOGIN_THROTTLE_IP_LIMIT has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_LOGIN_THROTTLE_IP_LIMIT is a positive integer."),
+    id='miniuser.e032',
+)
+
+E033 = Error(
+    _("Value of MINIUSER_LOGIN_THROTTLE_WINDOW has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_LOGIN_THROTTLE_WINDOW is given in seconds."),
+    id='miniuser.e033',
+)
+
+E034 = Error(
+    _("Value of MINIUSER_LOGIN_THROTTLE_STORE is not valid."),
+    hint=_(
+        "Please check your settings and ensure, that MINIUSER_LOGIN_THROTTLE_STORE "
+        "is one of 'memory' or 'cache'."),
+    id='miniuser.e034',
+)
+
+E035 = Error(
+    _("Value of MINIUSER_LOGIN_THROTTLE_MAX_KEYS has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_LOGIN_THROTTLE_MAX_KEYS is a positive integer."),
+    id='miniuser.e035',
+)
+
+E036 = Error(
+    _(MESSAGE_BOOL.format('MINIUSER_LOGIN_FILTER')),
+    hint=_(HINT_BOOL.format('MINIUSER_LOGIN_FILTER')),
+    id='miniuser.e036',
+)
+
+E037 = Error(
+    _("Value of MINIUSER_LOGIN_FILTER_ERROR_RATE is not valid."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_LOGIN_FILTER_ERROR_RATE is a number between 0 and 1."),
+    id='miniuser.e037',
+)
+
+E038 = Error(
+    _("Value of MINIUSER_LOGIN_FILTER_TIMEOUT has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_LOGIN_FILTER_TIMEOUT is given in seconds."),
+    id='miniuser.e038',
+)
+
+E039 = Error(
+    _(MESSAGE_BOOL.format('MINIUSER_LOGIN_FILTER_DUMMY_HASH')),
+    hint=_(HINT_BOOL.format('MINIUSER_LOGIN_FILTER_DUMMY_HASH')),
+    id='miniuser.e039',
+)
+
+E040 = Error(
+    _("Value of MINIUSER_LOGIN_WORKERS has to be a positive integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_LOGIN_WORKERS is a positive integer."),
+    id='miniuser.e040',
+)
+
+E041 = Error(
+    _(MESSAGE_BOOL.format('MINIUSER_LOGIN_EXECUTOR')),
+    hint=_(HINT_BOOL.format('MINIUSER_LOGIN_EXECUTOR')),
+    id='miniuser.e041',
+)
+
+E042 = Error(
+    _("Value of MINIUSER_LOGIN_QUEUE_SIZE has to be a non-negative integer."),
+    hint=_(
+        "Please check your settings and ensure, that "
+        "MINIUSER_LOGIN_QUEUE_SIZE is 0 or a positive integer."),
+    id='miniuser.e042',
+)
+
 I001 = Info(
     _("It seems, that you have not activated Django's admin backend."),
     hint=_(
@@ -123,6 +367,47 @@ W001 = Warning(
     id='miniuser.w001',
 )
 
+W002 = Warning(
+    _("MINIUSER_USER_CACHE is enabled, but MiniUserBackend is not used."),
+    hint=_(
+        "Users are only retrieved from the cache by MiniUser's authentication "
+        "backend. Please add 'miniuser.backends.MiniUserBackend' to "
+        "AUTHENTICATION_BACKENDS."),
+    id='miniuser.w002',
+)
+
+W003 = Warning(
+    _("MINIUSER_LOGIN_THROTTLE is enabled, but MiniUserBackend is not used."),
+    hint=_(
+        "Login attempts are throttled by MiniUser's authentication backend. "
+        "Please add 'miniuser.backends.MiniUserBackend' to "
+        "AUTHENTICATION_BACKENDS."),
+    id='miniuser.w003',
+)
+
+W004 = Warning(
+    _("MINIUSER_LOGIN_FILTER is enabled, but MiniUserBackend is not used."),
+    hint=_(
+        "The filter of login names is used by MiniUser's authentication "
+        "backend. Please add 'miniuser.backends.MiniUserBackend' to "
+        "AUTHENTICATION_BACKENDS."),
+    id='miniuser.w004',
+)
+
+W005 = Warning(
+    _("MINIUSER_LOGIN_EXECUTOR is enabled, but MiniUserBackend is not used."),
+    hint=_(
+        "Logins are authenticated by the login thread pool only by MiniUser's "
+        "authentication backend. Please add "
+        "'miniuser.backends.MiniUserBackend' to AUTHENTICATION_BACKENDS."),
+    id='miniuser.w005',
+)
+
+
+def is_positive_int(value):
+    """Returns True, if value is an integer greater than zero (but not a bool)"""
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
 
 def check_correct_values(app_configs, **kwargs):
     """Checks, if all app specific settings have defined values"""
@@ -177,6 +462,71 @@ def check_correct_values(app_configs, **kwargs):
 
     if not settings.AUTH_USER_MODEL == 'miniuser.MiniUser':
         errors.append(E011)
+    if not isinstance(settings.MINIUSER_NATURAL_KEY_CACHE, bool):
+        errors.append(E012)
+    if settings.MINIUSER_CACHE_ALIAS not in settings.CACHES:
+        errors.append(E013)
+    if not is_positive_int(settings.MINIUSER_NATURAL_KEY_CACHE_TIMEOUT):
+        errors.append(E014)
+    if not isinstance(settings.MINIUSER_USER_CACHE, bool):
+        errors.append(E015)
+    if not is_positive_int(settings.MINIUSER_USER_CACHE_TIMEOUT):
+        errors.append(E016)
+    if not isinstance(settings.MINIUSER_ADMIN_KEYSET_PAGINATION, bool):
+        errors.append(E017)
+    if settings.MINIUSER_ADMIN_COUNT_MODE not in ('exact', 'estimate', 'cached'):
+        errors.append(E018)
+    if not is_positive_int(settings.MINIUSER_ADMIN_COUNT_TIMEOUT):
+        errors.append(E019)
+    if settings.MINIUSER_ADMIN_SEARCH_MODE not in ('default', 'prefix', 'trigram', 'fts5'):
+        errors.append(E020)
+    elif SEARCH_MODE_VENDORS.get(settings.MINIUSER_ADMIN_SEARCH_MODE, connection.vendor) != connection.vendor:
+        errors.append(E021)
+    if not isinstance(settings.MINIUSER_AUTOCOMPLETE, bool):
+        errors.append(E022)
+    if not is_positive_int(settings.MINIUSER_AUTOCOMPLETE_INDEX_TIMEOUT):
+        errors.append(E023)
+    if not is_positive_int(settings.MINIUSER_ADMIN_ACTION_CHUNK_SIZE):
+        errors.append(E024)
+    if not is_positive_int(settings.MINIUSER_ADMIN_BACKGROUND_THRESHOLD):
+        errors.append(E025)
+    if not isinstance(settings.MINIUSER_LAST_LOGIN_BUFFER, bool):
+        errors.append(E026)
+    granularity = settings.MINIUSER_LAST_LOGIN_GRANULARITY
+    if not (is_positive_int(granularity) or (granularity == 0 and not isinstance(granularity, bool))):
+        errors.append(E027)
+    if not is_positive_int(settings.MINIUSER_LAST_LOGIN_FLUSH_INTERVAL):
+        errors.append(E028)
+    if not is_positive_int(settings.MINIUSER_LAST_LOGIN_FLUSH_THRESHOLD):
+        errors.append(E029)
+    if not isinstance(settings.MINIUSER_LOGIN_THROTTLE, bool):
+        errors.append(E030)
+    if not is_positive_int(settings.MINIUSER_LOGIN_THROTTLE_USERNAME_LIMIT):
+        errors.append(E031)
+    if not is_positive_int(settings.MINIUSER_LOGIN_THROTTLE_IP_LIMIT):
+        errors.append(E032)
+    if not is_positive_int(settings.MINIUSER_LOGIN_THROTTLE_WINDOW):
+        errors.append(E033)
+    if settings.MINIUSER_LOGIN_THROTTLE_STORE not in ('memory', 'cache'):
+        errors.append(E034)
+    if not is_positive_int(settings.MINIUSER_LOGIN_THROTTLE_MAX_KEYS):
+        errors.append(E035)
+    if not isinstance(settings.MINIUSER_LOGIN_FILTER, bool):
+        errors.append(E036)
+    error_rate = settings.MINIUSER_LOGIN_FILTER_ERROR_RATE
+    if not (isinstance(error_rate, float) and 0 < error_rate < 1):
+        errors.append(E037)
+    if not is_positive_int(settings.MINIUSER_LOGIN_FILTER_TIMEOUT):
+        errors.append(E038)
+    if not isinstance(settings.MINIUSER_LOGIN_FILTER_DUMMY_HASH, bool):
+        errors.append(E039)
+    if not is_positive_int(settings.MINIUSER_LOGIN_WORKERS):
+        errors.append(E040)
+    if not isinstance(settings.MINIUSER_LOGIN_EXECUTOR, bool):
+        errors.append(E041)
+    queue_size = settings.MINIUSER_LOGIN_QUEUE_SIZE
+    if not (is_positive_int(queue_size) or (queue_size == 0 and not isinstance(queue_size, bool))):
+        errors.append(E042)
 
     return errors
 
@@ -201,6 +551,15 @@ def check_configuration_recommendations(app_configs, **kwargs):
 
     if settings.LOGIN_URL != 'miniuser:login':
         errors.append(W001)
+    backend_missing = 'miniuser.backends.MiniUserBackend' not in settings.AUTHENTICATION_BACKENDS
+    if settings.MINIUSER_USER_CACHE and backend_missing:
+        errors.append(W002)
+    if settings.MINIUSER_LOGIN_THROTTLE and backend_missing:
+        errors.append(W003)
+    if settings.MINIUSER_LOGIN_FILTER and backend_missing:
+        errors.append(W004)
+    if settings.MINIUSER_LOGIN_EXECUTOR and backend_missing:
+        errors.append(W005)
 
     return errors
 
@@ -252,6 +611,130 @@ class MiniUserConfig(AppConfig):
         """Specifies the character that indicates a user with staff-status.
         Has to be a single character!"""
 
+        set_app_default_setting('MINIUSER_ADMIN_KEYSET_PAGINATION', False)
+        """Determines, if Django's admin list view uses keyset pagination
+        instead of page numbers. See admin.py for details."""
+
+        set_app_default_setting('MINIUSER_ADMIN_COUNT_MODE', 'exact')
+        """Determines, how the users are counted in Django's admin list view:
+            a) exactly (-> 'exact'),
+            b) by the database's estimates (-> 'estimate') or
+            c) exactly, but cached (-> 'cached').
+        See counts.py for details."""
+
+        set_app_default_setting('MINIUSER_ADMIN_COUNT_TIMEOUT', 60)
+        """Specifies the time (in seconds), that counts are cached."""
+
+        set_app_default_setting('MINIUSER_ADMIN_SEARCH_MODE', 'default')
+        """Determines, how the searchbox of Django's admin list view searches:
+            a) Django's search (-> 'default'),
+            b) prefixes of usernames and email addresses (-> 'prefix'),
+            c) Django's search with trigram indexes (-> 'trigram') or
+            d) a full-text search (-> 'fts5').
+        See search.py for details."""
+
+        set_app_default_setting('MINIUSER_ADMIN_ACTION_CHUNK_SIZE', 1000)
+        """Specifies the number of users, that are updated per transaction by
+        the actions of Django's admin. See jobs.py for details."""
+
+        set_app_default_setting('MINIUSER_ADMIN_BACKGROUND_THRESHOLD', 10000)
+        """Specifies the number of selected users, above which the actions of
+        Django's admin are performed in the background."""
+
+        set_app_default_setting('MINIUSER_AUTOCOMPLETE', False)
+        """Determines, if the autocomplete view is available to staff users.
+        See autocomplete.py for details."""
+
+        set_app_default_setting('MINIUSER_AUTOCOMPLETE_INDEX_TIMEOUT', 300)
+        """Specifies the time (in seconds), after which the autocomplete index
+        is rebuilt from the database."""
+
+        set_app_default_setting('MINIUSER_LAST_LOGIN_GRANULARITY', 0)
+        """Specifies the time (in minutes), during which a user's last login is
+        not updated again. 0 updates the last login on every login."""
+
+        set_app_default_setting('MINIUSER_LAST_LOGIN_BUFFER', False)
+        """Determines, if the last logins are collected in memory and written
+        in batches. See last_login.py for details."""
+
+        set_app_default_setting('MINIUSER_LAST_LOGIN_FLUSH_INTERVAL', 60)
+        """Specifies the time (in seconds), after which buffered last logins
+        are written."""
+
+        set_app_default_setting('MINIUSER_LAST_LOGIN_FLUSH_THRESHOLD', 100)
+        """Specifies the number of buffered last logins, that are written at
+        once."""
+
+        set_app_default_setting('MINIUSER_LOGIN_THROTTLE', False)
+        """Determines, if MiniUserBackend throttles failed login attempts.
+        See throttle.py for details."""
+
+        set_app_default_setting('MINIUSER_LOGIN_THROTTLE_USERNAME_LIMIT', 5)
+        """Specifies the number of failed login attempts per login name, after
+        which further attempts are rejected."""
+
+        set_app_default_setting('MINIUSER_LOGIN_THROTTLE_IP_LIMIT', 20)
+        """Specifies the number of failed login attempts per IP address, after
+        which further attempts are rejected."""
+
+        set_app_default_setting('MINIUSER_LOGIN_THROTTLE_WINDOW', 300)
+        """Specifies the time (in seconds), during which failed login attempts
+        are counted."""
+
+        set_app_default_setting('MINIUSER_LOGIN_THROTTLE_STORE', 'memory')
+        """Specifies, where the failed login attempts are counted; either in
+        the process' memory ('memory') or in the app's cache ('cache')."""
+
+        set_app_default_setting('MINIUSER_LOGIN_THROTTLE_MAX_KEYS', 10000)
+        """Specifies the number of login names and IP addresses, whose failed
+        login attempts are kept in the process' memory."""
+
+        set_app_default_setting('MINIUSER_LOGIN_FILTER', False)
+        """Determines, if MiniUserBackend rejects unknown login names by a
+        filter of all login names. See bloom.py for details."""
+
+        set_app_default_setting('MINIUSER_LOGIN_FILTER_ERROR_RATE', 0.01)
+        """Specifies the rate of unknown login names, that pass the filter and
+        are looked up in the database."""
+
+        set_app_default_setting('MINIUSER_LOGIN_FILTER_TIMEOUT', 3600)
+        """Specifies the time (in seconds), after which the filter of login
+        names is rebuilt from the database."""
+
+        set_app_default_setting('MINIUSER_LOGIN_FILTER_DUMMY_HASH', True)
+        """Determines, if the password is hashed for rejected login names
+        anyway, so that their rejection takes as long as a failed login."""
+
+        set_app_default_setting('MINIUSER_LOGIN_WORKERS', 4)
+        """Specifies the number of threads, that authenticate asynchronous
+        logins. See aio.py for details."""
+
+        set_app_default_setting('MINIUSER_LOGIN_QUEUE_SIZE', 16)
+        """Specifies the number of logins, that may wait for a thread of the
+        login thread pool. Further logins are rejected at once."""
+
+        set_app_default_setting('MINIUSER_LOGIN_EXECUTOR', False)
+        """Determines, if MiniUserBackend authenticates all logins by the
+        login thread pool. See hashing.py for details."""
+
+        set_app_default_setting('MINIUSER_CACHE_ALIAS', 'default')
+        """Specifies the cache (as an alias of Django's CACHES setting), that
+        is used for all of the app's caching."""
+
+        set_app_default_setting('MINIUSER_NATURAL_KEY_CACHE', False)
+        """Determines, if the lookup of users by their login names is cached.
+        See cache.py for details."""
+
+        set_app_default_setting('MINIUSER_NATURAL_KEY_CACHE_TIMEOUT', 300)
+        """Specifies the time (in seconds), that login names are cached."""
+
+        set_app_default_setting('MINIUSER_USER_CACHE', False)
+        """Determines, if MiniUserBackend retrieves the users of authenticated
+        requests from the cache. See backends.py for details."""
+
+        set_app_default_setting('MINIUSER_USER_CACHE_TIMEOUT', 300)
+        """Specifies the time (in seconds), that user instances are cached."""
+
         set_app_default_setting('AUTH_USER_MODEL', 'miniuser.MiniUser')
         """Sets the app's MiniUser class as Django's AUTH_USER_MODEL.
 
@@ -311,3 +794,52 @@ class MiniUserConfig(AppConfig):
 
         # checking for some dependencies of the settings
         register(check_configuration_constraints)
+
+        # connect the app's signal receivers
+        MiniUser = self.get_model('MiniUser')
+        post_save.connect(
+            invalidate_natural_key_cache_on_save,
+            sender=MiniUser,
+            dispatch_uid='miniuser_invalidate_natural_key_cache_on_save'
+        )
+        post_delete.connect(
+            invalidate_natural_key_cache_on_delete,
+            sender=MiniUser,
+            dispatch_uid='miniuser_invalidate_natural_key_cache_on_delete'
+        )
+        post_save.connect(
+            invalidate_user_cache_on_save,
+            sender=MiniUser,
+            dispatch_uid='miniuser_invalidate_user_cache_on_save'
+        )
+        post_delete.connect(
+            invalidate_user_cache_on_delete,
+            sender=MiniUser,
+            dispatch_uid='miniuser_invalidate_user_cache_on_delete'
+        )
+        status_updated.connect(
+            invalidate_user_cache_on_status_update,
+            sender=MiniUser,
+            dispatch_uid='miniuser_invalidate_user_cache_on_status_update'
+        )
+        post_save.connect(
+            update_autocomplete_index_on_save,
+            sender=MiniUser,
+            dispatch_uid='miniuser_update_autocomplete_index_on_save'
+        )
+        post_delete.connect(
+            update_autocomplete_index_on_delete,
+            sender=MiniUser,
+            dispatch_uid='miniuser_update_autocomplete_index_on_delete'
+        )
+        post_save.connect(
+            update_login_filter_on_save,
+            sender=MiniUser,
+            dispatch_uid='miniuser_update_login_filter_on_save'
+        )
+
+        # replace Django's update_last_login(); the receiver is connected with
+        #   Django's dispatch_uid, so django.contrib.auth does not connect its
+        #   own receiver, if it is made ready after this app
+        user_logged_in.disconnect(dispatch_uid='update_last_login')
+        user_logged_in.connect(update_last_login, dispatch_uid='update_last_login')
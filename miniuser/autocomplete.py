@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Autocompletion of users
+
+The autocomplete view (see views.py) matches the beginning of usernames and
+email addresses. Instead of scanning the database on every keystroke, the
+normalized login names are held in sorted arrays in the process' memory, that
+are searched by binary search. Only the normalized keys and the pks are kept
+(the pks in arrays of integers); the usernames and email addresses of the
+matches are fetched by their pks.
+
+The index is built by a background thread, that is started by the first
+lookup, and rebuilt the same way after MINIUSER_AUTOCOMPLETE_INDEX_TIMEOUT
+seconds. Requests never wait for the build: while the index is cold, the
+database is queried instead (see database_lookup()), and a stale index keeps
+answering until its replacement is ready. The index is kept up to date by the
+app's post_save and post_delete receivers (see signals.py) and by
+MiniUserManager.bulk_create().
+
+Please note, that every process holds its own index. Changes, that do not send
+signals (i.e. QuerySet.update()) or happen in other processes, are picked up,
+when the index is rebuilt."""
+
+from __future__ import unicode_literals
+
+# Python imports
+import itertools
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+# Django imports
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+
+# app imports
+from .search import prefix_condition
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixIndex(object):
+    """Sorted parallel arrays of keys and pks, that support prefix lookups
+
+    The entries are ordered by (key, pk)."""
+
+    def __init__(self, entries=()):
+        entries = sorted(entries)
+        self.keys = [key for key, pk in entries]
+        self.pks = array('l', (pk for key, pk in entries))
+
+    @classmethod
+    def from_sorted(cls, entries):
+        """Returns an index of (key, pk)-tuples, that are (probably) sorted already
+
+        This avoids holding all tuples at once, if the database returns them in
+        order. If its collation does not match Python's ordering, the entries
+        are sorted after all."""
+
+        prefix_index = cls()
+        keys, pks = prefix_index.keys, prefix_index.pks
+        entries = iter(entries)
+        for key, pk in entries:
+            if keys and (key, pk) < (keys[-1], pks[-1]):
+                return cls(itertools.chain(zip(keys, pks), [(key, pk)], entries))
+            keys.append(key)
+            pks.append(pk)
+
+        return prefix_index
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _position(self, key, pk):
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key and self.pks[position] < pk:
+            position += 1
+        return position
+
+    def _contains_at(self, position, key, pk):
+        return position < len(self.keys) and self.keys[position] == key and self.pks[position] == pk
+
+    def add(self, key, pk):
+        position = self._position(key, pk)
+        if not self._contains_at(position, key, pk):
+            self.keys.insert(position, key)
+            self.pks.insert(position, pk)
+
+    def remove(self, key, pk):
+        """Removes an entry; returns False, if it was not found"""
+
+        position = self._position(key, pk)
+        if not self._contains_at(position, key, pk):
+            return False
+        del self.keys[position]
+        del self.pks[position]
+        return True
+
+    def remove_pk(self, pk):
+        """Removes all entries of pk, if its keys are unknown (scans the whole index)"""
+
+        for position in reversed([position for position, value in enumerate(self.pks) if value == pk]):
+            del self.keys[position]
+            del self.pks[position]
+
+    def lookup(self, prefix, limit):
+        """Returns the pks of up to limit keys, that start with prefix"""
+
+        result = []
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and len(result) < limit:
+            if not self.keys[position].startswith(prefix):
+                break
+            result.append(self.pks[position])
+            position += 1
+
+        return result
+
+
+class AutocompleteIndex(object):
+    """Holds the normalized login names of all users in the process' memory
+
+    Lookups return the users, whose usernames start with the term (ordered by
+    username), followed by the users, whose email addresses start with the
+    term (ordered by email address)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        """Protects the index' data"""
+
+        self.build_lock = threading.Lock()
+        """Held by the thread, that is building the index"""
+
+        self.builder = None
+        """The latest background thread, that builds the index"""
+
+        self.invalidate()
+
+    def invalidate(self):
+        """Discards the index, it will be rebuilt after the next lookup"""
+
+        with self.lock:
+            self.usernames = PrefixIndex()
+            self.emails = PrefixIndex()
+            self.built = None
+            self.generation = getattr(self, 'generation', 0) + 1
+            self.pending = None
+
+    def expire(self):
+        """Marks the index as stale; it keeps answering until it is rebuilt"""
+
+        with self.lock:
+            if self.built is not None:
+                self.built = 0
+
+    def is_stale(self):
+        """Returns True, if the index has to be (re-)built"""
+        return self.built is None or time.time() - self.built > settings.MINIUSER_AUTOCOMPLETE_INDEX_TIMEOUT
+
+    def build(self):
+        """Fetches the login names of all users and replaces the index' data
+
+        The login names are streamed from the database without holding the
+        lock, so lookups are served from the old data and changes of users are
+        recorded meanwhile. These changes are replayed, once the new data is in
+        place. This is run by the background thread (see start_build())."""
+
+        with self.lock:
+            generation = self.generation
+            self.pending = []
+
+        users = apps.get_model('miniuser', 'MiniUser').objects.all()
+        usernames = PrefixIndex.from_sorted(
+            users.order_by('username_normalized', 'pk').values_list('username_normalized', 'pk').iterator()
+        )
+        emails = PrefixIndex.from_sorted(
+            users.filter(email_normalized__isnull=False).order_by('email_normalized', 'pk').values_list(
+                'email_normalized', 'pk'
+            ).iterator()
+        )
+
+        with self.lock:
+            if generation != self.generation:
+                # invalidated during the build
+                return
+            pending, self.pending = self.pending, None
+            self.usernames, self.emails = usernames, emails
+            for pk, old, new in pending:
+                self._update(pk, old, new)
+            self.built = time.time()
+
+    def start_build(self):
+        """Builds the index in a background thread, unless another thread is already doing so"""
+
+        if not self.build_lock.acquire(False):
+            return
+
+        try:
+            self.builder = threading.Thread(target=self._build_in_background, name='miniuser-autocomplete')
+            self.builder.daemon = True
+            self.builder.start()
+        except Exception:
+            self.build_lock.release()
+            raise
+
+    def _build_in_background(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception("Could not build the autocomplete index")
+        finally:
+            self.build_lock.release()
+            # the thread's connections are not closed by Django's request handling
+            connections.close_all()
+
+    def update(self, user, created=False):
+        """Adds or updates a single user
+
+        The previous login names of the user are recorded by MiniUser.save();
+        if they are unknown, the user's entries are searched by pk."""
+
+        old = () if created else getattr(user, '_previous_login_names', None)
+        self._apply(user.pk, old, (user.username_normalized, user.email_normalized))
+
+    def add_many(self, users):
+        """Adds new users (i.e. of bulk_create())
+
+        Users without pk (not every database returns them from bulk inserts)
+        can not be added; the index is rebuilt in that case."""
+
+        if any(user.pk is None for user in users):
+            self.expire()
+            return
+
+        for user in users:
+            self._apply(user.pk, (), (user.username_normalized, user.email_normalized))
+
+    def remove(self, pk, login_names=None):
+        """Removes a single user, given its pk and (if known) its normalized login names"""
+        self._apply(pk, login_names, None)
+
+    def _apply(self, pk, old, new):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((pk, old, new))
+            if self.built is not None:
+                self._update(pk, old, new)
+
+    def _update(self, pk, old, new):
+        # has to be called while holding the lock
+        if old is None or (old and not self.usernames.remove(old[0], pk)):
+            # the previous login names are unknown or wrong
+            self.usernames.remove_pk(pk)
+            self.emails.remove_pk(pk)
+        elif old and old[1]:
+            self.emails.remove(old[1], pk)
+
+        if new is not None:
+            self.usernames.add(new[0], pk)
+            if new[1]:
+                self.emails.add(new[1], pk)
+
+    def lookup(self, term, limit):
+        """Returns up to limit users as dicts, or None, if the index is cold
+
+        If the index is stale, it is rebuilt in the background. The usernames
+        and email addresses of the matches are fetched by pk."""
+
+        if self.is_stale():
+            self.start_build()
+
+        MiniUser = apps.get_model('miniuser', 'MiniUser')
+        username_key = MiniUser.normalize_username_key(term)
+        email_key = MiniUser.normalize_email_key(term)
+
+        with self.lock:
+            if self.built is None:
+                return None
+
+            pks = self.usernames.lookup(username_key, limit)
+            if len(pks) < limit:
+                # users, that match both ways, may be found again
+                matches = set(pks)
+                pks.extend(
+                    pk for pk in self.emails.lookup(email_key, limit) if pk not in matches
+                )
+            pks = pks[:limit]
+
+        if not pks:
+            return []
+        users = {user['id']: user for user in MiniUser.objects.filter(pk__in=pks).values('id', 'username', 'email')}
+        # users, that were deleted by other processes, are skipped
+        return [users[pk] for pk in pks if pk in users]
+
+
+index = AutocompleteIndex()
+"""The process' index, maintained by the app's signal receivers"""
+
+
+def database_lookup(queryset, term, limit):
+    """Returns up to limit users as dicts, just like AutocompleteIndex.lookup()
+
+    Both queries are served by the indexes of the normalized login names."""
+
+    model = queryset.model
+    vendor = connections[queryset.db].vendor
+    fields = ('id', 'username', 'email')
+
+    result = list(
+        queryset.filter(
+            prefix_condition('username_normalized', model.normalize_username_key(term), vendor)
+        ).order_by('username_normalized', 'pk').values(*fields)[:limit]
+    )
+    if len(result) < limit:
+        result.extend(
+            queryset.filter(
+                prefix_condition('email_normalized', model.normalize_email_key(term), vendor)
+            ).exclude(
+                pk__in=[user['id'] for user in result]
+            ).order_by('email_normalized', 'pk').values(*fields)[:limit - len(result)]
+        )
+
+    return result
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Authentication backends
+
+Please include
+    AUTHENTICATION_BACKENDS = ['miniuser.backends.MiniUserBackend']
+into your project's settings to use the app's backend."""
+
+# Django imports
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+
+# app imports
+from . import aio, bloom, cache, hashing, throttle
+from .exceptions import MiniUserSaturatedException
+
+
+class MiniUserBackend(ModelBackend):
+    """Authenticates against MiniUser objects
+
+    This backend extends Django's ModelBackend. If MINIUSER_USER_CACHE is
+    enabled, the users are retrieved from the app's cache on every request
+    instead of querying the database. If MINIUSER_LOGIN_THROTTLE is enabled,
+    login attempts are throttled (see throttle.py); if MINIUSER_LOGIN_FILTER
+    is enabled, unknown login names are rejected early (see bloom.py)."""
+
+    def authenticate(self, request=None, username=None, password=None, **kwargs):
+        """Authenticates a user by his login name and password
+
+        Throttled attempts raise PermissionDenied, which stops Django from
+        trying the remaining backends. They neither query the database nor
+        hash the password.
+
+        If MINIUSER_LOGIN_FILTER is enabled, login names, that do not belong to
+        any user, are rejected without querying the database (see bloom.py).
+        Just like Django does for unknown login names, the password is hashed
+        anyway, unless MINIUSER_LOGIN_FILTER_DUMMY_HASH is disabled.
+
+        If MINIUSER_LOGIN_EXECUTOR is enabled, the user is looked up and his
+        password is checked by the login thread pool (see hashing.py). If the
+        pool is saturated, the login is rejected at once (see
+        hashing.reject_saturated_login()) by raising PermissionDenied, so
+        Django's authenticate() returns None instead of trying the remaining
+        backends."""
+
+        if settings.MINIUSER_LOGIN_THROTTLE and throttle.is_throttled(request, username):
+            raise PermissionDenied
+
+        if settings.MINIUSER_LOGIN_EXECUTOR and not hashing.in_login_thread():
+            try:
+                future = hashing.submit_login(self._verify, request, username, password, **kwargs)
+            except MiniUserSaturatedException:
+                hashing.reject_saturated_login(request)
+                raise PermissionDenied
+            user = future.result()
+        else:
+            user = self._verify(request, username, password, **kwargs)
+
+        if settings.MINIUSER_LOGIN_THROTTLE and user is None:
+            throttle.register_failure(request, username)
+        return user
+
+    def _verify(self, request, username, password, **kwargs):
+        """Looks up the user and checks his password"""
+
+        if settings.MINIUSER_LOGIN_FILTER and username is not None and not bloom.might_exist(username):
+            if settings.MINIUSER_LOGIN_FILTER_DUMMY_HASH:
+                get_user_model()().set_password(password)
+            return None
+
+        return self._authenticate(request, username, password, **kwargs)
+
+    def aauthenticate(self, request=None, **credentials):
+        """Returns a future of authenticate(), that is run by the login thread pool
+
+        See aio.py for details."""
+
+        return aio.submit_authentication(self.authenticate, request, request, **credentials)
+
+    def _authenticate(self, request, username, password, **kwargs):
+        """Looks up the user and checks the password with ModelBackend.authenticate()
+
+        This performs the blocking part of the login (the query and the
+        password hasher); if called by aauthenticate(), it runs in a thread of
+        the login executor, not in the event loop's thread (see aio.py)."""
+
+        if django.VERSION < (1, 11):
+            # ModelBackend.authenticate() does not accept the request
+            return super(MiniUserBackend, self).authenticate(username=username, password=password, **kwargs)
+        return super(MiniUserBackend, self).authenticate(request, username=username, password=password, **kwargs)
+
+    def get_user(self, user_id):
+        """Retrieves the user of the current session
+
+        This method is called by Django's AuthenticationMiddleware (lazily) on
+        every request of an authenticated user."""
+
+        if not settings.MINIUSER_USER_CACHE:
+            return super(MiniUserBackend, self).get_user(user_id)
+
+        user, version = cache.get_user(user_id)
+        if user is None:
+            user = super(MiniUserBackend, self).get_user(user_id)
+            if user is not None:
+                cache.set_user(user, version)
+
+        if user is not None and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Filter of existing login names
+
+Django's ModelBackend hashes the given password even for login names, that do
+not belong to any user, to hide their existence by timing. If
+MINIUSER_LOGIN_FILTER is enabled, MiniUserBackend (see backends.py) asks a
+Bloom filter of all normalized login names first. Login names, that are
+definitely not in the filter, are rejected without querying the database and,
+unless MINIUSER_LOGIN_FILTER_DUMMY_HASH is enabled, without hashing.
+
+A Bloom filter has no false negatives, but MINIUSER_LOGIN_FILTER_ERROR_RATE of
+the unknown login names pass it and are looked up as usual.
+
+The filter is stored in the app's cache (see cache.py) and every process keeps
+a copy, that is replaced after MINIUSER_LOGIN_FILTER_TIMEOUT seconds. It is
+built by the management command miniuser_login_filter, which has to be run at
+least every MINIUSER_LOGIN_FILTER_TIMEOUT seconds (i.e. by cron). Building
+reads all users, so it is never done while handling a request: as long as there
+is no up to date filter in the cache, every login name is looked up as usual.
+
+Login names, that are added after the filter was built, are recorded in the
+cache for twice the timeout (see signals.py), so they are found by any copy,
+that is still in use. Please note, that changes, that do not send signals
+(i.e. QuerySet.update()), are not picked up until the filter is rebuilt."""
+
+from __future__ import division
+
+# Python imports
+import hashlib
+import math
+import threading
+import time
+
+# Django imports
+from django.apps import apps
+from django.conf import settings
+
+# app imports
+from .cache import get_cache
+
+FILTER_KEY = 'miniuser:bloom'
+"""Cache key of the filter"""
+
+ADDED_PREFIX = 'miniuser:bloom:added'
+"""Prefix of all cache keys, that record login names added after the filter was built"""
+
+RETRY_INTERVAL = 60
+"""The time (in seconds), after which the cache is checked again, if it did not provide a filter"""
+
+
+class BloomFilter(object):
+    """A bit array, that tells, if a key has (probably) been added"""
+
+    def __init__(self, size, hashes, bits=None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray(bits) if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        """Returns an empty filter, that holds capacity keys with the given rate of false positives"""
+
+        capacity = max(capacity, 1)
+        size = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hashes = max(int(round(size / capacity * math.log(2))), 1)
+        return cls(size, hashes)
+
+    def positions(self, key):
+        # the positions are derived from two halves of one digest (double hashing)
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        first, second = int(digest[:16], 16), int(digest[16:32], 16)
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+    def to_dict(self):
+        return {'size': self.size, 'hashes': self.hashes, 'bits': bytes(self.bits)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['size'], data['hashes'], data['bits'])
+
+
+def get_keys(username, email):
+    """Returns the filter's keys of normalized login names
+
+    Usernames and email addresses are prefixed, so MINIUSER_LOGIN_NAME does not
+    have to be known, when the filter is built."""
+
+    keys = ['u:' + username]
+    if email:
+        keys.append('e:' + email)
+    return keys
+
+
+def get_added_cache_key(key):
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return '{}:{}'.format(ADDED_PREFIX, digest)
+
+
+def build():
+    """Builds the filter from the database and stores it in the cache
+
+    The login names are streamed from the database, so only the filter itself
+    is held in memory. This reads all users; it is called by the management
+    command miniuser_login_filter."""
+
+    # the filter is dated before the queries, so the records of login names,
+    #   that are added during the build, outlive every copy of it
+    built = time.time()
+    users = apps.get_model('miniuser', 'MiniUser').objects.all()
+
+    # leave room for the login names, that are added until the next rebuild
+    bloom = BloomFilter.for_capacity(int(2 * users.count() * 1.25), settings.MINIUSER_LOGIN_FILTER_ERROR_RATE)
+    for username, email in users.values_list('username_normalized', 'email_normalized').iterator():
+        for key in get_keys(username, email):
+            bloom.add(key)
+
+    data = dict(bloom.to_dict(), built=built)
+    get_cache().set(FILTER_KEY, data, 2 * settings.MINIUSER_LOGIN_FILTER_TIMEOUT)
+    return data
+
+
+class LoginNameFilter(object):
+    """Holds the process' copy of the filter"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.invalidate()
+
+    def invalidate(self):
+        """Discards the process' copy, it will be reloaded by the next lookup"""
+
+        with self.lock:
+            self.bloom = None
+            self.expires = None
+
+    def load(self):
+        """Replaces the process' copy by the cached filter
+
+        The filter is not built here. Outdated filters are ignored, because
+        the records of added login names do not cover them anymore; without
+        a filter, RETRY_INTERVAL passes before the cache is checked again."""
+
+        data = get_cache().get(FILTER_KEY)
+        now = time.time()
+        if data is None or now - data['built'] > settings.MINIUSER_LOGIN_FILTER_TIMEOUT:
+            bloom, expires = None, now + min(RETRY_INTERVAL, settings.MINIUSER_LOGIN_FILTER_TIMEOUT)
+        else:
+            bloom, expires = BloomFilter.from_dict(data), now + settings.MINIUSER_LOGIN_FILTER_TIMEOUT
+
+        with self.lock:
+            self.bloom = bloom
+            self.expires = expires
+
+    def add(self, username, email):
+        """Adds the login names of a user to the process' copy and records them in the cache"""
+
+        keys = get_keys(username, email)
+        with self.lock:
+            if self.bloom is not None:
+                for key in keys:
+                    self.bloom.add(key)
+        get_cache().set_many(
+            {get_added_cache_key(key): True for key in keys}, 2 * settings.MINIUSER_LOGIN_FILTER_TIMEOUT
+        )
+
+    def might_exist(self, keys):
+        """Returns False, if none of the given keys belongs to any user
+
+        While there is no filter or another thread loads it, True is
+        returned."""
+
+        if self.expires is None or time.time() > self.expires:
+            if self.load_lock.acquire(False):
+                try:
+                    self.load()
+                finally:
+                    self.load_lock.release()
+
+        with self.lock:
+            if self.bloom is None:
+                return True
+            if any(key in self.bloom for key in keys):
+                return True
+
+        # the login name may have been added by another process
+        return bool(get_cache().get_many([get_added_cache_key(key) for key in keys]))
+
+
+login_names = LoginNameFilter()
+"""The process' filter, maintained by the app's signal receivers"""
+
+
+def might_exist(login_name):
+    """Returns False, if login_name definitely does not belong to any user
+
+    The keys depend on MINIUSER_LOGIN_NAME, just like the lookup of
+    MiniUserManager.get_by_natural_key()."""
+
+    MiniUser = apps.get_model('miniuser', 'MiniUser')
+    keys = []
+    if settings.MINIUSER_LOGIN_NAME in ('username', 'both'):
+        keys.append('u:' + MiniUser.normalize_username_key(login_name))
+    if settings.MINIUSER_LOGIN_NAME in ('email', 'both'):
+        email = MiniUser.normalize_email_key(login_name)
+        if email:
+            keys.append('e:' + email)
+
+    return login_names.might_exist(keys)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Caching of authentication related lookups
+
+This file provides the functions to access the app's cache, which is
+configured by MINIUSER_CACHE_ALIAS. The cache is used to map login names to
+primary keys, so that MiniUserManager.get_by_natural_key() does not have to
+perform a lookup query for every login attempt. Furthermore, the user instances
+are cached for MiniUserBackend.get_user() (see backends.py), which is called on
+every request of an authenticated user.
+
+All cached login names share a generation, which is part of their cache keys.
+Whenever a user is created, deleted or changes his login names, the generation
+is incremented, so all previously cached entries become unreachable at once.
+This includes cached misses and the precedence of usernames over email
+addresses (MINIUSER_LOGIN_NAME = 'both'), which could not be invalidated
+reliably on a per-entry basis.
+
+Cached user instances are versioned per user instead. Every cached instance
+carries the version of the user at the time, it was cached; invalidating a
+user increments his version."""
+
+# Python imports
+import hashlib
+import time
+
+# Django imports
+from django.conf import settings
+from django.core.cache import caches
+
+NATURAL_KEY_PREFIX = 'miniuser:nk'
+"""Prefix of all cache keys, that map login names to primary keys"""
+
+NATURAL_KEY_GENERATION = 'miniuser:nk:generation'
+"""Cache key of the current generation of cached login names"""
+
+NATURAL_KEY_MISSING = 'miniuser:missing'
+"""Cached value for login names, that do not belong to any user"""
+
+USER_PREFIX = 'miniuser:user'
+"""Prefix of all cache keys, that store user instances"""
+
+
+def get_cache():
+    """Returns the cache, that is specified by MINIUSER_CACHE_ALIAS"""
+    return caches[settings.MINIUSER_CACHE_ALIAS]
+
+
+def get_natural_key_generation():
+    """Returns the current generation of cached login names
+
+    If there is no generation (yet or anymore, i.e. it was evicted), a new one
+    is derived from the current time, so that it will not collide with any
+    earlier generation."""
+
+    cache = get_cache()
+    generation = cache.get(NATURAL_KEY_GENERATION)
+    if generation is None:
+        cache.add(NATURAL_KEY_GENERATION, int(time.time() * 1000), None)
+        generation = cache.get(NATURAL_KEY_GENERATION)
+    return generation
+
+
+def get_natural_key_cache_key(generation, mode, login_name):
+    """Returns the cache key of a (normalized) login name
+
+    The login name is hashed to get a key of fixed length, that is safe to be
+    used with all of Django's cache backends."""
+
+    digest = hashlib.sha1(login_name.encode('utf-8')).hexdigest()
+    return '{}:{}:{}:{}'.format(NATURAL_KEY_PREFIX, generation, mode, digest)
+
+
+def invalidate_natural_keys():
+    """Invalidates all cached login names by incrementing the generation"""
+
+    try:
+        get_cache().incr(NATURAL_KEY_GENERATION)
+    except ValueError:
+        # there is no generation, so there are no reachable entries either
+        pass
+
+
+def get_user_cache_keys(pk):
+    """Returns the cache keys of a user's cached instance and its version"""
+
+    return '{}:{}'.format(USER_PREFIX, pk), '{}:{}:version'.format(USER_PREFIX, pk)
+
+
+def get_user(pk):
+    """Returns the cached user with the given primary key and his version
+
+    The cached user is only returned, if it was cached with the user's current
+    version, otherwise None is returned instead. Instance and version are
+    fetched with one single request.
+
+    The version has to be passed to set_user(), if the user is retrieved from
+    the database afterwards. If the user is invalidated in the meantime, he
+    will be cached with an outdated version and is not returned anymore."""
+
+    cache = get_cache()
+    user_key, version_key = get_user_cache_keys(pk)
+    values = cache.get_many([user_key, version_key])
+
+    entry = values.get(user_key)
+    version = values.get(version_key)
+    if version is None:
+        cache.add(version_key, int(time.time() * 1000), settings.MINIUSER_USER_CACHE_TIMEOUT)
+        version = cache.get(version_key)
+
+    if entry is None or version is None or entry[0] != version:
+        return None, version
+    return entry[1], version
+
+
+def set_user(user, version):
+    """Caches the user with the version, that was returned by get_user()"""
+
+    if version is not None:
+        get_cache().set(
+            get_user_cache_keys(user.pk)[0],
+            (version, user),
+            settings.MINIUSER_USER_CACHE_TIMEOUT
+        )
+
+
+def invalidate_users(pks):
+    """Invalidates the cached instances of the given users"""
+
+    cache = get_cache()
+    for pk in pks:
+        try:
+            cache.incr(get_user_cache_keys(pk)[1])
+        except ValueError:
+            # there is no version, so there is no valid cached instance either
+            pass
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Counting users
+
+Django's admin performs two COUNT queries on every request of the list view:
+the number of (filtered) results and the total number of users. On large
+tables, these queries are the dominant cost of the list view, because they
+have to scan the whole table (or index).
+
+This file provides cheaper alternatives, controlled by MINIUSER_ADMIN_COUNT_MODE:
+    - 'exact': the default, just like Django's admin
+    - 'estimate': the row estimates of the database's planner (PostgreSQL only,
+      other databases fall back to 'cached')
+    - 'cached': exact counts, that are cached for MINIUSER_ADMIN_COUNT_TIMEOUT
+      seconds (see cache.py)
+
+Estimates are returned as ApproximateCount, which renders as "~N" in
+templates, but behaves just like an integer otherwise. Cached counts are exact
+counts of the time they were cached, so they are returned as plain integers."""
+
+from __future__ import unicode_literals
+
+# Python imports
+import hashlib
+import json
+
+# Django imports
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.utils.encoding import python_2_unicode_compatible
+
+# app imports
+from .cache import get_cache
+
+COUNT_PREFIX = 'miniuser:count'
+"""Prefix of all cache keys, that store counts"""
+
+EXACT_COUNT_THRESHOLD = 10000
+"""Estimates below this threshold are replaced by exact counts, because they
+are cheap and estimates of small tables tend to be inaccurate."""
+
+
+@python_2_unicode_compatible
+class ApproximateCount(int):
+    """An integer, that renders as "~N" to mark it as approximate"""
+
+    def __str__(self):
+        return '~{}'.format(int(self))
+
+
+def count(queryset):
+    """Returns the number of rows of queryset, as configured by MINIUSER_ADMIN_COUNT_MODE"""
+
+    if settings.MINIUSER_ADMIN_COUNT_MODE == 'exact':
+        return queryset.count()
+
+    try:
+        if settings.MINIUSER_ADMIN_COUNT_MODE == 'estimate':
+            estimate = estimate_count(queryset)
+            if estimate is not None:
+                if estimate < EXACT_COUNT_THRESHOLD:
+                    return queryset.count()
+                return ApproximateCount(estimate)
+
+        return cached_count(queryset)
+    except EmptyResultSet:
+        # the queryset can not match any row (i.e. filtered by an empty list)
+        return 0
+
+
+def estimate_count(queryset):
+    """Returns the planner's estimate of the number of rows of queryset
+
+    For unfiltered querysets, the table statistics (pg_class.reltuples) are
+    used, otherwise the estimated rows of the query's plan (EXPLAIN). Returns
+    None, if the database does not provide estimates (or has no statistics
+    yet)."""
+
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+            estimate = row[0] if row else -1
+        else:
+            sql, params = queryset.order_by().query.sql_with_params()
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            if not isinstance(plan, list):
+                plan = json.loads(plan)
+            estimate = plan[0]['Plan']['Plan Rows']
+
+    # tables, that have never been analyzed, have no (or negative) reltuples
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+
+def cached_count(queryset):
+    """Returns the number of rows of queryset, cached for MINIUSER_ADMIN_COUNT_TIMEOUT seconds
+
+    Counts are cached per query, so every combination of filters has its own
+    entry. The counts are not marked as approximate; they were exact, when they
+    were cached."""
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    key = '{}:{}:{}'.format(
+        COUNT_PREFIX,
+        queryset.db,
+        hashlib.sha1('{}{!r}'.format(sql, params).encode('utf-8')).hexdigest()
+    )
+
+    cache = get_cache()
+    result = cache.get(key)
+    if result is None:
+        result = queryset.count()
+        cache.set(key, result, settings.MINIUSER_ADMIN_COUNT_TIMEOUT)
+
+    return result
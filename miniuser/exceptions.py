@@ -10,3 +10,8 @@ class MiniUserException(Exception):
 class MiniUserConfigurationException(MiniUserException):
     """Raised, if there is a mismatch/inconsistency in the app specific settings."""
     pass
+
+
+class MiniUserSaturatedException(MiniUserException):
+    """Raised, if the login thread pool does not accept further logins."""
+    pass
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Exporting users
+
+This file provides the means to export users as CSV or JSON-lines in constant
+memory. It is used by the miniuser_export management command and the admin's
+export action."""
+
+# Python imports
+import csv
+import datetime
+import json
+
+# Django imports
+import django
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import six
+
+# the fields, that are exported by default; the password is not exported,
+#   unless it is explicitly requested
+DEFAULT_EXPORT_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff',
+    'is_superuser', 'email_is_verified', 'registration_date', 'last_login',
+)
+
+
+class Echo(object):
+    """A file-like object, that returns the written value instead of storing it
+
+    This lets csv.writer produce single lines, see Django's documentation on
+    streaming large CSV files."""
+
+    def write(self, value):
+        return value
+
+
+def get_export_fields(model):
+    """Returns the names of all fields of model, that may be exported"""
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def iter_values(queryset, fields, chunk_size=2000):
+    """Returns an iterator over the values of fields of queryset
+
+    Neither model instances are created, nor is the result of the queryset
+    cached. On databases, that support it (i.e. PostgreSQL), server-side
+    cursors are used, that fetch chunk_size rows at once."""
+
+    queryset = queryset.values_list(*fields)
+    if django.VERSION >= (2, 0):
+        return queryset.iterator(chunk_size=chunk_size)
+    return queryset.iterator()  # pragma: nocover
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if six.PY2 and isinstance(value, six.text_type):  # pragma: nocover
+        # the csv module of Python 2 does only write bytes
+        return value.encode('utf-8')
+    return value
+
+
+def _csv_row(writer, row):
+    line = writer.writerow([_csv_value(value) for value in row])
+    if six.PY2:  # pragma: nocover
+        return line.decode('utf-8')
+    return line
+
+
+def iter_csv(rows, fields):
+    """Yields the lines of a CSV file (including a header) of rows
+
+    The lines are unicode on every version of Python, so they may be written
+    to text streams."""
+
+    writer = csv.writer(Echo())
+    yield _csv_row(writer, fields)
+    for row in rows:
+        yield _csv_row(writer, row)
+
+
+def iter_jsonl(rows, fields):
+    """Yields the lines of a JSON-lines file of rows, one object per row"""
+
+    for row in rows:
+        yield six.text_type(json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder, sort_keys=True)) + '\n'
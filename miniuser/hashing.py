@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Password hashing
+
+Hashing passwords is CPU-bound and by far the most expensive part of creating
+users and of logins. This file provides the means to hash passwords in
+parallel and the thread pool, that runs asynchronous logins (see aio.py).
+
+Please note, that this file must not import the app's models, because it is
+imported by the worker processes of the process pool."""
+
+# Python imports
+import logging
+import threading
+
+# Django imports
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+
+# app imports
+from .exceptions import (
+    MiniUserConfigurationException, MiniUserSaturatedException,
+)
+
+try:
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+except ImportError:  # pragma: nocover
+    # Python 2 without the 'futures' backport
+    ProcessPoolExecutor = ThreadPoolExecutor = None
+
+_login_executor = None
+_login_executor_lock = threading.Lock()
+_login_slots = None
+_login_thread = threading.local()
+
+SATURATED_ATTRIBUTE = '_miniuser_login_saturated'
+"""Attribute of requests, whose login was rejected by the saturated login thread pool"""
+
+logger = logging.getLogger(__name__)
+
+
+def encode_password(hasher, password, salt):
+    """Hashes a single password (executed in the worker processes)
+
+    The salt is generated by the calling process, so the worker processes do
+    not depend on Django's settings."""
+    return hasher.encode(password, salt)
+
+
+def get_process_pool(workers):
+    """Returns a new process pool with the given number of workers"""
+
+    if ProcessPoolExecutor is None:  # pragma: nocover
+        raise MiniUserConfigurationException(
+            "Parallel password hashing requires 'concurrent.futures'."
+        )
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def encode_passwords(executor, passwords):
+    """Hashes the given passwords with Django's default hasher on executor
+
+    This returns immediately with a list of futures (see concurrent.futures),
+    that provide the encoded passwords in order. Just like Django's
+    make_password(), None is not hashed, so the list contains None instead of
+    a future and the caller may set an unusable password."""
+
+    hasher = get_hasher()
+    return [
+        None if password is None else executor.submit(encode_password, hasher, password, hasher.salt())
+        for password in passwords
+    ]
+
+
+def get_login_executor():
+    """Returns the thread pool of the process, that authenticates logins
+
+    The pool is limited to MINIUSER_LOGIN_WORKERS threads, so at most that many
+    passwords are hashed at once. At most MINIUSER_LOGIN_QUEUE_SIZE further
+    logins may wait for a thread (see submit_login())."""
+
+    global _login_executor, _login_slots
+
+    if ThreadPoolExecutor is None:  # pragma: nocover
+        raise MiniUserConfigurationException(
+            "Asynchronous logins require 'concurrent.futures'."
+        )
+
+    with _login_executor_lock:
+        if _login_executor is None:
+            _login_executor = ThreadPoolExecutor(max_workers=settings.MINIUSER_LOGIN_WORKERS)
+            _login_slots = threading.BoundedSemaphore(
+                settings.MINIUSER_LOGIN_WORKERS + settings.MINIUSER_LOGIN_QUEUE_SIZE
+            )
+    return _login_executor
+
+
+def reset_login_executor(setting, **kwargs):
+    """Discards the login thread pool, if its size is changed (i.e. in tests)
+
+    Running tasks are finished by the old pool."""
+
+    global _login_executor
+
+    if setting in ('MINIUSER_LOGIN_WORKERS', 'MINIUSER_LOGIN_QUEUE_SIZE'):
+        with _login_executor_lock:
+            if _login_executor is not None:
+                _login_executor.shutdown(wait=False)
+            _login_executor = None
+
+
+setting_changed.connect(reset_login_executor, dispatch_uid='miniuser_reset_login_executor')
+
+
+def submit_login(function, *args, **kwargs):
+    """Runs function(*args, **kwargs) in the login thread pool and returns its future
+
+    If all threads are busy and the queue is full, MiniUserSaturatedException
+    is raised at once, instead of piling up waiting logins."""
+
+    executor = get_login_executor()
+    # the pool may be replaced meanwhile, so the slot is released to its own semaphore
+    slots = _login_slots
+    if not slots.acquire(False):
+        raise MiniUserSaturatedException(
+            "The login thread pool is saturated."
+        )
+
+    try:
+        future = executor.submit(_run_login, function, args, kwargs)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda future: slots.release())
+    return future
+
+
+def _run_login(function, args, kwargs):
+    # the pool's threads are not covered by Django's request handling, so
+    #   their database connections are cleaned up here
+    _login_thread.active = True
+    close_old_connections()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        close_old_connections()
+        _login_thread.active = False
+
+
+def in_login_thread():
+    """Returns True, if called by a task of the login thread pool
+
+    Tasks must not wait for further tasks of the pool, which could block all
+    of its threads."""
+    return getattr(_login_thread, 'active', False)
+
+
+def reject_saturated_login(request):
+    """Records a login, that is rejected, because the login thread pool is saturated
+
+    The rejection is logged and marked on request (if any), so that the app's
+    login view responds with '503 Service Unavailable' (see
+    views.unavailable_if_saturated()). Other callers of authenticate() just
+    see a failed login."""
+
+    logger.warning("Rejected a login, because the login thread pool is saturated.")
+    if request is not None:
+        setattr(request, SATURATED_ATTRIBUTE, True)
+
+
+def is_saturated_login(request):
+    """Returns True, if the login of request was rejected by reject_saturated_login()"""
+    return getattr(request, SATURATED_ATTRIBUTE, False)
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Processing large selections of users
+
+Admin actions, that affect many users, process them in chunks ordered by
+primary key, every chunk in its own short transaction. This keeps the rows
+locked only for a moment, instead of locking the whole selection for the
+duration of a single statement.
+
+Selections above MINIUSER_ADMIN_BACKGROUND_THRESHOLD users are processed by a
+background thread of the current process. The progress of these jobs is stored
+in the cache (see cache.py), so it can be reported to the user, that started
+the job, on his next request (see MiniUserAdmin.changelist_view()).
+
+Please note, that background jobs are lost, if the process is terminated
+before they are finished."""
+
+# Python imports
+import contextlib
+import threading
+import time
+import uuid
+
+# Django imports
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils.encoding import force_text
+
+# app imports
+from .cache import get_cache
+from .exceptions import MiniUserConfigurationException
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # pragma: nocover
+    # Python 2 without the 'futures' backport
+    ThreadPoolExecutor = None
+
+JOB_PREFIX = 'miniuser:job'
+"""Prefix of all cache keys, that store the progress of background jobs"""
+
+JOB_TIMEOUT = 24 * 60 * 60
+"""The time (in seconds), that the progress of background jobs is kept"""
+
+OWNER_LOCK_TIMEOUT = 10
+"""The time (in seconds), after which the lock of an owner's jobs expires"""
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def iter_pk_chunks(queryset, chunk_size, key=None):
+    """Yields the pks of queryset in ascending chunks of chunk_size
+
+    Every chunk is retrieved by a seek on the primary key, so rows, that no
+    longer match queryset after processing the previous chunks, do not shift
+    the following chunks.
+
+    If key is given, the chunks are ordered by key and pk instead and the seek
+    starts at the key of the previous chunk. This lets the database use an
+    index on the range filter of queryset (i.e. on is_active and last_login),
+    instead of scanning the primary key. The values of key must not be NULL
+    for the rows of queryset."""
+
+    if key is None:
+        queryset = queryset.order_by('pk').values_list('pk', flat=True)
+        last = None
+        while True:
+            chunk = list((queryset if last is None else queryset.filter(pk__gt=last))[:chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            last = chunk[-1]
+
+    queryset = queryset.order_by(key, 'pk').values_list(key, 'pk')
+    last = None
+    while True:
+        if last is None:
+            chunk = list(queryset[:chunk_size])
+        else:
+            # the first condition bounds the range of the index scan
+            seek = Q(**{'{}__gte'.format(key): last[0]}) & (
+                Q(**{'{}__gt'.format(key): last[0]}) | Q(**{key: last[0], 'pk__gt': last[1]})
+            )
+            chunk = list(queryset.filter(seek)[:chunk_size])
+        if not chunk:
+            return
+        yield [pk for value, pk in chunk]
+        last = chunk[-1]
+
+
+def process_in_chunks(queryset, function, chunk_size, progress=None, key=None):
+    """Calls function with the pks of every chunk of queryset
+
+    Every call is wrapped in its own transaction. Returns the sum of function's
+    return values (i.e. the number of updated rows); progress is called with
+    the sum after every chunk. key is passed to iter_pk_chunks()."""
+
+    processed = 0
+    for pks in iter_pk_chunks(queryset, chunk_size, key):
+        with transaction.atomic(using=queryset.db):
+            processed += function(pks)
+        if progress is not None:
+            progress(processed)
+
+    return processed
+
+
+def get_executor():
+    """Returns the thread pool of the process, that runs the background jobs
+
+    Jobs are executed one after another by a single thread, so they do not
+    compete for the database."""
+
+    global _executor
+
+    if ThreadPoolExecutor is None:  # pragma: nocover
+        raise MiniUserConfigurationException(
+            "Background jobs require 'concurrent.futures'."
+        )
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1)
+    return _executor
+
+
+def get_job_key(job_id):
+    return '{}:{}'.format(JOB_PREFIX, job_id)
+
+
+def get_owner_key(owner):
+    return '{}:owner:{}'.format(JOB_PREFIX, owner)
+
+
+@contextlib.contextmanager
+def lock_owner(owner):
+    """Serializes the updates of the list of owner's jobs
+
+    start_job() and pop_jobs() read and write the list, possibly in different
+    processes, so they hold this lock to not drop jobs of each other. The lock
+    is acquired by cache.add(), which is atomic, and expires after
+    OWNER_LOCK_TIMEOUT, if its holder dies."""
+
+    cache = get_cache()
+    key = '{}:lock'.format(get_owner_key(owner))
+    token = uuid.uuid4().hex
+    while not cache.add(key, token, OWNER_LOCK_TIMEOUT):
+        time.sleep(0.01)
+
+    try:
+        yield cache
+    finally:
+        # the lock may have expired and been acquired by somebody else
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def get_job(job_id):
+    """Returns the progress of a job as dict (description, processed, total, finished and failed)"""
+    return get_cache().get(get_job_key(job_id))
+
+
+def set_job(job_id, **progress):
+    job = get_job(job_id) or {}
+    job.update(progress)
+    get_cache().set(get_job_key(job_id), job, JOB_TIMEOUT)
+
+
+def start_job(owner, description, total, function, *args):
+    """Runs function(*args, progress=...) in the background
+
+    The job is registered for owner (i.e. the pk of the requesting user) and
+    its progress is updated by the progress callback, that is passed to
+    function. Returns the id of the job and its future."""
+
+    job_id = uuid.uuid4().hex
+    set_job(job_id, description=force_text(description), processed=0, total=total, finished=False, failed=False)
+
+    with lock_owner(owner) as cache:
+        cache.set(get_owner_key(owner), (cache.get(get_owner_key(owner)) or []) + [job_id], JOB_TIMEOUT)
+
+    return job_id, get_executor().submit(_run_job, job_id, function, args)
+
+
+def _run_job(job_id, function, args):
+    failed = True
+    try:
+        function(*args, progress=lambda processed: set_job(job_id, processed=processed))
+        failed = False
+    finally:
+        set_job(job_id, finished=True, failed=failed)
+        # the thread's connections are not closed by Django's request handling
+        connections.close_all()
+
+
+def pop_jobs(owner):
+    """Returns the progress of all jobs of owner; finished jobs are forgotten"""
+
+    if not get_cache().get(get_owner_key(owner)):
+        # most requests do not have to wait for the lock
+        return []
+
+    with lock_owner(owner) as cache:
+        jobs = []
+        for job_id in cache.get(get_owner_key(owner)) or []:
+            job = get_job(job_id)
+            if job is not None:
+                jobs.append((job_id, job))
+
+        running = [job_id for job_id, job in jobs if not job['finished']]
+        if running:
+            cache.set(get_owner_key(owner), running, JOB_TIMEOUT)
+        else:
+            cache.delete(get_owner_key(owner))
+
+    return [job for job_id, job in jobs]
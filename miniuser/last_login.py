@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Coalesced updates of the last login
+
+Django's update_last_login() saves the user on every login, which results in
+many small writes during login peaks. MiniUser replaces this receiver (see
+signals.py and apps.py):
+
+- the last login is only written, if the stored value is older than
+  MINIUSER_LAST_LOGIN_GRANULARITY minutes;
+
+- if MINIUSER_LAST_LOGIN_BUFFER is enabled, the timestamps are collected in the
+  process' memory and written by MiniUserManager.update_last_logins(). The
+  buffer is flushed by the login, that exceeds
+  MINIUSER_LAST_LOGIN_FLUSH_THRESHOLD buffered users or comes
+  MINIUSER_LAST_LOGIN_FLUSH_INTERVAL seconds after the last flush, and on
+  the exit of the process.
+
+There is no timer: the interval is only checked by logins, so the timestamps of
+an idle process are kept in memory until its next login or its exit. Call
+buffer.flush() (i.e. from a periodic task), if they have to be written sooner.
+
+If the buffer can not be written, the error is logged and the timestamps are
+kept for the next flush; the login, that triggered the flush, is not affected.
+Please note, that buffered timestamps are lost, if the process is killed."""
+
+# Python imports
+import atexit
+import logging
+import threading
+import time
+
+# Django imports
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginBuffer(object):
+    """Collects the last logins of users until they are written at once"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timestamps = {}
+        self.flushed = time.time()
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def add(self, pk, timestamp):
+        """Buffers the last login of a user and flushes the buffer, if it is due"""
+
+        with self.lock:
+            self.timestamps[pk] = timestamp
+            full = len(self.timestamps) >= settings.MINIUSER_LAST_LOGIN_FLUSH_THRESHOLD
+            due = full or time.time() - self.flushed >= settings.MINIUSER_LAST_LOGIN_FLUSH_INTERVAL
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Writes all buffered timestamps; returns the number of updated users
+
+        Database errors are logged and the timestamps are put back into the
+        buffer; they are retried by the next flush."""
+
+        with self.lock:
+            timestamps, self.timestamps = self.timestamps, {}
+            self.flushed = time.time()
+
+        if not timestamps:
+            return 0
+
+        try:
+            # the savepoint keeps a surrounding transaction (i.e. of
+            #   ATOMIC_REQUESTS) usable, if the update fails
+            with transaction.atomic():
+                return apps.get_model('miniuser', 'MiniUser').objects.update_last_logins(timestamps)
+        except DatabaseError:
+            logger.exception("Could not write the last logins of %d users", len(timestamps))
+            with self.lock:
+                # logins, that were buffered in the meantime, are more recent
+                for pk, timestamp in timestamps.items():
+                    self.timestamps.setdefault(pk, timestamp)
+            return 0
+
+
+buffer = LastLoginBuffer()
+"""The process' buffer of last logins"""
+
+
+@atexit.register
+def flush_on_exit():
+    try:
+        buffer.flush()
+    except Exception:  # pragma: nocover
+        # the database may be gone already
+        pass
+
+
+def is_due(user, now):
+    """Returns True, if the stored last login of user is outdated"""
+
+    if user.last_login is None:
+        return True
+    return (now - user.last_login).total_seconds() >= settings.MINIUSER_LAST_LOGIN_GRANULARITY * 60
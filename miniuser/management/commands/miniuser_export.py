@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Management command to export users
+
+The users are streamed from the database, so the export runs in constant
+memory, regardless of the number of users."""
+
+# Python imports
+import gzip
+import io
+import sys
+
+# Django imports
+from django.core.management.base import BaseCommand, CommandError
+
+# app imports
+from miniuser.export import (
+    DEFAULT_EXPORT_FIELDS, get_export_fields, iter_csv, iter_jsonl,
+    iter_values,
+)
+from miniuser.models import MiniUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports users as CSV or JSON-lines to a file or stdout. The users are "
+        "streamed from the database, so the export runs in constant memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o',
+            default='-',
+            help="The file to write to (default: '-', stdout)"
+        )
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'jsonl'),
+            default='csv',
+            help="The format of the export (default: 'csv')"
+        )
+        parser.add_argument(
+            '--fields',
+            default=','.join(DEFAULT_EXPORT_FIELDS),
+            help="Comma-separated list of the exported fields (default: {})".format(
+                ','.join(DEFAULT_EXPORT_FIELDS))
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            default=False,
+            help="Compress the output with gzip (implied by an output file ending with '.gz')"
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help="The number of rows fetched from the database at once (default: 2000)"
+        )
+
+    def handle(self, *args, **options):
+        fields = [field.strip() for field in options['fields'].split(',') if field.strip()]
+        unknown = set(fields) - set(get_export_fields(MiniUser))
+        if not fields or unknown:
+            raise CommandError("Unknown fields: {}".format(', '.join(sorted(unknown))))
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size has to be a positive integer")
+
+        rows = iter_values(MiniUser.objects.order_by('pk'), fields, options['chunk_size'])
+        lines = (iter_csv if options['format'] == 'csv' else iter_jsonl)(rows, fields)
+
+        output = options['output']
+        compress = options['gzip'] or output.endswith('.gz')
+
+        if output == '-':
+            if compress:
+                stream = io.TextIOWrapper(
+                    gzip.GzipFile(fileobj=getattr(sys.stdout, 'buffer', sys.stdout), mode='wb'),
+                    encoding='utf-8'
+                )
+            else:
+                stream = self.stdout
+                stream.ending = ''
+        elif compress:
+            stream = io.TextIOWrapper(gzip.open(output, 'wb'), encoding='utf-8', newline='')
+        else:
+            stream = io.open(output, 'w', encoding='utf-8', newline='')
+
+        count = -1 if options['format'] == 'csv' else 0
+        try:
+            for line in lines:
+                stream.write(line)
+                count += 1
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+
+        if output != '-':
+            self.stdout.write(self.style.SUCCESS("Exported {} users to '{}'".format(count, output)))
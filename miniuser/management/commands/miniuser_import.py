@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Management command to import users
+
+The users are read from CSV or JSON-lines files and are created in batches
+by MiniUserManager.bulk_create_users()."""
+
+# Python imports
+import collections
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+# Django imports
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.utils import six
+
+# app imports
+from miniuser.models import MiniUser
+
+# the fields, that are read from the input files; all other fields are ignored
+IMPORT_FIELDS = ('username', 'email', 'password', 'encoded_password', 'first_name', 'last_name')
+
+
+def decode_value(value):
+    """Returns value of a CSV row as unicode
+
+    On Python 2, the csv module reads bytes, that are UTF-8 encoded."""
+
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return value
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports users from a CSV or JSON-lines file. The file is streamed, so "
+        "files of any size may be imported. Supported fields are: {}."
+    ).format(', '.join(IMPORT_FIELDS))
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help="The file to import ('-' reads from stdin)"
+        )
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'jsonl'),
+            help="The format of the file (default: determined by the file's extension, 'csv' for stdin)"
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="The number of users, that are inserted in one transaction (default: 1000)"
+        )
+        parser.add_argument(
+            '--hash-workers',
+            type=int,
+            default=None,
+            help="The number of processes used to hash passwords (default: hash in this process)"
+        )
+        parser.add_argument(
+            '--start-line',
+            type=int,
+            default=None,
+            help="Skip the given number of records, i.e. to resume an aborted import"
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=None,
+            help=(
+                "A file, that keeps track of the number of processed records. If it "
+                "exists, the import is resumed from there (unless --start-line is given)"
+            )
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size has to be a positive integer")
+
+        self.verbosity = options['verbosity']
+        self.checkpoint = options['checkpoint']
+
+        start = options['start_line']
+        if start is None:
+            start = self.read_checkpoint()
+
+        fmt = options['format']
+        if fmt is None:
+            fmt = 'jsonl' if os.path.splitext(options['path'])[1] in ('.jsonl', '.ndjson') else 'csv'
+
+        if options['path'] == '-':
+            stream = sys.stdin
+        else:
+            try:
+                if six.PY2 and fmt == 'csv':
+                    # the csv module of Python 2 does not support unicode
+                    #   input, so the rows are decoded by read_records()
+                    stream = io.open(options['path'], 'rb')
+                else:
+                    stream = io.open(options['path'], encoding='utf-8', newline='')
+            except (IOError, OSError) as e:
+                raise CommandError("Could not open '{}': {}".format(options['path'], e))
+
+        # the record numbers of the users, that are handed to
+        #   bulk_create_users() and are not yet processed
+        self.record_numbers = collections.deque()
+        self.processed = 0
+        self.reported_errors = 0
+        self.records = start
+        self.invalid = 0
+
+        started = time.time()
+        try:
+            created, errors = MiniUser.objects.bulk_create_users(
+                self.validated_records(self.read_records(stream, fmt), start),
+                batch_size=options['batch_size'],
+                hash_workers=options['hash_workers'],
+                progress=self.progress
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        elapsed = max(time.time() - started, 1e-6)
+
+        self.write_checkpoint(self.records)
+
+        self.stdout.write(self.style.SUCCESS(
+            "Created {} users, skipped {} records in {:.1f}s ({:.1f} rows/sec)".format(
+                created,
+                len(errors) + self.invalid,
+                elapsed,
+                (self.records - start) / elapsed
+            )
+        ))
+
+    def read_records(self, stream, fmt):
+        """Yields the records of stream as dictionaries of IMPORT_FIELDS"""
+
+        if fmt == 'csv':
+            for record in csv.DictReader(stream):
+                if six.PY2:  # pragma: nocover
+                    record = dict((k, decode_value(v)) for k, v in record.items())
+                # CSV has no notion of missing values
+                yield dict((k, v) for k, v in record.items() if k in IMPORT_FIELDS and v != '')
+        else:
+            for line in stream:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    record = e
+                if not isinstance(record, dict):
+                    # invalid records are yielded, so they get reported with
+                    #   the correct record number
+                    yield record
+                else:
+                    yield dict((k, v) for k, v in record.items() if k in IMPORT_FIELDS)
+
+    def validated_records(self, records, start):
+        """Yields the valid records, starting after the record number start
+
+        Invalid records are reported and skipped."""
+
+        for number, record in enumerate(records, start=1):
+            if number <= start:
+                continue
+            self.records = number
+
+            try:
+                if not isinstance(record, dict):
+                    raise ValidationError("Invalid record: {}".format(record))
+                self.validate_record(record)
+            except ValidationError as e:
+                self.invalid += 1
+                self.report_error(number, '; '.join(e.messages))
+                continue
+
+            self.record_numbers.append(number)
+            yield record
+
+    def validate_record(self, record):
+        """Validates and normalizes the login names of a single record"""
+
+        if not record.get('username'):
+            raise ValidationError("The username must be set!")
+        record['username'] = MiniUser.normalize_username(record['username'])
+        MiniUser.username_validator(record['username'])
+
+        if record.get('email'):
+            record['email'] = MiniUser.objects.normalize_email(record['email']).lower()
+            validate_email(record['email'])
+
+    def progress(self, processed, created, errors):
+        """Reports the errors and the progress of a batch and saves the checkpoint"""
+
+        for index, message in errors[self.reported_errors:]:
+            self.report_error(self.record_numbers[index - self.processed], message)
+        self.reported_errors = len(errors)
+
+        for i in range(processed - self.processed):
+            number = self.record_numbers.popleft()
+        self.processed = processed
+
+        self.write_checkpoint(number)
+
+        if self.verbosity >= 1:
+            self.stdout.write("Processed {} records, created {} users".format(number, created))
+
+    def report_error(self, number, message):
+        if self.verbosity >= 1:
+            self.stderr.write("Record {}: {}".format(number, message))
+
+    def read_checkpoint(self):
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint) as f:
+            try:
+                return int(f.read().strip() or 0)
+            except ValueError:
+                raise CommandError("Invalid checkpoint file '{}'".format(self.checkpoint))
+
+    def write_checkpoint(self, number):
+        if self.checkpoint is None:
+            return
+        with open(self.checkpoint, 'w') as f:
+            f.write('{}\n'.format(number))
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Management command to rebuild the filter of login names
+
+The filter (see bloom.py) is rebuilt from the database and stored in the
+app's cache, where the processes pick it up, once their copies expire."""
+
+# Python imports
+import time
+
+# Django imports
+from django.core.management.base import BaseCommand
+
+# app imports
+from miniuser import bloom
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the filter of existing login names, that is used by "
+        "MINIUSER_LOGIN_FILTER, and stores it in the cache."
+    )
+
+    def handle(self, *args, **options):
+        start = time.time()
+        data = bloom.build()
+        bloom.login_names.invalidate()
+
+        self.stdout.write(self.style.SUCCESS("Built the filter of login names in {:.1f}s ({} bytes)".format(
+            time.time() - start, len(data['bits'])
+        )))
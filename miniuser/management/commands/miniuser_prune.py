@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Management command to prune dormant accounts
+
+The accounts are selected by range queries on registration_date and
+last_login, that are served by the indexes of MiniUser.Meta. They are
+deactivated or deleted in batches (see MiniUserManager.update_status() and
+MiniUserManager.delete_users()), that seek on the same columns, so every batch
+is retrieved from the index as well; the optional rate limit spreads the
+writes over time, so that replicas are able to keep up."""
+
+# Python imports
+import time
+from datetime import timedelta
+
+# Django imports
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+# app imports
+from miniuser.models import MiniUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Deactivates or deletes accounts, that were never activated or have "
+        "not been used for a long time. Staff users and superusers are never "
+        "pruned."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--never-activated',
+            type=int,
+            metavar='DAYS',
+            help=(
+                "Select inactive users, that registered more than DAYS days ago and never verified their email "
+                "address (requires '--action delete')"
+            )
+        )
+        parser.add_argument(
+            '--dormant',
+            type=int,
+            metavar='DAYS',
+            help="Select active users, that did not log in for more than DAYS days"
+        )
+        parser.add_argument(
+            '--action',
+            choices=('deactivate', 'delete'),
+            default='deactivate',
+            help="What to do with the selected users (default: 'deactivate')"
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="The number of users processed per transaction (default: 1000)"
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=None,
+            help="The maximum number of users processed per second (default: unlimited)"
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            help="Only count the selected users, without changing them"
+        )
+
+    def get_selections(self, options):
+        """Returns a list of (description, queryset, key) tuples of the selected users
+
+        key is the indexed column of the range query, that the batches seek on."""
+
+        now = timezone.now()
+        users = MiniUser.objects.filter(is_staff=False, is_superuser=False)
+
+        selections = []
+        if options['never_activated'] is not None:
+            # users, that were deactivated deliberately, usually verified their
+            # email address before; last_login is no indicator, as it defaults
+            # to the time of the registration
+            selections.append((
+                'never activated',
+                users.filter(
+                    is_active=False,
+                    registration_date__lt=now - timedelta(days=options['never_activated']),
+                    email_is_verified=False,
+                ),
+                'registration_date'
+            ))
+        if options['dormant'] is not None:
+            selections.append((
+                'dormant',
+                users.filter(is_active=True, last_login__lt=now - timedelta(days=options['dormant'])),
+                'last_login'
+            ))
+
+        return selections
+
+    def get_throttle(self, rate):
+        """Returns a progress callback, that sleeps to keep the rate of processed users"""
+
+        start = time.time()
+
+        def throttle(processed):
+            delay = processed / rate - (time.time() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+        return throttle if rate else None
+
+    def handle(self, *args, **options):
+        if options['never_activated'] is None and options['dormant'] is None:
+            raise CommandError("Please specify '--never-activated' and/or '--dormant'")
+        if min(days for days in (options['never_activated'], options['dormant'], 0) if days is not None) < 0:
+            raise CommandError("The number of days must not be negative")
+        if options['never_activated'] is not None and options['action'] == 'deactivate':
+            raise CommandError("Users, that were never activated, are inactive already; use '--action delete'")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size has to be a positive integer")
+        if options['rate'] is not None and options['rate'] <= 0:
+            raise CommandError("--rate has to be a positive number")
+
+        verb = 'deleted' if options['action'] == 'delete' else 'deactivated'
+
+        for description, queryset, key in self.get_selections(options):
+            if options['dry_run']:
+                self.stdout.write("{} {} users would be {}".format(queryset.count(), description, verb))
+                continue
+
+            start = time.time()
+            throttle = self.get_throttle(options['rate'])
+            if options['action'] == 'delete':
+                processed = MiniUser.objects.delete_users(queryset, options['batch_size'], throttle, key)
+            else:
+                processed = MiniUser.objects.set_active(queryset, False, options['batch_size'], throttle, key)
+            elapsed = time.time() - start
+
+            self.stdout.write(self.style.SUCCESS("{} {} {} users in {:.1f}s ({:.0f} rows/sec)".format(
+                verb.capitalize(), processed, description, elapsed, processed / elapsed if elapsed else 0
+            )))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Management command to create the search index
+
+The search modes 'trigram' and 'fts5' (see MINIUSER_ADMIN_SEARCH_MODE) require
+additional database structures, that are created (or removed) by this command."""
+
+# Django imports
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# app imports
+from miniuser.models import MiniUser
+from miniuser.search import (
+    SEARCH_MODE_VENDORS, create_search_index, drop_search_index,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the database structures, that are required by the search mode "
+        "of MINIUSER_ADMIN_SEARCH_MODE ('trigram' or 'fts5')."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            choices=sorted(SEARCH_MODE_VENDORS),
+            default=None,
+            help="The search mode (default: MINIUSER_ADMIN_SEARCH_MODE)"
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            default=False,
+            help="Remove the database structures instead of creating them"
+        )
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help="The database to use (default: '{}')".format(DEFAULT_DB_ALIAS)
+        )
+
+    def handle(self, *args, **options):
+        mode = options['mode'] or settings.MINIUSER_ADMIN_SEARCH_MODE
+        if mode not in SEARCH_MODE_VENDORS:
+            raise CommandError("The search mode '{}' does not require a search index.".format(mode))
+
+        connection = connections[options['database']]
+        if connection.vendor != SEARCH_MODE_VENDORS[mode]:
+            raise CommandError("The search mode '{}' is not supported by '{}'.".format(mode, connection.vendor))
+
+        if options['drop']:
+            statements = drop_search_index(connection, mode)
+        else:
+            statements = create_search_index(connection, mode, MiniUser)
+
+        if options['verbosity'] >= 2:
+            for statement in statements:
+                self.stdout.write(statement)
+        self.stdout.write(self.style.SUCCESS("Search index for '{}' {}.".format(
+            mode, 'removed' if options['drop'] else 'created')))
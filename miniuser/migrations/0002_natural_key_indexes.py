@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Adds case-insensitive indexes for MiniUserManager.get_by_natural_key()
+
+get_by_natural_key() uses 'iexact' lookups on username and email. Depending on
+the database backend, Django compiles these lookups to expressions, that can
+not be served by the plain unique indexes of 0001_initial:
+
+    - PostgreSQL/Oracle: UPPER(col) = UPPER(%s)
+    - SQLite: col LIKE %s ESCAPE '\\'
+
+The indexes are created with raw SQL, because Django's Meta.indexes does not
+support expressions or collations (yet). MySQL compares case-insensitively by
+default, so the existing unique indexes are already sufficient there.
+
+On PostgreSQL, the indexes are built with CREATE INDEX CONCURRENTLY, so writes
+to the (possibly large) table are not blocked during the build. This requires
+the migration to run outside of a transaction."""
+
+from django.db import migrations
+
+INDEXES = (
+    ('miniuser_username_ci_idx', 'username'),
+    ('miniuser_email_ci_idx', 'email'),
+)
+
+
+def get_concurrently(schema_editor):
+    """Returns the keyword to build or drop indexes without blocking writes
+
+    PostgreSQL does not allow this inside of a transaction."""
+
+    if schema_editor.connection.vendor == 'postgresql' and not schema_editor.connection.in_atomic_block:
+        return ' CONCURRENTLY'
+    return ''
+
+
+def create_indexes(apps, schema_editor):
+    """Creates the backend-specific case-insensitive indexes"""
+
+    vendor = schema_editor.connection.vendor
+    table = schema_editor.quote_name(apps.get_model('miniuser', 'MiniUser')._meta.db_table)
+
+    for name, column in INDEXES:
+        column = schema_editor.quote_name(column)
+        if vendor == 'postgresql':
+            expression = 'UPPER({}::text)'.format(column)
+        elif vendor == 'oracle':
+            expression = 'UPPER({})'.format(column)
+        elif vendor == 'sqlite':
+            expression = '{} COLLATE NOCASE'.format(column)
+        else:
+            continue
+        schema_editor.execute('CREATE INDEX{} {} ON {} ({})'.format(
+            get_concurrently(schema_editor), schema_editor.quote_name(name), table, expression))
+
+
+def drop_indexes(apps, schema_editor):
+    """Removes the indexes created by create_indexes()"""
+
+    if schema_editor.connection.vendor not in ('postgresql', 'oracle', 'sqlite'):
+        return
+
+    for name, column in INDEXES:
+        schema_editor.execute('DROP INDEX{} {}'.format(get_concurrently(schema_editor), schema_editor.quote_name(name)))
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can not run inside of a transaction
+    atomic = False
+
+    dependencies = [
+        ('miniuser', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
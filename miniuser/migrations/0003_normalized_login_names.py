@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Adds the (still nullable) fields for the normalized login names
+
+The fields are populated by 0004_populate_normalized_login_names and made
+unique by 0005_normalized_login_names_unique.
+
+MiniUserManager.get_by_natural_key() performs exact lookups on the normalized
+login names, so the case-insensitive indexes of 0002_natural_key_indexes are
+not needed anymore. They are dropped first, because SQLite rebuilds the table
+on AddField and would silently discard them."""
+
+from django.db import migrations, models
+
+INDEXES = (
+    ('miniuser_username_ci_idx', 'username'),
+    ('miniuser_email_ci_idx', 'email'),
+)
+
+
+def create_indexes(apps, schema_editor):
+    """Mirrors 0002_natural_key_indexes.create_indexes()"""
+
+    vendor = schema_editor.connection.vendor
+    table = schema_editor.quote_name(apps.get_model('miniuser', 'MiniUser')._meta.db_table)
+
+    for name, column in INDEXES:
+        column = schema_editor.quote_name(column)
+        if vendor == 'postgresql':
+            expression = 'UPPER({}::text)'.format(column)
+        elif vendor == 'oracle':
+            expression = 'UPPER({})'.format(column)
+        elif vendor == 'sqlite':
+            expression = '{} COLLATE NOCASE'.format(column)
+        else:
+            continue
+        schema_editor.execute('CREATE INDEX {} ON {} ({})'.format(
+            schema_editor.quote_name(name), table, expression))
+
+
+def drop_indexes(apps, schema_editor):
+    """Mirrors 0002_natural_key_indexes.drop_indexes()"""
+
+    if schema_editor.connection.vendor not in ('postgresql', 'oracle', 'sqlite'):
+        return
+
+    for name, column in INDEXES:
+        schema_editor.execute('DROP INDEX {}'.format(schema_editor.quote_name(name)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('miniuser', '0002_natural_key_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_indexes, create_indexes),
+        migrations.AddField(
+            model_name='miniuser',
+            name='username_normalized',
+            field=models.CharField(editable=False, max_length=150, null=True, verbose_name='normalized username'),
+        ),
+        migrations.AddField(
+            model_name='miniuser',
+            name='email_normalized',
+            field=models.CharField(editable=False, max_length=508, null=True, verbose_name='normalized email address'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Populates the normalized login names of existing users
+
+The rows are processed in chunks, ordered by their primary key. Every chunk is
+committed in its own transaction, so that this migration does not lock the
+whole table and may be run against a large, live table. If the migration is
+interrupted, it may simply be run again; it will continue with the rows, that
+are not yet populated."""
+
+# Python imports
+import unicodedata
+
+from django.db import migrations, transaction
+
+CHUNK_SIZE = 1000
+
+
+def casefold(value):
+    """Mirrors miniuser.models.casefold() at the time of this migration"""
+    return getattr(value, 'casefold', value.lower)()
+
+
+def populate_normalized_login_names(apps, schema_editor):
+    """Populates username_normalized and email_normalized in chunks"""
+
+    MiniUser = apps.get_model('miniuser', 'MiniUser')
+    db_alias = schema_editor.connection.alias
+    queryset = MiniUser.objects.using(db_alias).filter(username_normalized__isnull=True).order_by('pk')
+
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list('pk', 'username', 'email')[:CHUNK_SIZE])
+        if not rows:
+            break
+
+        with transaction.atomic(using=db_alias):
+            for pk, username, email in rows:
+                MiniUser.objects.using(db_alias).filter(pk=pk).update(
+                    username_normalized=casefold(unicodedata.normalize('NFKC', username)),
+                    email_normalized=email.lower() if email else None,
+                )
+
+        last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    # every chunk is committed on its own, see populate_normalized_login_names()
+    atomic = False
+
+    dependencies = [
+        ('miniuser', '0003_normalized_login_names'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_normalized_login_names, migrations.RunPython.noop),
+    ]
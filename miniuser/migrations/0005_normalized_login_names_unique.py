@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Makes the normalized login names unique"""
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicates(apps, schema_editor):
+    """Aborts the migration, if existing users collide after normalization
+
+    Usernames, that only differ by case, could be stored before. These have to
+    be resolved manually, before the unique constraint can be applied."""
+
+    MiniUser = apps.get_model('miniuser', 'MiniUser')
+    db_alias = schema_editor.connection.alias
+
+    for field in ('username_normalized', 'email_normalized'):
+        duplicates = list(
+            MiniUser.objects.using(db_alias)
+            .filter(**{'{}__isnull'.format(field): False})
+            .values(field)
+            .annotate(count=Count('pk'))
+            .filter(count__gt=1)
+            .values_list(field, flat=True)[:10]
+        )
+        if duplicates:
+            raise ValueError(
+                'Can not make {} unique, the following values are used by more than '
+                'one user: {}'.format(field, ', '.join(duplicates))
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('miniuser', '0004_populate_normalized_login_names'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='miniuser',
+            name='username_normalized',
+            field=models.CharField(editable=False, max_length=150, unique=True, verbose_name='normalized username'),
+        ),
+        migrations.AlterField(
+            model_name='miniuser',
+            name='email_normalized',
+            field=models.CharField(
+                editable=False, max_length=508, null=True, unique=True, verbose_name='normalized email address'
+            ),
+        ),
+    ]
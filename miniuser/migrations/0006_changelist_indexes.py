@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Adds the indexes, that match the ordering of the admin's list view
+
+Model indexes were introduced in Django 1.11, so this migration does nothing
+with Django 1.10 (see MiniUser.Meta)."""
+
+from django.db import migrations, models
+
+operations = []
+if hasattr(migrations, 'AddIndex'):
+    operations = [
+        migrations.AddIndex(
+            model_name='miniuser',
+            index=models.Index(
+                fields=['-is_superuser', '-is_staff', 'is_active', 'username', '-id'], name='miniuser_ordering_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='miniuser',
+            index=models.Index(
+                fields=['is_staff', '-is_superuser', 'is_active', 'username', '-id'], name='miniuser_staff_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='miniuser',
+            index=models.Index(
+                fields=['is_active', '-is_superuser', '-is_staff', 'username', '-id'], name='miniuser_active_idx'
+            ),
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('miniuser', '0005_normalized_login_names_unique'),
+    ]
+
+    operations = operations
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Adds the indexes, that serve the range queries of miniuser_prune
+
+Model indexes were introduced in Django 1.11, so this migration does nothing
+with Django 1.10 (see MiniUser.Meta)."""
+
+from django.db import migrations, models
+
+operations = []
+if hasattr(migrations, 'AddIndex'):
+    operations = [
+        migrations.AddIndex(
+            model_name='miniuser',
+            index=models.Index(fields=['is_active', 'registration_date'], name='miniuser_registration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='miniuser',
+            index=models.Index(fields=['is_active', 'last_login'], name='miniuser_last_login_idx'),
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('miniuser', '0006_changelist_indexes'),
+    ]
+
+    operations = operations
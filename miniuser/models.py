@@ -3,18 +3,32 @@
 
 from __future__ import unicode_literals
 
+# Python imports
+import unicodedata
+
 # Django imports
 from django.conf import settings
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.auth.models import BaseUserManager, PermissionsMixin
 from django.contrib.auth.validators import UnicodeUsernameValidator
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
 
 # app imports
+from . import autocomplete, bloom, cache, hashing, jobs
 from .exceptions import MiniUserConfigurationException
+from .signals import status_updated
+
+
+def casefold(value):
+    """Returns a casefolded version of value
+
+    Python 2 does not provide str.casefold(), so lower() is used as fallback."""
+    return getattr(value, 'casefold', value.lower)()
 
 
 class MiniUserManager(BaseUserManager):
@@ -23,6 +37,20 @@ class MiniUserManager(BaseUserManager):
     def create_user(self, username, email=None, password=None, **extra_fields):
         """Creates a new user."""
 
+        user = self._build_user(username, email, password, **extra_fields)
+        user.save(using=self._db)
+
+        return user
+
+    def _build_user(self, username, email=None, password=None, encoded_password=None, **extra_fields):
+        """Returns a new (unsaved) user, applying the app's rules for new users
+
+        This is used by create_user() and bulk_create_users(). A ValueError is
+        raised, if the user can not be created.
+
+        If encoded_password is given, it is used as the user's already hashed
+        password instead of hashing password."""
+
         if not username:
             raise ValueError(_('The username must be set!'))
 
@@ -41,7 +69,10 @@ class MiniUserManager(BaseUserManager):
 
         # set the password
         # TODO: Is some sort of validation included?
-        user.set_password(password)
+        if encoded_password is not None:
+            user.password = encoded_password
+        else:
+            user.set_password(password)
 
         # apply the app's activation mode
         user.is_active = settings.MINIUSER_DEFAULT_ACTIVE
@@ -50,10 +81,238 @@ class MiniUserManager(BaseUserManager):
         if not user.has_usable_password():
             user.is_active = False
 
-        user.save(using=self._db)
-
         return user
 
+    def bulk_create_users(self, users, batch_size=1000, hash_workers=None, progress=None):
+        """Creates new users in batches
+
+        users may be any iterable (i.e. a generator) of dictionaries, that
+        provide the arguments of create_user(). It is consumed lazily, so only
+        one batch is held in memory at any time. The same rules as in
+        create_user() are applied to every user. Users without email address
+        are stored with NULL instead of an empty string, so that several of
+        them can be created. Already hashed passwords may be provided as
+        'encoded_password' instead of 'password'.
+
+        Every batch is inserted with one query (see bulk_create()) inside of its
+        own transaction. Invalid users and users, whose username or email
+        address is already in use, are skipped instead of aborting the whole
+        operation.
+
+        Hashing the passwords is by far the most expensive part of this. If
+        hash_workers is given, the passwords are hashed by a pool of that many
+        processes (see hashing.py). The passwords of the next batch are hashed,
+        while the current batch is written to the database, so two batches are
+        held in memory in that case.
+
+        If progress is given, it is called after every batch with the number
+        of processed users, the number of created users and the list of
+        errors so far.
+
+        Returns a tuple (created, errors), where created is the number of
+        created users and errors is a list of (index, message) tuples for every
+        skipped user; index refers to the position in users."""
+
+        created = 0
+        errors = []
+
+        def write(batch, passwords=None):
+            written = self._bulk_insert_users(self._build_users(batch, passwords, errors), errors)
+            if progress is not None:
+                progress(batch[-1][0] + 1, created + written, errors)
+            return written
+
+        if not hash_workers:
+            for batch in self._iter_user_batches(users, batch_size):
+                created += write(batch)
+            return created, errors
+
+        executor = hashing.get_process_pool(hash_workers)
+        pending = None
+        try:
+            for batch in self._iter_user_batches(users, batch_size):
+                passwords = hashing.encode_passwords(
+                    executor,
+                    [data.pop('password', None) for index, data in batch]
+                )
+                if pending is not None:
+                    created += write(*pending)
+                pending = (batch, passwords)
+
+            if pending is not None:
+                created += write(*pending)
+        finally:
+            executor.shutdown()
+
+        return created, errors
+
+    @staticmethod
+    def _iter_user_batches(users, batch_size):
+        """Yields lists of (index, data) tuples of bulk_create_users()"""
+
+        batch = []
+        for index, data in enumerate(users):
+            batch.append((index, dict(data)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    def _build_users(self, batch, passwords, errors):
+        """Builds the users of one batch of bulk_create_users()
+
+        passwords may provide futures of the encoded passwords of the batch in
+        order (see hashing.encode_passwords()). Invalid users are reported to
+        errors. Returns a list of (index, user) tuples."""
+
+        users = []
+        for position, (index, data) in enumerate(batch):
+            try:
+                if passwords is not None and passwords[position] is not None:
+                    data['encoded_password'] = passwords[position].result()
+                user = self._build_user(
+                    data.pop('username', None),
+                    data.pop('email', None),
+                    data.pop('password', None),
+                    **data
+                )
+            except (TypeError, ValueError) as e:
+                errors.append((index, str(e)))
+                continue
+
+            users.append((index, user))
+
+        return users
+
+    def _bulk_insert_users(self, batch, errors):
+        """Inserts one batch of bulk_create_users()
+
+        Duplicates are reported to errors. Returns the number of inserted
+        users."""
+
+        username_message = self.model._meta.get_field('username').error_messages['unique']
+        email_message = self.model._meta.get_field('email').error_messages['unique']
+
+        for index, user in batch:
+            user.email = user.email or None
+            user.update_normalized_login_names()
+
+        # the login names, that are already in use
+        usernames = set(self.filter(
+            username_normalized__in=[user.username_normalized for index, user in batch]
+        ).values_list('username_normalized', flat=True))
+        emails = set(self.filter(
+            email_normalized__in=[user.email_normalized for index, user in batch if user.email_normalized]
+        ).values_list('email_normalized', flat=True))
+
+        users = []
+        for index, user in batch:
+            if user.username_normalized in usernames:
+                errors.append((index, str(username_message)))
+            elif user.email_normalized is not None and user.email_normalized in emails:
+                errors.append((index, str(email_message)))
+            else:
+                usernames.add(user.username_normalized)
+                if user.email_normalized is not None:
+                    emails.add(user.email_normalized)
+                users.append((index, user))
+
+        try:
+            with transaction.atomic(using=self.db):
+                self.bulk_create([user for index, user in users])
+        except IntegrityError:
+            # somebody else created one of the users in the meantime, so the
+            #   users are inserted one by one to find the conflicting ones
+            inserted = 0
+            for index, user in users:
+                try:
+                    with transaction.atomic(using=self.db):
+                        self.bulk_create([user])
+                    inserted += 1
+                except IntegrityError as e:
+                    errors.append((index, str(e)))
+            return inserted
+
+        return len(users)
+
+    def update_status(self, queryset, flags, batch_size=1000, progress=None, key=None):
+        """Updates the status flags of the users of queryset in batches
+
+        flags is a dict of the updated fields (see STATUS_FLAGS) and their new
+        values. The users are updated in batches ordered by pk, every batch in
+        its own transaction (see jobs.py).
+
+        QuerySet.update() does not send post_save, so status_updated is sent
+        once per batch instead, providing the pks of the batch. This is used to
+        invalidate the app's cache (see signals.py).
+
+        If progress is given, it is called after every batch with the number
+        of updated users. If key is given, the batches are ordered by key and
+        pk instead (see jobs.iter_pk_chunks()). Returns the number of updated
+        users."""
+
+        unknown = set(flags) - set(self.model.STATUS_FLAGS)
+        if unknown:
+            raise ValueError("Not a status flag: {}".format(', '.join(sorted(unknown))))
+
+        def update(pks):
+            updated = self.filter(pk__in=pks).update(**flags)
+            status_updated.send(sender=self.model, pks=pks, flags=flags)
+            return updated
+
+        return jobs.process_in_chunks(queryset, update, batch_size, progress, key)
+
+    def set_active(self, queryset, is_active, batch_size=1000, progress=None, key=None):
+        """Activates or deactivates the users of queryset (see update_status())"""
+        return self.update_status(queryset, {'is_active': is_active}, batch_size, progress, key)
+
+    def update_last_logins(self, timestamps, batch_size=1000):
+        """Sets the last login of many users with one UPDATE per batch
+
+        timestamps is a dict of pks and the users' new last login. Every batch
+        is written as UPDATE ... SET last_login = CASE pk WHEN ... END, so the
+        rows are touched once, instead of once per login (see last_login.py).
+        As QuerySet.update() does not send post_save, the cached instances of
+        the users are invalidated here. Returns the number of updated users."""
+
+        pks = sorted(timestamps)
+        updated = 0
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start:start + batch_size]
+            updated += self.filter(pk__in=batch).update(last_login=models.Case(
+                *[models.When(pk=pk, then=models.Value(timestamps[pk])) for pk in batch],
+                output_field=models.DateTimeField()
+            ))
+            if settings.MINIUSER_USER_CACHE:
+                cache.invalidate_users(batch)
+
+        return updated
+
+    def delete_users(self, queryset, batch_size=1000, progress=None, key=None):
+        """Deletes the users of queryset in batches
+
+        QuerySet.delete() loads all users (to send post_delete) and their
+        related objects at once. Instead, the users are deleted in batches
+        ordered by pk, every batch in its own transaction (see jobs.py). The
+        memberships of groups and the permissions of a batch are deleted first,
+        with one query per relation; the remaining related objects (i.e. the
+        admin's log entries) are deleted by Django's collector.
+
+        If progress is given, it is called after every batch with the number
+        of deleted users. key is handled like in update_status(). Returns the
+        number of deleted users."""
+
+        def delete(pks):
+            for field in self.model._meta.many_to_many:
+                field.remote_field.through._default_manager.filter(
+                    **{'{}__in'.format(field.m2m_field_name()): pks}
+                ).delete()
+            return self.filter(pk__in=pks).delete()[1].get(self.model._meta.label, 0)
+
+        return jobs.process_in_chunks(queryset, delete, batch_size, progress, key)
+
     def create_superuser(self, username, email, password, **extra_fields):
         """Creates a new superuser."""
 
@@ -70,6 +329,29 @@ class MiniUserManager(BaseUserManager):
 
         return user
 
+    def bulk_create(self, objs, *args, **kwargs):
+        """Inserts the given objects, while maintaining the normalized login names
+
+        Django's bulk_create() does not call the model's save()-method, so the
+        normalized fields have to be populated here."""
+
+        objs = list(objs)
+        for obj in objs:
+            obj.update_normalized_login_names()
+
+        objs = super(MiniUserManager, self).bulk_create(objs, *args, **kwargs)
+
+        # no post_save signals are sent, so the caches have to be invalidated here
+        if settings.MINIUSER_NATURAL_KEY_CACHE:
+            cache.invalidate_natural_keys()
+        if settings.MINIUSER_AUTOCOMPLETE:
+            autocomplete.index.add_many(objs)
+        if settings.MINIUSER_LOGIN_FILTER:
+            for obj in objs:
+                bloom.login_names.add(obj.username_normalized, obj.email_normalized)
+
+        return objs
+
     def get_by_natural_key(self, input):
         """Retrieves a single user by a unique field.
 
@@ -77,24 +359,92 @@ class MiniUserManager(BaseUserManager):
         the user. See django.contrib.auth.backends ModelBackend class.
 
         Depending on the app's settings, the user-object can be retrieved by
-        its username, its mail address or both."""
+        its username, its mail address or both.
+
+        The lookups are performed on the normalized login names by exact
+        comparison, so they are served by the fields' unique indexes.
+
+        If MINIUSER_NATURAL_KEY_CACHE is enabled, the primary keys of looked up
+        users are cached (see cache.py), so that repeated lookups only require
+        a query by primary key. Login names, that do not belong to any user,
+        are cached aswell and do not require any query at all.
+
+        Empty login names never match; in particular, they must not match the
+        users without email address (stored as NULL)."""
+
+        if not input:
+            raise self._does_not_exist()
+
+        username = self.model.normalize_username_key(input)
+        email = self.model.normalize_email_key(input)
+
+        if not settings.MINIUSER_NATURAL_KEY_CACHE:
+            return self._get_by_normalized_login_names(username, email)
+
+        generation = cache.get_natural_key_generation()
+        cache_key = cache.get_natural_key_cache_key(
+            generation,
+            settings.MINIUSER_LOGIN_NAME,
+            '\n'.join((username, email or ''))
+        )
+
+        pk = cache.get_cache().get(cache_key)
+        if pk == cache.NATURAL_KEY_MISSING:
+            raise self._does_not_exist()
+        if pk is not None:
+            # the user may have been removed without sending signals (i.e. raw
+            #   SQL), so fall back to the lookup in that case
+            user = self.filter(pk=pk).first()
+            if user is not None:
+                return user
+
+        try:
+            user = self._get_by_normalized_login_names(username, email)
+        except self.model.DoesNotExist:
+            cache.get_cache().set(
+                cache_key, cache.NATURAL_KEY_MISSING, settings.MINIUSER_NATURAL_KEY_CACHE_TIMEOUT)
+            raise
+
+        cache.get_cache().set(cache_key, user.pk, settings.MINIUSER_NATURAL_KEY_CACHE_TIMEOUT)
+        return user
+
+    def _get_by_normalized_login_names(self, username, email):
+        """Performs the actual lookup for get_by_natural_key()"""
 
         if settings.MINIUSER_LOGIN_NAME == 'both':
-            try:
-                user = self.get(username__iexact=input)
-            except MiniUser.DoesNotExist:
-                user = self.get(email__iexact=input)
-                # TODO: ok, the email is now used just like a username. Is this correct?
-                #   Shouldn't the email be validated to be used as username?
+            # fetch both candidates with one query; as username and email are
+            #   unique, there are at most two matching users and a match on the
+            #   username takes precedence over a match on the email address.
+            # TODO: ok, the email is now used just like a username. Is this correct?
+            #   Shouldn't the email be validated to be used as username?
+            user = None
+            condition = Q(username_normalized=username)
+            if email is not None:
+                # filtering on None would match the users without email address
+                condition |= Q(email_normalized=email)
+            for candidate in self.filter(condition)[:2]:
+                if candidate.username_normalized == username:
+                    return candidate
+                user = candidate
+            if user is None:
+                raise self._does_not_exist()
             return user
         elif settings.MINIUSER_LOGIN_NAME == 'username':
-            return self.get(username__iexact=input)
+            return self.get(username_normalized=username)
         elif settings.MINIUSER_LOGIN_NAME == 'email':
-            return self.get(email__iexact=input)
+            if email is None:
+                raise self._does_not_exist()
+            return self.get(email_normalized=email)
         else:
             # if this exception is raised, apps.py:check_correct_values() failed or was not executed!
             raise MiniUserConfigurationException(_("'MINIUSER_LOGIN_NAME' has an undefined value!"))
 
+    def _does_not_exist(self):
+        """Returns a DoesNotExist exception, just like get() would raise"""
+        return self.model.DoesNotExist(
+            '%s matching query does not exist.' % self.model._meta.object_name
+        )
+
 
 @python_2_unicode_compatible
 class MiniUser(AbstractBaseUser, PermissionsMixin):
@@ -128,6 +478,25 @@ class MiniUser(AbstractBaseUser, PermissionsMixin):
     )
     """The email address of the user. Must be unique"""
 
+    username_normalized = models.CharField(
+        _('normalized username'),
+        max_length=150,
+        unique=True,
+        editable=False
+    )
+    """The casefolded username, used to look up users on login. Will be
+    maintained automatically, see update_normalized_login_names()."""
+
+    email_normalized = models.CharField(
+        _('normalized email address'),
+        max_length=508,
+        unique=True,
+        null=True,
+        editable=False
+    )
+    """The lowercased email address, used to look up users on login. Will be
+    maintained automatically, see update_normalized_login_names()."""
+
     first_name = models.CharField(
         _('first name'),
         max_length=50,
@@ -189,14 +558,108 @@ class MiniUser(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'username'
     EMAIL_FIELD = 'email'
     REQUIRED_FIELDS = ['email']
+    STATUS_FLAGS = ('is_active', 'is_staff', 'is_superuser', 'email_is_verified')
+    """The fields, that may be updated by MiniUserManager.update_status()"""
 
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
 
+        # these indexes match the default ordering of the admin's list view
+        #   (see admin.py), with and without the filters applied; the admin
+        #   appends '-pk' to the ordering (up to Django 2.0)
+        # Model indexes were introduced in Django 1.11.
+        if hasattr(models, 'Index'):
+            indexes = [
+                models.Index(
+                    fields=['-is_superuser', '-is_staff', 'is_active', 'username', '-id'],
+                    name='miniuser_ordering_idx'
+                ),
+                models.Index(
+                    fields=['is_staff', '-is_superuser', 'is_active', 'username', '-id'],
+                    name='miniuser_staff_idx'
+                ),
+                models.Index(
+                    fields=['is_active', '-is_superuser', '-is_staff', 'username', '-id'],
+                    name='miniuser_active_idx'
+                ),
+                # these indexes serve the range queries of miniuser_prune
+                models.Index(fields=['is_active', 'registration_date'], name='miniuser_registration_idx'),
+                models.Index(fields=['is_active', 'last_login'], name='miniuser_last_login_idx'),
+            ]
+
     def __str__(self):
         return self.get_username()
 
+    @classmethod
+    def normalize_username_key(cls, username):
+        """Returns the normalized username, as stored in username_normalized"""
+        return casefold(unicodedata.normalize('NFKC', username))
+
+    @classmethod
+    def normalize_email_key(cls, email):
+        """Returns the normalized email address, as stored in email_normalized
+
+        Users without email address are stored as NULL, so they do not collide
+        with the unique constraint."""
+        return email.lower() if email else None
+
+    def update_normalized_login_names(self):
+        """Populates the normalized login names from username and email"""
+
+        if self.username is not None:
+            self.username_normalized = self.normalize_username_key(self.username)
+        self.email_normalized = self.normalize_email_key(self.email)
+
+    def save(self, *args, **kwargs):
+        """Keeps the normalized login names in sync on every save
+
+        Additionally, it is tracked, if the login names have been changed by
+        this save, and what they were before. This is evaluated by the app's
+        post_save receivers."""
+
+        login_names = (self.username_normalized, self.email_normalized)
+        self.update_normalized_login_names()
+        self._login_names_changed = login_names != (self.username_normalized, self.email_normalized)
+        self._previous_login_names = login_names
+
+        # if only some fields are saved, include the normalized ones aswell
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'username' in update_fields:
+                update_fields.add('username_normalized')
+            if 'email' in update_fields:
+                update_fields.add('email_normalized')
+            kwargs['update_fields'] = update_fields
+
+        super(MiniUser, self).save(*args, **kwargs)
+
+    def validate_unique(self, exclude=None):
+        """Checks, that the normalized login names are unique aswell
+
+        The normalized fields are not editable and therefore excluded from
+        Django's default validation of forms. Without this check, a username
+        that only differs by case would result in an IntegrityError."""
+
+        super(MiniUser, self).validate_unique(exclude=exclude)
+
+        exclude = exclude or []
+        errors = {}
+        others = self.__class__._default_manager.exclude(pk=self.pk)
+
+        if 'username' not in exclude and self.username and others.filter(
+            username_normalized=self.normalize_username_key(self.username)
+        ).exists():
+            errors['username'] = self._meta.get_field('username').error_messages['unique']
+
+        email = self.normalize_email_key(self.email)
+        if 'email' not in exclude and email and others.filter(email_normalized=email).exists():
+            errors['email'] = self._meta.get_field('email').error_messages['unique']
+
+        if errors:
+            raise ValidationError(errors)
+
     def get_full_name(self):
         """Prior to Django 2.0 this method was required.
 
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Searching users
+
+Django's admin searches every field of search_fields with 'icontains', which
+results in several LIKE '%term%' clauses, that can not be served by ordinary
+indexes and force sequential scans of the whole table.
+
+This file provides alternative search strategies, controlled by
+MINIUSER_ADMIN_SEARCH_MODE:
+    - 'default': Django's search, just like without this app
+    - 'prefix': matches the beginning of usernames and email addresses only,
+      which is served by the indexes of the normalized login names
+    - 'trigram': Django's search, served by trigram indexes (PostgreSQL only)
+    - 'fts5': a full-text search on an FTS5 table (SQLite only)
+
+The modes 'trigram' and 'fts5' require additional database structures, that
+are created by the miniuser_search_index management command."""
+
+from __future__ import unicode_literals
+
+# Django imports
+from django.db import connections
+from django.db.models import Q
+from django.utils import six
+
+# the databases, that are required by the search modes
+SEARCH_MODE_VENDORS = {
+    'trigram': 'postgresql',
+    'fts5': 'sqlite',
+}
+
+# the fields, that are searched by the modes 'trigram' and 'fts5'
+SEARCH_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+TRIGRAM_INDEX = 'miniuser_{}_trgm_idx'
+FTS5_TABLE = 'miniuser_miniuser_fts'
+
+
+def get_search_terms(search_term):
+    """Splits the search term into its words, like Django's admin does"""
+    return search_term.split()
+
+
+def prefix_search(queryset, search_term):
+    """Returns the users, whose username or email address start with every term
+
+    The terms are normalized just like the login names, so the search is case
+    insensitive. On SQLite, the prefix is expressed as a range, because its
+    LIKE operator can not use indexes of case sensitive columns."""
+
+    model = queryset.model
+    vendor = connections[queryset.db].vendor
+
+    for term in get_search_terms(search_term):
+        username = prefix_condition('username_normalized', model.normalize_username_key(term), vendor)
+        email = prefix_condition('email_normalized', model.normalize_email_key(term), vendor)
+        queryset = queryset.filter(username | email)
+
+    return queryset
+
+
+def prefix_condition(field, value, vendor):
+    """Returns a condition, that matches values of field starting with value
+
+    On SQLite, the prefix is expressed as a range, so the field's index is used
+    (see prefix_search())."""
+
+    if vendor == 'sqlite':
+        upper = value[:-1] + six.unichr(ord(value[-1]) + 1)
+        return Q(**{'{}__gte'.format(field): value, '{}__lt'.format(field): upper})
+    return Q(**{'{}__startswith'.format(field): value})
+
+
+def fts5_search(queryset, search_term):
+    """Returns the users, that match every term as prefix of any word
+
+    The matching users are looked up in the FTS5 table, that is maintained by
+    triggers (see create_search_index())."""
+
+    terms = ['"{}"*'.format(term.replace('"', '""')) for term in get_search_terms(search_term)]
+    if not terms:
+        return queryset
+
+    # this can not be expressed as pk__in=RawSQL(...), because SQLite
+    #   treats the additionally parenthesized subquery as a scalar
+    quote_name = connections[queryset.db].ops.quote_name
+    opts = queryset.model._meta
+    return queryset.extra(
+        where=['{}.{} IN (SELECT rowid FROM {fts} WHERE {fts} MATCH %s)'.format(
+            quote_name(opts.db_table), quote_name(opts.pk.column), fts=FTS5_TABLE
+        )],
+        params=[' '.join(terms)]
+    )
+
+
+def create_search_index(connection, mode, model):
+    """Creates the database structures of the search mode for model's table
+
+    Returns the executed SQL statements."""
+
+    table = model._meta.db_table
+    pk = model._meta.pk.column
+    statements = []
+
+    if mode == 'trigram':
+        statements.append('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for field in SEARCH_FIELDS:
+            # Django's 'icontains' compares UPPER("field"::text)
+            statements.append(
+                'CREATE INDEX IF NOT EXISTS {} ON {} USING gin (UPPER({}::text) gin_trgm_ops)'.format(
+                    TRIGRAM_INDEX.format(field), table, connection.ops.quote_name(field)
+                )
+            )
+
+    elif mode == 'fts5':
+        columns = ', '.join(SEARCH_FIELDS)
+        new_values = ', '.join('new.{}'.format(field) for field in SEARCH_FIELDS)
+        old_values = ', '.join('old.{}'.format(field) for field in SEARCH_FIELDS)
+        delete = "INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.{pk}, {old});".format(
+            fts=FTS5_TABLE, columns=columns, pk=pk, old=old_values
+        )
+        insert = 'INSERT INTO {fts}(rowid, {columns}) VALUES (new.{pk}, {new});'.format(
+            fts=FTS5_TABLE, columns=columns, pk=pk, new=new_values
+        )
+
+        statements.extend([
+            "CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, content='{table}', "
+            "content_rowid='{pk}')".format(fts=FTS5_TABLE, columns=columns, table=table, pk=pk),
+            'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END'.format(
+                fts=FTS5_TABLE, table=table, insert=insert),
+            'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END'.format(
+                fts=FTS5_TABLE, table=table, delete=delete),
+            'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN {delete} {insert} END'.format(
+                fts=FTS5_TABLE, table=table, delete=delete, insert=insert),
+            "INSERT INTO {fts}({fts}) VALUES ('rebuild')".format(fts=FTS5_TABLE),
+        ])
+
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+    return statements
+
+
+def drop_search_index(connection, mode):
+    """Removes the database structures of the search mode
+
+    Returns the executed SQL statements."""
+
+    statements = []
+
+    if mode == 'trigram':
+        statements.extend('DROP INDEX IF EXISTS {}'.format(TRIGRAM_INDEX.format(field)) for field in SEARCH_FIELDS)
+
+    elif mode == 'fts5':
+        statements.extend('DROP TRIGGER IF EXISTS {}_{}'.format(FTS5_TABLE, suffix) for suffix in ('ai', 'ad', 'au'))
+        statements.append('DROP TABLE IF EXISTS {}'.format(FTS5_TABLE))
+
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+    return statements
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Signals and signal receivers
+
+The receivers are connected in the AppConfig's ready()-method (see apps.py)."""
+
+# Django imports
+from django.conf import settings
+from django.dispatch import Signal
+from django.utils import timezone
+
+# app imports
+from . import autocomplete, bloom, cache, last_login
+
+status_updated = Signal(providing_args=['pks', 'flags'])
+"""Sent by MiniUserManager.update_status() once per batch of updated users
+
+This replaces post_save, which is not sent by QuerySet.update(). Receivers get
+the pks of the batch and the dict of updated flags."""
+
+
+def invalidate_natural_key_cache_on_save(sender, instance, created, **kwargs):
+    """Invalidates the cached login names, if a user's login names changed
+
+    MiniUser.save() tracks, if the login names have been changed. Saves, that
+    do not touch the login names (i.e. updating the last login), keep the
+    cache intact."""
+
+    if not settings.MINIUSER_NATURAL_KEY_CACHE:
+        return
+
+    if created or getattr(instance, '_login_names_changed', True):
+        cache.invalidate_natural_keys()
+
+
+def invalidate_natural_key_cache_on_delete(sender, instance, **kwargs):
+    """Invalidates the cached login names, if a user is deleted"""
+
+    if settings.MINIUSER_NATURAL_KEY_CACHE:
+        cache.invalidate_natural_keys()
+
+
+def invalidate_user_cache_on_save(sender, instance, **kwargs):
+    """Invalidates the cached instance of a user, if he is saved
+
+    This includes changes of the password or the user's activation status."""
+
+    if settings.MINIUSER_USER_CACHE:
+        cache.invalidate_users([instance.pk])
+
+
+def invalidate_user_cache_on_delete(sender, instance, **kwargs):
+    """Invalidates the cached instance of a user, if he is deleted"""
+
+    if settings.MINIUSER_USER_CACHE:
+        cache.invalidate_users([instance.pk])
+
+
+def invalidate_user_cache_on_status_update(sender, pks, **kwargs):
+    """Invalidates the cached instances of a batch of users, if their status is updated"""
+
+    if settings.MINIUSER_USER_CACHE:
+        cache.invalidate_users(pks)
+
+
+def update_autocomplete_index_on_save(sender, instance, created, **kwargs):
+    """Updates the autocomplete index, if a user's login names changed"""
+
+    if not settings.MINIUSER_AUTOCOMPLETE:
+        return
+
+    if created or getattr(instance, '_login_names_changed', True):
+        autocomplete.index.update(instance, created)
+
+
+def update_autocomplete_index_on_delete(sender, instance, **kwargs):
+    """Removes a deleted user from the autocomplete index"""
+
+    if settings.MINIUSER_AUTOCOMPLETE:
+        autocomplete.index.remove(instance.pk, (instance.username_normalized, instance.email_normalized))
+
+
+def update_login_filter_on_save(sender, instance, created, **kwargs):
+    """Adds a user's login names to the filter of existing login names
+
+    Removed login names are kept in the filter until it is rebuilt, which
+    only costs a regular lookup."""
+
+    if not settings.MINIUSER_LOGIN_FILTER:
+        return
+
+    if created or getattr(instance, '_login_names_changed', True):
+        bloom.login_names.add(instance.username_normalized, instance.email_normalized)
+
+
+def update_last_login(sender, user, **kwargs):
+    """Updates the last login of a user, replacing Django's receiver
+
+    The last login is skipped, if the stored value is recent enough, and
+    buffered, if MINIUSER_LAST_LOGIN_BUFFER is enabled (see last_login.py)."""
+
+    now = timezone.now()
+    if not last_login.is_due(user, now):
+        return
+
+    user.last_login = now
+    if settings.MINIUSER_LAST_LOGIN_BUFFER:
+        last_login.buffer.add(user.pk, now)
+    else:
+        user.save(update_fields=['last_login'])
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Throttling of login attempts
+
+MiniUserBackend (see backends.py) counts the failed login attempts per login
+name and per IP address. Once MINIUSER_LOGIN_THROTTLE_USERNAME_LIMIT or
+MINIUSER_LOGIN_THROTTLE_IP_LIMIT is exceeded within the last
+MINIUSER_LOGIN_THROTTLE_WINDOW seconds, further attempts are rejected before
+the user is looked up and the password is hashed.
+
+The counters approximate a sliding window: the attempts of the current fixed
+window are added to the attempts of the previous window, weighted by the part
+of the previous window, that is still covered by the sliding window. This
+needs two counters per key, instead of a timestamp per attempt.
+
+MINIUSER_LOGIN_THROTTLE_STORE selects, where the counters are kept:
+
+- 'memory': in the process' memory, limited to the
+  MINIUSER_LOGIN_THROTTLE_MAX_KEYS least recently used keys. Every process
+  counts on its own, so the effective limits are multiplied by the number of
+  processes;
+
+- 'cache': in the app's cache (see cache.py), which is shared between the
+  processes, if a shared cache backend (i.e. memcached) is configured."""
+
+from __future__ import division
+
+# Python imports
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Django imports
+from django.apps import apps
+from django.conf import settings
+
+# app imports
+from .cache import get_cache
+
+THROTTLE_PREFIX = 'miniuser:throttle'
+"""Prefix of all cache keys, that store the counters of login attempts"""
+
+
+class MemoryStore(object):
+    """Keeps the counters in a bounded LRU mapping of the process' memory
+
+    Every key maps to [window, current, previous], the index of the current
+    fixed window and the attempts of the current and the previous window."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = OrderedDict()
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+
+    def _roll(self, key, window):
+        # has to be called while holding the lock
+        counter = self.counters.get(key)
+        if counter is None:
+            return [window, 0, 0]
+        if counter[0] == window - 1:
+            return [window, 0, counter[1]]
+        if counter[0] < window - 1:
+            return [window, 0, 0]
+        return counter
+
+    def get(self, key, window):
+        """Returns the attempts of the current and the previous window"""
+
+        with self.lock:
+            counter = self._roll(key, window)
+            return counter[1], counter[2]
+
+    def hit(self, key, window):
+        """Counts an attempt in the current window"""
+
+        with self.lock:
+            counter = self._roll(key, window)
+            counter[1] += 1
+            self.counters.pop(key, None)
+            self.counters[key] = counter
+            while len(self.counters) > settings.MINIUSER_LOGIN_THROTTLE_MAX_KEYS:
+                self.counters.popitem(last=False)
+
+
+class CacheStore(object):
+    """Keeps the counters in the app's cache, one entry per key and window"""
+
+    def get_cache_key(self, key, window):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return '{}:{}:{}'.format(THROTTLE_PREFIX, digest, window)
+
+    def get(self, key, window):
+        """Returns the attempts of the current and the previous window"""
+
+        keys = (self.get_cache_key(key, window), self.get_cache_key(key, window - 1))
+        values = get_cache().get_many(keys)
+        return values.get(keys[0], 0), values.get(keys[1], 0)
+
+    def hit(self, key, window):
+        """Counts an attempt in the current window"""
+
+        cache = get_cache()
+        cache_key = self.get_cache_key(key, window)
+        # the entry has to outlive the following window, which reads it as previous window
+        cache.add(cache_key, 0, 2 * settings.MINIUSER_LOGIN_THROTTLE_WINDOW)
+        try:
+            cache.incr(cache_key)
+        except ValueError:
+            # evicted in the meantime
+            cache.set(cache_key, 1, 2 * settings.MINIUSER_LOGIN_THROTTLE_WINDOW)
+
+
+memory_store = MemoryStore()
+"""The process' counters, used by MINIUSER_LOGIN_THROTTLE_STORE = 'memory'"""
+
+
+def get_store():
+    """Returns the store, that is specified by MINIUSER_LOGIN_THROTTLE_STORE"""
+    return CacheStore() if settings.MINIUSER_LOGIN_THROTTLE_STORE == 'cache' else memory_store
+
+
+def get_keys(request, username):
+    """Returns the throttled keys of a login attempt and their limits
+
+    The login name is normalized, so that its variants share one counter."""
+
+    keys = []
+    if username:
+        MiniUser = apps.get_model('miniuser', 'MiniUser')
+        keys.append(
+            ('username:' + MiniUser.normalize_username_key(username), settings.MINIUSER_LOGIN_THROTTLE_USERNAME_LIMIT)
+        )
+    address = request.META.get('REMOTE_ADDR') if request is not None else None
+    if address:
+        keys.append(('ip:' + address, settings.MINIUSER_LOGIN_THROTTLE_IP_LIMIT))
+    return keys
+
+
+def get_window(now):
+    """Returns the index of the current fixed window and the elapsed part of it"""
+
+    window, elapsed = divmod(now, settings.MINIUSER_LOGIN_THROTTLE_WINDOW)
+    return int(window), elapsed / settings.MINIUSER_LOGIN_THROTTLE_WINDOW
+
+
+def is_throttled(request, username):
+    """Returns True, if a key of the login attempt exceeded its limit"""
+
+    store = get_store()
+    window, elapsed = get_window(time.time())
+    for key, limit in get_keys(request, username):
+        current, previous = store.get(key, window)
+        if current + previous * (1 - elapsed) >= limit:
+            return True
+    return False
+
+
+def register_failure(request, username):
+    """Counts a failed login attempt for all of its keys"""
+
+    store = get_store()
+    window = get_window(time.time())[0]
+    for key, limit in get_keys(request, username):
+        store.hit(key, window)
@@ -16,13 +16,20 @@ TODO: How does the namespacing or URLs work with different Django versions? (whe
 # Django imports
 from django.conf.urls import url
 
+# app imports
+from . import views
+
 try:
     # Django > 1.10
     from django.contrib.auth.views import LoginView, LogoutView
 
     def login_view():
         """Returns an url-statement using class-based views"""
-        return url(r'^login/$', LoginView.as_view(template_name='miniuser/login.html'), name='login')
+        return url(
+            r'^login/$',
+            views.unavailable_if_saturated(LoginView.as_view(template_name='miniuser/login.html')),
+            name='login'
+        )
 
     def logout_view():
         """Returns an url-statement using class-based views"""
@@ -34,7 +41,12 @@ except ImportError:
 
     def login_view():
         """Returns an url-statement using function-based views"""
-        return url(r'^login/$', login, {'template_name': 'miniuser/login.html'}, name='login')
+        return url(
+            r'^login/$',
+            views.unavailable_if_saturated(login),
+            {'template_name': 'miniuser/login.html'},
+            name='login'
+        )
 
     def logout_view():
         """Returns an url-statement using function-based views"""
@@ -45,4 +57,5 @@ app_name = 'miniuser'
 urlpatterns = [
     login_view(),
     logout_view(),
+    url(r'^autocomplete/$', views.autocomplete, name='autocomplete'),
 ]
@@ -1,2 +1,85 @@
 # -*- coding: utf-8 -*-
 """django-miniuser: views"""
+
+# Python imports
+from functools import wraps
+
+# Django imports
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.translation import ugettext as _
+from django.views.decorators.http import require_GET
+
+# app imports
+from . import autocomplete as autocomplete_index, hashing
+from .exceptions import MiniUserSaturatedException
+from .models import MiniUser
+
+AUTOCOMPLETE_LIMIT = 10
+"""The number of users returned by the autocomplete view by default"""
+
+AUTOCOMPLETE_MAX_LIMIT = 50
+"""The maximum number of users, that may be requested by the 'limit' parameter"""
+
+LOGIN_RETRY_AFTER = 5
+"""The time (in seconds), after which a rejected login may be retried"""
+
+
+def unavailable_if_saturated(view):
+    """Responds with '503 Service Unavailable', if the login thread pool is saturated
+
+    This wraps the login view, so that logins, that are rejected by
+    MiniUserBackend (see MINIUSER_LOGIN_EXECUTOR), are told to try again
+    later, instead of being shown a failed login."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            response = view(request, *args, **kwargs)
+        except MiniUserSaturatedException:
+            hashing.reject_saturated_login(request)
+        if not hashing.is_saturated_login(request):
+            return response
+
+        response = HttpResponse(
+            _("There are too many logins at the moment. Please try again later."),
+            status=503,
+            content_type='text/plain; charset=utf-8'
+        )
+        response['Retry-After'] = str(LOGIN_RETRY_AFTER)
+        return response
+
+    return wrapper
+
+
+@require_GET
+def autocomplete(request):
+    """Returns the users, whose username or email address start with 'q'
+
+    The view is only available to staff users, if MINIUSER_AUTOCOMPLETE is
+    enabled. The response contains a list of users (id, username and email)
+    and the source of the results ('index' or 'database').
+    See autocomplete.py for details."""
+
+    if not settings.MINIUSER_AUTOCOMPLETE:
+        raise Http404
+
+    if not (request.user.is_active and request.user.is_staff):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    term = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', AUTOCOMPLETE_LIMIT)), 1), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': "'limit' has to be an integer"}, status=400)
+
+    if not term:
+        return JsonResponse({'results': [], 'source': 'index'})
+
+    results = autocomplete_index.index.lookup(term, limit)
+    source = 'index'
+    if results is None:
+        results = autocomplete_index.database_lookup(MiniUser.objects.all(), term, limit)
+        source = 'database'
+
+    return JsonResponse({'results': results, 'source': source})
@@ -4,18 +4,23 @@
 These tests target the code in miniuser/admin.py."""
 
 # Python imports
-from unittest import skip  # noqa
+import base64
+import json
+from unittest import skip, skipUnless  # noqa
 
 # Django imports
 from django.contrib.admin import ModelAdmin
 from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
 from django.contrib.admin.sites import AdminSite
 from django.contrib.admin.templatetags.admin_list import _boolean_icon
+from django.db import connection, models
 from django.test import override_settings, tag
 from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 # app imports
+from miniuser import cache
 from miniuser.admin import MiniUserAdmin, MiniUserAdminStaffStatusFilter
 from miniuser.models import MiniUser
 
@@ -23,6 +28,19 @@ from miniuser.models import MiniUser
 from .utils.testcases import MiniuserTestCase
 
 
+def override_admin_attribute(testcase, name, value):
+    """Sets an attribute of MiniUserAdmin until the end of the test
+
+    The previous state is restored, whether the attribute is defined by
+    MiniUserAdmin itself or inherited from ModelAdmin."""
+
+    if name in MiniUserAdmin.__dict__:
+        testcase.addCleanup(setattr, MiniUserAdmin, name, MiniUserAdmin.__dict__[name])
+    else:
+        testcase.addCleanup(delattr, MiniUserAdmin, name)
+    setattr(MiniUserAdmin, name, value)
+
+
 @tag('admin')
 class MiniUserAdminStaffStatusFilterTest(MiniuserTestCase):
     """Tests the custom filter"""
@@ -317,3 +335,307 @@ class MiniUserAdminActionsTest(MiniuserTestCase):
         messages = list(response.wsgi_request._messages)
         self.assertEqual(len(messages), 2)
         self.assertEqual(str(messages[1]), '2 users were deactivated successfully.')
+
+    @override_settings(MINIUSER_ADMIN_LIST_DISPLAY=(
+        'username_color_status', 'email_with_status', 'status_aggregated', 'is_active', 'last_name',
+    ))
+    def test_action_export_csv(self):
+        """Exports the database fields of the list display as streamed CSV"""
+
+        u = MiniUser.objects.create(username='user', email='user@localhost', is_active=True)
+        MiniUser.objects.create(username='foo')
+
+        action_data = {
+            ACTION_CHECKBOX_NAME: [u.pk],
+            'action': 'action_export_csv',
+        }
+        response = self.client.post(reverse('admin:miniuser_miniuser_changelist'), action_data)
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(
+            b''.join(response.streaming_content).decode('utf-8').splitlines(),
+            [
+                'username,email,email_is_verified,is_staff,is_superuser,is_active,last_name',
+                'user,user@localhost,False,False,False,True,',
+            ]
+        )
+
+    def test_action_delete_users(self):
+        """Deletion of multiple users after a confirmation"""
+
+        u = MiniUser.objects.create(username='user', email='user@localhost')
+        v = MiniUser.objects.create(username='foo', email='foo@localhost')
+        w = MiniUser.objects.create(username='bar', email='bar@localhost')
+        url = reverse('admin:miniuser_miniuser_changelist')
+
+        # the confirmation lists the number of selected users only
+        response = self.client.post(url, {
+            ACTION_CHECKBOX_NAME: [u.pk, v.pk],
+            'action': 'action_delete_users',
+            'index': 0,
+        })
+        self.assertContains(response, 'Are you sure you want to delete the 2 selected users?')
+        self.assertContains(response, 'value="{}"'.format(u.pk))
+        self.assertEqual(MiniUser.objects.count(), 4)
+
+        response = self.client.post(url, {
+            ACTION_CHECKBOX_NAME: [u.pk, v.pk],
+            'action': 'action_delete_users',
+            'index': 0,
+            'post': 'yes',
+        }, follow=True)
+        self.assertEqual(list(MiniUser.objects.order_by('pk')), [self.superuser, w])
+        messages = [str(message) for message in response.context['messages']]
+        self.assertIn('2 users were deleted successfully.', messages)
+
+    def test_action_delete_users_select_across(self):
+        """All users matching the filters are deleted"""
+
+        u = MiniUser.objects.create(username='user', email='user@localhost')
+        MiniUser.objects.create(username='foo', email='foo@localhost')
+        url = reverse('admin:miniuser_miniuser_changelist') + '?is_active__exact=0'
+
+        # the checkboxes of the current page are checked aswell
+        response = self.client.post(url, {
+            ACTION_CHECKBOX_NAME: [u.pk],
+            'action': 'action_delete_users',
+            'index': 0,
+            'select_across': 1,
+        })
+        self.assertContains(response, 'name="select_across" value="1"')
+        self.assertContains(response, 'Are you sure you want to delete the 2 selected users?')
+
+        self.client.post(url, {
+            ACTION_CHECKBOX_NAME: [u.pk],
+            'action': 'action_delete_users',
+            'index': 0,
+            'select_across': 1,
+            'post': 'yes',
+        })
+        self.assertEqual(list(MiniUser.objects.all()), [self.superuser])
+
+
+@tag('admin')
+@skipUnless(connection.vendor == 'sqlite', 'Inspects the query plans of SQLite')
+@skipUnless(hasattr(models, 'Index'), 'Model indexes require Django 1.11')
+class MiniUserAdminIndexTest(MiniuserTestCase):
+    """The list view's ordering is served by indexes"""
+
+    def assertOrderedByIndex(self, queryset):
+        """Asserts, that SQLite neither scans nor sorts the whole table"""
+        for ordering in (MiniUserAdmin.ordering, MiniUserAdmin.ordering + ('-pk',)):
+            sql, params = queryset.order_by(*ordering)[:100].query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+            self.assertIn('USING INDEX miniuser_', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_ordering(self):
+        """The unfiltered list view is ordered by miniuser_ordering_idx"""
+        self.assertOrderedByIndex(MiniUser.objects.all())
+
+    def test_status_filter(self):
+        """Every branch of MiniUserAdminStaffStatusFilter is served by an index"""
+        for status in ('users', 'staff', 'superusers'):
+            f = MiniUserAdminStaffStatusFilter(None, {'status': status}, MiniUser, MiniUserAdmin)
+            self.assertOrderedByIndex(f.queryset(None, MiniUser.objects.all()))
+
+    def test_active_filter(self):
+        """The is_active filter is served by miniuser_active_idx"""
+        self.assertOrderedByIndex(MiniUser.objects.filter(is_active=True))
+
+
+@tag('admin')
+@override_settings(MINIUSER_ADMIN_KEYSET_PAGINATION=True)
+class MiniUserAdminKeysetPaginationTest(MiniuserTestCase):
+    """Tests targeting the keyset pagination of MiniUserChangeList"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = MiniUser.objects.create_superuser(
+            username='django',
+            password='django',
+            email='django@localhost'
+        )
+        MiniUser.objects.create(username='staff', email='staff@localhost', is_staff=True)
+        for name in ('a', 'b', 'c', 'd'):
+            MiniUser.objects.create(username=name, email='{}@localhost'.format(name), is_active=True)
+        MiniUser.objects.create(username='e', email='e@localhost')
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+        self.url = reverse('admin:miniuser_miniuser_changelist')
+        override_admin_attribute(self, 'list_per_page', 3)
+
+    def get_page(self, query_string=''):
+        response = self.client.get(self.url + query_string)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_pages(self):
+        """The pages follow the default ordering in both directions"""
+
+        expected = ['django', 'staff', 'e', 'a', 'b', 'c', 'd']
+        pages = [self.get_page()]
+        self.assertIsNone(pages[0].previous_page_url)
+        while pages[-1].next_page_url:
+            pages.append(self.get_page(pages[-1].next_page_url))
+
+        self.assertEqual(len(pages), 3)
+        self.assertEqual([u.username for page in pages for u in page.result_list], expected)
+        self.assertEqual(pages[0].result_count, 7)
+        self.assertTrue(all(page.multi_page for page in pages))
+
+        previous = self.get_page(pages[2].previous_page_url)
+        self.assertEqual([u.username for u in previous.result_list], expected[3:6])
+        previous = self.get_page(previous.previous_page_url)
+        self.assertEqual([u.username for u in previous.result_list], expected[:3])
+        self.assertIsNone(previous.previous_page_url)
+
+        # filters are kept, the cursor is removed from the filter links
+        cl = self.get_page('?is_active__exact=1')
+        self.assertEqual([u.username for u in cl.result_list], ['django', 'a', 'b'])
+        cl = self.get_page(cl.next_page_url)
+        self.assertEqual([u.username for u in cl.result_list], ['c', 'd'])
+        self.assertIn('is_active__exact=1', cl.previous_page_url)
+        self.assertNotIn('after', cl.get_query_string({'status': 'staff'}))
+
+    def test_invalid_cursor(self):
+        """Invalid cursors are treated like invalid lookups"""
+
+        response = self.client.get(self.url + '?after=foo')
+        self.assertRedirects(response, self.url + '?e=1')
+
+    def test_malformed_cursor(self):
+        """Cursors with values, that do not fit the fields of the keyset, are treated like invalid lookups"""
+
+        for values in (
+            [True, True, True, 'a', 'foo'],
+            [None, True, True, 'a', 1],
+            [{'foo': 1}, True, True, 'a', 1],
+            [True, True, True, None, 1],
+            [True, True, True, 'a', [1]],
+        ):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+            for var in ('after', 'before'):
+                response = self.client.get(self.url + '?{}={}'.format(var, cursor))
+                self.assertRedirects(response, self.url + '?e=1', msg_prefix=str(values))
+
+    def test_column_ordering(self):
+        """Sorting by a column falls back to Django's pagination"""
+
+        cl = self.get_page('?o=1')
+        self.assertFalse(cl.keyset_pagination)
+
+
+@tag('admin', 'counts')
+class MiniUserAdminCountTest(MiniuserTestCase):
+    """Tests targeting the counts of the list view"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = MiniUser.objects.create_superuser(
+            username='django',
+            password='django',
+            email='django@localhost'
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client.force_login(self.superuser)
+        self.url = reverse('admin:miniuser_miniuser_changelist')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        return response, len([q for q in ctx.captured_queries if 'COUNT(' in q['sql']])
+
+    def test_unfiltered_count(self):
+        """Without filters, the total number of users is not counted again"""
+
+        response, queries = self.count_queries(self.url)
+        self.assertEqual(queries, 1)
+        self.assertEqual(response.context['cl'].full_result_count, 1)
+
+        response, queries = self.count_queries(self.url + '?is_active__exact=0')
+        self.assertEqual(queries, 2)
+
+    @override_settings(MINIUSER_ADMIN_COUNT_MODE='cached')
+    def test_cached_count(self):
+        """Cached counts are not counted again and not marked as approximate"""
+
+        self.count_queries(self.url)
+        response, queries = self.count_queries(self.url)
+        self.assertEqual(queries, 0)
+        self.assertContains(response, '1 user')
+        self.assertNotContains(response, '~1 user')
+
+
+@tag('admin', 'benchmark')
+class MiniUserAdminRenderTest(MiniuserTestCase):
+    """Tests targeting the rendering of the list view"""
+
+    list_display = (
+        'username_color_status', 'username_character_status', 'email_with_status', 'status_aggregated',
+        'is_active', 'last_login',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = MiniUser.objects.create_superuser(
+            username='django',
+            password='django',
+            email='django@localhost'
+        )
+        MiniUser.objects.bulk_create(
+            MiniUser(
+                username='user{:04d}'.format(i),
+                email='user{:04d}@localhost'.format(i),
+                is_staff=i % 10 == 0,
+                email_is_verified=i % 2 == 0
+            ) for i in range(999)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+        self.url = reverse('admin:miniuser_miniuser_changelist')
+        override_admin_attribute(self, 'list_display', self.list_display)
+
+    def render(self, per_page):
+        override_admin_attribute(self, 'list_per_page', per_page)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), per_page)
+        return response, len(queries)
+
+    def test_render_page(self):
+        """Rendering a page of 1000 users does not issue queries per row"""
+
+        response, queries = self.render(1000)
+        self.assertEqual(self.render(10)[1], queries)
+
+        # all rows are marked with the precomputed markup
+        self.assertContains(response, 'class="action-select"', count=1000)
+        self.assertContains(response, '<span style="color: #00cc00;">user0010</span>', html=True)
+        self.assertContains(response, '[$] user0010')
+
+    def test_only_displayed_fields(self):
+        """The list view does not load the fields, that are not displayed"""
+
+        response, queries = self.render(10)
+        deferred = response.context['cl'].result_list[0].get_deferred_fields()
+        self.assertIn('password', deferred)
+        self.assertIn('first_name', deferred)
+        self.assertNotIn('email_is_verified', deferred)
+        self.assertNotIn('username', deferred)
+
+    @override_settings(MINIUSER_ADMIN_STATUS_COLOR_STAFF='#123456', MINIUSER_ADMIN_STATUS_CHAR_STAFF='%')
+    def test_settings_changed(self):
+        """The precomputed markup follows changes of the settings"""
+
+        response, queries = self.render(10)
+        self.assertContains(response, '<span style="color: #123456;">user0010</span>', html=True)
+        self.assertContains(response, '[%] user0010')
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Tests for the asynchronous authentication
+
+These tests target the code in miniuser/aio.py and the login thread pool of
+miniuser/hashing.py."""
+
+# Python imports
+import threading
+from unittest import skip, skipIf  # noqa
+
+# Django imports
+from django.contrib.auth import authenticate
+from django.test import TransactionTestCase, override_settings, tag
+from django.test.utils import patch_logger
+from django.urls import reverse
+
+# app imports
+from miniuser import aio, hashing
+from miniuser.backends import MiniUserBackend
+from miniuser.exceptions import MiniUserSaturatedException
+from miniuser.models import MiniUser
+
+try:
+    import asyncio
+except ImportError:  # pragma: nocover
+    asyncio = None
+
+
+@tag('aio', 'backends')
+@skipIf(asyncio is None, "asyncio is not available")
+@override_settings(AUTHENTICATION_BACKENDS=['miniuser.backends.MiniUserBackend'])
+class AsyncAuthenticationTest(TransactionTestCase):
+    """Tests targeting the authentication in the login thread pool
+
+    The pool's threads do not see the data of an uncommitted test
+    transaction."""
+
+    def setUp(self):
+        self.user = MiniUser.objects.create_user('foo', email='foo@bar.com', password='foo')
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def test_aauthenticate(self):
+        """Users are authenticated by another thread"""
+
+        self.assertEqual(self.loop.run_until_complete(aio.aauthenticate(username='foo', password='foo')), self.user)
+        self.assertIsNone(self.loop.run_until_complete(aio.aauthenticate(username='foo', password='bar')))
+
+    def test_backend(self):
+        """The backend provides aauthenticate() aswell"""
+
+        future = MiniUserBackend().aauthenticate(None, username='foo', password='foo')
+        self.assertEqual(self.loop.run_until_complete(future), self.user)
+
+    def test_event_loop(self):
+        """The event loop is not blocked"""
+
+        def current_thread():
+            return threading.current_thread()
+
+        thread = self.loop.run_until_complete(aio.run_in_login_executor(current_thread))
+        self.assertNotEqual(thread, threading.current_thread())
+
+
+@tag('aio', 'backends')
+@override_settings(
+    AUTHENTICATION_BACKENDS=['miniuser.backends.MiniUserBackend'],
+    MINIUSER_LOGIN_EXECUTOR=True,
+    MINIUSER_LOGIN_WORKERS=1,
+    MINIUSER_LOGIN_QUEUE_SIZE=1,
+)
+class LoginExecutorTest(TransactionTestCase):
+    """Tests targeting the bounded login thread pool"""
+
+    def setUp(self):
+        self.user = MiniUser.objects.create_user('foo', email='foo@bar.com', password='foo')
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def saturate(self):
+        """Occupies the only thread and the only place in the queue"""
+        return [hashing.submit_login(self.release.wait) for i in range(2)]
+
+    def test_saturation(self):
+        """Logins are rejected at once, while the pool is saturated"""
+
+        futures = self.saturate()
+        with self.assertRaises(MiniUserSaturatedException):
+            hashing.submit_login(self.release.wait)
+
+        self.release.set()
+        for future in futures:
+            future.result()
+        self.assertTrue(hashing.submit_login(self.release.wait).result())
+
+    def test_authenticate(self):
+        """The backend authenticates by the pool"""
+
+        self.assertEqual(authenticate(None, username='foo', password='foo'), self.user)
+        self.assertIsNone(authenticate(None, username='foo', password='bar'))
+
+        self.saturate()
+        with patch_logger('miniuser.hashing', 'warning') as calls:
+            self.assertIsNone(authenticate(None, username='foo', password='foo'))
+        self.assertEqual(calls, ['Rejected a login, because the login thread pool is saturated.'])
+
+    def test_login_view(self):
+        """The login view responds with 503, while the pool is saturated"""
+
+        self.saturate()
+        response = self.client.post(reverse('miniuser:login'), {'username': 'foo', 'password': 'foo'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+
+    def test_admin_login(self):
+        """Other login views show a failed login, while the pool is saturated"""
+
+        self.saturate()
+        response = self.client.post(reverse('admin:login'), {'username': 'foo', 'password': 'foo'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    @skipIf(asyncio is None, "asyncio is not available")
+    def test_aauthenticate(self):
+        """Asynchronous logins resolve to None, while the pool is saturated"""
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            self.saturate()
+            self.assertIsNone(loop.run_until_complete(aio.aauthenticate(username='foo', password='foo')))
+            future = MiniUserBackend().aauthenticate(None, username='foo', password='foo')
+            self.assertIsNone(loop.run_until_complete(future))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
@@ -8,12 +8,16 @@ from unittest import skip  # noqa
 
 # Django imports
 from django.conf import settings
+from django.db import connection
 from django.test import override_settings, tag
 
 # app imports
 from miniuser.apps import (
-    E001, E002, E003, E004, E005, E006, E007, E008, E009, E010, E011, I001,
-    W001, check_configuration_constraints, check_configuration_recommendations,
+    E001, E002, E003, E004, E005, E006, E007, E008, E009, E010, E011, E012,
+    E013, E014, E015, E016, E017, E018, E019, E020, E021, E022, E023, E024,
+    E025, E026, E027, E028, E029, E030, E031, E032, E033, E034, E035, E036,
+    E037, E038, E039, E040, E041, E042, I001, W001, W002, W003, W004, W005,
+    check_configuration_constraints, check_configuration_recommendations,
     check_correct_values, set_app_default_setting,
 )
 
@@ -149,3 +153,251 @@ class MiniUserConfigTest(MiniuserTestCase):
         """LOGIN_URL should be 'miniuser:login'"""
         errors = check_configuration_recommendations(None)
         self.assertEqual(errors, [W001])
+
+    @tag('checks')
+    @override_settings(MINIUSER_NATURAL_KEY_CACHE='foo')
+    def test_check_e012(self):
+        """MINIUSER_NATURAL_KEY_CACHE must be a boolean value"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E012])
+
+    @tag('checks')
+    @override_settings(MINIUSER_CACHE_ALIAS='foo')
+    def test_check_e013(self):
+        """MINIUSER_CACHE_ALIAS must be a configured cache"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E013])
+
+    @tag('checks')
+    @override_settings(MINIUSER_NATURAL_KEY_CACHE_TIMEOUT=0)
+    def test_check_e014(self):
+        """MINIUSER_NATURAL_KEY_CACHE_TIMEOUT must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E014])
+
+    @tag('checks')
+    @override_settings(MINIUSER_USER_CACHE='foo')
+    def test_check_e015(self):
+        """MINIUSER_USER_CACHE must be a boolean value"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E015])
+
+    @tag('checks')
+    @override_settings(MINIUSER_USER_CACHE_TIMEOUT='foo')
+    def test_check_e016(self):
+        """MINIUSER_USER_CACHE_TIMEOUT must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E016])
+
+    @tag('checks')
+    @override_settings(MINIUSER_ADMIN_KEYSET_PAGINATION='foo')
+    def test_check_e017(self):
+        """MINIUSER_ADMIN_KEYSET_PAGINATION must be a boolean value"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E017])
+
+    @tag('checks')
+    @override_settings(MINIUSER_ADMIN_COUNT_MODE='foo')
+    def test_check_e018(self):
+        """MINIUSER_ADMIN_COUNT_MODE must be one of the accepted values"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E018])
+
+    @tag('checks')
+    @override_settings(MINIUSER_ADMIN_COUNT_TIMEOUT=0)
+    def test_check_e019(self):
+        """MINIUSER_ADMIN_COUNT_TIMEOUT must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E019])
+
+    @tag('checks')
+    @override_settings(MINIUSER_ADMIN_SEARCH_MODE='foo')
+    def test_check_e020(self):
+        """MINIUSER_ADMIN_SEARCH_MODE must be one of the accepted values"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E020])
+
+    @tag('checks')
+    def test_check_e021(self):
+        """MINIUSER_ADMIN_SEARCH_MODE must be supported by the database"""
+        mode = 'fts5' if connection.vendor != 'sqlite' else 'trigram'
+        with self.settings(MINIUSER_ADMIN_SEARCH_MODE=mode):
+            self.assertEqual(check_correct_values(None), [E021])
+
+    @tag('checks')
+    @override_settings(MINIUSER_AUTOCOMPLETE='foo')
+    def test_check_e022(self):
+        """MINIUSER_AUTOCOMPLETE must be a boolean value"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E022])
+
+    @tag('checks')
+    @override_settings(MINIUSER_AUTOCOMPLETE_INDEX_TIMEOUT=0)
+    def test_check_e023(self):
+        """MINIUSER_AUTOCOMPLETE_INDEX_TIMEOUT must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E023])
+
+    @tag('checks')
+    @override_settings(MINIUSER_ADMIN_ACTION_CHUNK_SIZE=0)
+    def test_check_e024(self):
+        """MINIUSER_ADMIN_ACTION_CHUNK_SIZE must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E024])
+
+    @tag('checks')
+    @override_settings(MINIUSER_ADMIN_BACKGROUND_THRESHOLD='foo')
+    def test_check_e025(self):
+        """MINIUSER_ADMIN_BACKGROUND_THRESHOLD must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E025])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LAST_LOGIN_BUFFER='foo')
+    def test_check_e026(self):
+        """MINIUSER_LAST_LOGIN_BUFFER must be a boolean value"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E026])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LAST_LOGIN_GRANULARITY=-1)
+    def test_check_e027(self):
+        """MINIUSER_LAST_LOGIN_GRANULARITY must be a non-negative integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E027])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LAST_LOGIN_FLUSH_INTERVAL=0)
+    def test_check_e028(self):
+        """MINIUSER_LAST_LOGIN_FLUSH_INTERVAL must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E028])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LAST_LOGIN_FLUSH_THRESHOLD=None)
+    def test_check_e029(self):
+        """MINIUSER_LAST_LOGIN_FLUSH_THRESHOLD must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E029])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_THROTTLE=1)
+    def test_check_e030(self):
+        """MINIUSER_LOGIN_THROTTLE must be a boolean value"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E030])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_THROTTLE_USERNAME_LIMIT=0)
+    def test_check_e031(self):
+        """MINIUSER_LOGIN_THROTTLE_USERNAME_LIMIT must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E031])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_THROTTLE_IP_LIMIT='20')
+    def test_check_e032(self):
+        """MINIUSER_LOGIN_THROTTLE_IP_LIMIT must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E032])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_THROTTLE_WINDOW=-60)
+    def test_check_e033(self):
+        """MINIUSER_LOGIN_THROTTLE_WINDOW must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E033])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_THROTTLE_STORE='redis')
+    def test_check_e034(self):
+        """MINIUSER_LOGIN_THROTTLE_STORE must be 'memory' or 'cache'"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E034])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_THROTTLE_MAX_KEYS=None)
+    def test_check_e035(self):
+        """MINIUSER_LOGIN_THROTTLE_MAX_KEYS must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E035])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_FILTER='yes')
+    def test_check_e036(self):
+        """MINIUSER_LOGIN_FILTER must be a boolean value"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E036])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_FILTER_ERROR_RATE=1.0)
+    def test_check_e037(self):
+        """MINIUSER_LOGIN_FILTER_ERROR_RATE must be a number between 0 and 1"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E037])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_FILTER_TIMEOUT=0)
+    def test_check_e038(self):
+        """MINIUSER_LOGIN_FILTER_TIMEOUT must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E038])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_FILTER_DUMMY_HASH=None)
+    def test_check_e039(self):
+        """MINIUSER_LOGIN_FILTER_DUMMY_HASH must be a boolean value"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E039])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_WORKERS=0)
+    def test_check_e040(self):
+        """MINIUSER_LOGIN_WORKERS must be a positive integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E040])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_EXECUTOR='foo')
+    def test_check_e041(self):
+        """MINIUSER_LOGIN_EXECUTOR must be a boolean value"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E041])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_QUEUE_SIZE=-1)
+    def test_check_e042(self):
+        """MINIUSER_LOGIN_QUEUE_SIZE must be a non-negative integer"""
+        errors = check_correct_values(None)
+        self.assertEqual(errors, [E042])
+
+    @tag('checks')
+    @override_settings(MINIUSER_USER_CACHE=True)
+    def test_check_w002(self):
+        """MINIUSER_USER_CACHE requires MiniUserBackend"""
+        errors = check_configuration_recommendations(None)
+        self.assertEqual(errors, [W002])
+
+        with self.settings(AUTHENTICATION_BACKENDS=['miniuser.backends.MiniUserBackend']):
+            self.assertEqual(check_configuration_recommendations(None), [])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_THROTTLE=True)
+    def test_check_w003(self):
+        """MINIUSER_LOGIN_THROTTLE requires MiniUserBackend"""
+        errors = check_configuration_recommendations(None)
+        self.assertEqual(errors, [W003])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_FILTER=True)
+    def test_check_w004(self):
+        """MINIUSER_LOGIN_FILTER requires MiniUserBackend"""
+        errors = check_configuration_recommendations(None)
+        self.assertEqual(errors, [W004])
+
+    @tag('checks')
+    @override_settings(MINIUSER_LOGIN_EXECUTOR=True)
+    def test_check_w005(self):
+        """MINIUSER_LOGIN_EXECUTOR requires MiniUserBackend"""
+        errors = check_configuration_recommendations(None)
+        self.assertEqual(errors, [W005])
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Tests for the autocompletion of users
+
+These tests target the code in miniuser/autocomplete.py and the autocomplete
+view."""
+
+# Python imports
+from unittest import skip  # noqa
+
+# Django imports
+from django.test import TransactionTestCase, override_settings, tag
+from django.urls import reverse
+
+# app imports
+from miniuser.autocomplete import PrefixIndex, database_lookup, index
+from miniuser.models import MiniUser
+
+# app imports
+from .utils.testcases import MiniuserTestCase
+
+
+@tag('autocomplete')
+class PrefixIndexTest(MiniuserTestCase):
+    """Tests targeting the sorted array"""
+
+    def test_lookup(self):
+        """Keys are matched by prefix and returned in order"""
+
+        prefix_index = PrefixIndex([('bob', 3), ('alice', 1), ('alfred', 2), ('albert', 4)])
+        self.assertEqual(prefix_index.lookup('al', 10), [4, 2, 1])
+        self.assertEqual(prefix_index.lookup('al', 2), [4, 2])
+        self.assertEqual(prefix_index.lookup('b', 10), [3])
+        self.assertEqual(prefix_index.lookup('c', 10), [])
+
+        prefix_index.add('alan', 5)
+        prefix_index.add('alan', 5)
+        self.assertTrue(prefix_index.remove('alfred', 2))
+        self.assertFalse(prefix_index.remove('alfred', 3))
+        self.assertEqual(prefix_index.lookup('al', 10), [5, 4, 1])
+        self.assertEqual(len(prefix_index), 4)
+
+        prefix_index.remove_pk(4)
+        self.assertEqual(prefix_index.lookup('al', 10), [5, 1])
+
+    def test_from_sorted(self):
+        """Entries in the wrong order (i.e. by the database's collation) are sorted anyway"""
+
+        entries = [('albert', 4), ('alfred', 2), ('alice', 1), ('bob', 3)]
+        self.assertEqual(PrefixIndex.from_sorted(entries).keys, ['albert', 'alfred', 'alice', 'bob'])
+        prefix_index = PrefixIndex.from_sorted(reversed(entries))
+        self.assertEqual(list(prefix_index.pks), [4, 2, 1, 3])
+
+
+@tag('autocomplete')
+@override_settings(MINIUSER_AUTOCOMPLETE=True)
+class AutocompleteIndexTest(MiniuserTestCase):
+    """Tests targeting the in-memory index of login names"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = MiniUser.objects.create_user('Alice', email='alice@example.com')
+        cls.alfred = MiniUser.objects.create_user('alfred', email='butler@example.org')
+        cls.bob = MiniUser.objects.create_user('bob', email='al@example.net')
+
+    def setUp(self):
+        index.invalidate()
+        # the background thread does not see the data of the test transaction
+        index.build()
+
+    def tearDown(self):
+        index.invalidate()
+
+    def usernames(self, results):
+        return [user['username'] for user in results]
+
+    def test_lookup(self):
+        """Usernames are matched before email addresses, case insensitive"""
+
+        self.assertEqual(self.usernames(index.lookup('AL', 10)), ['alfred', 'Alice', 'bob'])
+        self.assertEqual(self.usernames(index.lookup('al', 2)), ['alfred', 'Alice'])
+        self.assertEqual(self.usernames(index.lookup('butler@', 10)), ['alfred'])
+        self.assertEqual(index.lookup('xyz', 10), [])
+        self.assertEqual(index.lookup('alice', 10), [
+            {'id': self.alice.pk, 'username': 'Alice', 'email': 'alice@example.com'}
+        ])
+
+    def test_database_lookup(self):
+        """The database fallback returns the same results"""
+
+        for term in ('AL', 'butler@', 'xyz', 'alice'):
+            for limit in (2, 10):
+                self.assertEqual(
+                    database_lookup(MiniUser.objects.all(), term, limit), index.lookup(term, limit)
+                )
+
+    def test_signals(self):
+        """Saved and deleted users are applied to the index"""
+
+        carol = MiniUser.objects.create_user('carol', email='carol@example.net')
+        self.assertEqual(self.usernames(index.lookup('car', 10)), ['carol'])
+
+        carol.username = 'alberta'
+        carol.email = 'alberta@example.net'
+        carol.save()
+        self.assertEqual(index.lookup('car', 10), [])
+        self.assertEqual(self.usernames(index.lookup('al', 10)), ['alberta', 'alfred', 'Alice', 'bob'])
+
+        carol.delete()
+        self.assertEqual(self.usernames(index.lookup('al', 10)), ['alfred', 'Alice', 'bob'])
+
+    def test_bulk_create(self):
+        """bulk_create() does not send signals, so the users are added by it"""
+
+        alan = MiniUser(username='alan', email='alan@example.com')
+        alan.update_normalized_login_names()
+        alan.pk = MiniUser.objects.latest('pk').pk + 1
+        MiniUser.objects.bulk_create([alan])
+        self.assertFalse(index.is_stale())
+        self.assertEqual(self.usernames(index.lookup('alan', 10)), ['alan'])
+
+        # without pks, the index is rebuilt, but keeps answering meanwhile
+        with index.build_lock:
+            MiniUser.objects.bulk_create([MiniUser(username='alma')])
+            self.assertTrue(index.is_stale())
+            self.assertEqual(self.usernames(index.lookup('al', 10)), ['alan', 'alfred', 'Alice', 'bob'])
+
+    def test_compact(self):
+        """Only the normalized keys and the pks are stored"""
+
+        self.assertEqual(index.usernames.keys, ['alfred', 'alice', 'bob'])
+        self.assertEqual(index.emails.keys, ['al@example.net', 'alice@example.com', 'butler@example.org'])
+        self.assertEqual(index.usernames.pks.typecode, 'l')
+
+    def test_cold_index(self):
+        """While another thread builds the index, the lookup returns None"""
+
+        index.invalidate()
+        with index.build_lock:
+            self.assertIsNone(index.lookup('al', 10))
+
+
+@tag('autocomplete')
+@override_settings(MINIUSER_AUTOCOMPLETE=True)
+class AutocompleteBuildTest(TransactionTestCase):
+    """Tests targeting the build of the index in the background
+
+    The background thread does not see the data of an uncommitted test
+    transaction."""
+
+    def setUp(self):
+        index.invalidate()
+        MiniUser.objects.create_user('Alice', email='alice@example.com')
+
+    def tearDown(self):
+        index.invalidate()
+
+    def test_background_build(self):
+        """The first lookup starts the build and does not wait for it"""
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(index.lookup('al', 10))
+        index.builder.join(5)
+
+        self.assertFalse(index.is_stale())
+        self.assertEqual([user['username'] for user in index.lookup('al', 10)], ['Alice'])
+
+
+@tag('autocomplete', 'views')
+@override_settings(MINIUSER_AUTOCOMPLETE=True)
+class AutocompleteViewTest(MiniuserTestCase):
+    """Tests targeting the autocomplete view"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = MiniUser.objects.create_superuser('django', 'django@localhost', 'django')
+        cls.user = MiniUser.objects.create_user('Alice', email='alice@example.com')
+
+    def setUp(self):
+        index.invalidate()
+        index.build()
+
+    def tearDown(self):
+        index.invalidate()
+
+    def get(self, **params):
+        return self.client.get(reverse('miniuser:autocomplete'), params)
+
+    def test_results(self):
+        """Staff users get the matching users from the index"""
+
+        self.client.force_login(self.superuser)
+        response = self.get(q='ali')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'results': [{'id': self.user.pk, 'username': 'Alice', 'email': 'alice@example.com'}],
+            'source': 'index',
+        })
+        self.assertEqual(self.get(q='d', limit=1).json()['results'][0]['username'], 'django')
+        self.assertEqual(self.get(limit='foo').status_code, 400)
+
+    def test_database_fallback(self):
+        """While the index is cold, the database is queried"""
+
+        self.client.force_login(self.superuser)
+        index.invalidate()
+        with index.build_lock:
+            response = self.get(q='ali')
+        self.assertEqual(response.json()['source'], 'database')
+        self.assertEqual(response.json()['results'][0]['username'], 'Alice')
+
+    def test_permissions(self):
+        """Only staff users may use the view"""
+
+        self.assertEqual(self.get(q='ali').status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.get(q='ali').status_code, 403)
+
+    @override_settings(MINIUSER_AUTOCOMPLETE=False)
+    def test_disabled(self):
+        """The view is not available by default"""
+
+        self.client.force_login(self.superuser)
+        self.assertEqual(self.get(q='ali').status_code, 404)
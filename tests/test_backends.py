@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Tests for the app's authentication backends
+
+These tests target the code in miniuser/backends.py."""
+
+# Python imports
+from unittest import skip  # noqa
+
+# Django imports
+from django.contrib.auth import authenticate
+from django.core.exceptions import PermissionDenied
+from django.test import RequestFactory, override_settings, tag
+
+# app imports
+from miniuser import cache, throttle
+from miniuser.backends import MiniUserBackend
+from miniuser.models import MiniUser
+
+# app imports
+from .utils.testcases import MiniuserTestCase
+
+
+@tag('backends', 'cache')
+@override_settings(MINIUSER_USER_CACHE=True)
+class MiniUserBackendGetUserTest(MiniuserTestCase):
+    """Tests targeting the cached retrieval of users"""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.backend = MiniUserBackend()
+        self.user = MiniUser.objects.create_user('foo', email='foo@bar.com', password='foo')
+
+    def test_cached_user(self):
+        """Only the first retrieval of a user queries the database"""
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+
+    @override_settings(MINIUSER_USER_CACHE=False)
+    def test_cache_disabled(self):
+        """Without MINIUSER_USER_CACHE, every retrieval queries the database"""
+
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+
+    def test_unknown_user(self):
+        """Unknown users are not cached"""
+
+        self.assertIsNone(self.backend.get_user(self.user.pk + 1))
+
+    def test_invalidate_on_save(self):
+        """Changes of the password and the activation status invalidate the cache"""
+
+        self.backend.get_user(self.user.pk)
+
+        self.user.set_password('bar')
+        self.user.save()
+        self.assertTrue(self.backend.get_user(self.user.pk).check_password('bar'))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_invalidate_on_delete(self):
+        """Deleting a user invalidates the cache"""
+
+        pk = self.user.pk
+        self.backend.get_user(pk)
+        self.user.delete()
+        self.assertIsNone(self.backend.get_user(pk))
+
+    def test_outdated_version(self):
+        """A user, that is invalidated during retrieval, is not cached"""
+
+        user, version = cache.get_user(self.user.pk)
+        self.assertIsNone(user)
+        cache.invalidate_users([self.user.pk])
+        cache.set_user(self.user, version)
+        self.assertEqual(cache.get_user(self.user.pk)[0], None)
+
+
+@tag('backends')
+@override_settings(AUTHENTICATION_BACKENDS=['miniuser.backends.MiniUserBackend'])
+class MiniUserBackendAuthenticateTest(MiniuserTestCase):
+    """Tests targeting the authentication by login names"""
+
+    def test_empty_login_name(self):
+        """Empty login names are rejected in every mode, even with several users without email address"""
+
+        MiniUser.objects.bulk_create_users([
+            {'username': 'foo', 'password': 'foo'},
+            {'username': 'bar', 'password': 'foo'},
+        ])
+
+        for mode in ('username', 'email', 'both'):
+            with self.settings(MINIUSER_LOGIN_NAME=mode):
+                self.assertIsNone(authenticate(None, username='', password='foo'))
+                self.assertIsNone(authenticate(None, username=None, password='foo'))
+
+
+@tag('backends', 'throttle')
+@override_settings(
+    AUTHENTICATION_BACKENDS=['miniuser.backends.MiniUserBackend'],
+    MINIUSER_LOGIN_THROTTLE=True,
+    MINIUSER_LOGIN_THROTTLE_USERNAME_LIMIT=2,
+    MINIUSER_LOGIN_THROTTLE_IP_LIMIT=3,
+    MINIUSER_LOGIN_THROTTLE_WINDOW=3600,
+)
+class MiniUserBackendThrottleTest(MiniuserTestCase):
+    """Tests targeting the throttling of login attempts"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = MiniUser.objects.create_user('foo', email='foo@bar.com', password='foo')
+
+    def setUp(self):
+        cache.get_cache().clear()
+        throttle.memory_store.clear()
+
+    def authenticate(self, username, password, address='127.0.0.1'):
+        request = RequestFactory().post('/', REMOTE_ADDR=address)
+        return authenticate(request, username=username, password=password)
+
+    def test_username_limit(self):
+        """Failed attempts for a login name throttle further attempts before any query"""
+
+        self.assertIsNone(self.authenticate('foo', 'wrong'))
+        self.assertIsNone(self.authenticate('FOO', 'wrong', '10.0.0.1'))
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.authenticate('foo', 'foo', '10.0.0.2'))
+        self.assertIsNone(self.authenticate('bar', 'wrong', '10.0.0.3'))
+
+    def test_ip_limit(self):
+        """Failed attempts from an IP address throttle further attempts"""
+
+        for username in ('a', 'b', 'c'):
+            self.assertIsNone(self.authenticate(username, 'wrong'))
+        self.assertIsNone(self.authenticate('foo', 'foo'))
+        self.assertEqual(self.authenticate('foo', 'foo', '10.0.0.1'), self.user)
+
+    def test_successful_logins(self):
+        """Successful attempts are not counted"""
+
+        for i in range(5):
+            self.assertEqual(self.authenticate('foo', 'foo'), self.user)
+
+    def test_backend(self):
+        """Throttled attempts raise PermissionDenied to stop the other backends"""
+
+        request = RequestFactory().post('/', REMOTE_ADDR='127.0.0.1')
+        throttle.register_failure(request, 'foo')
+        throttle.register_failure(request, 'foo')
+        with self.assertRaises(PermissionDenied):
+            MiniUserBackend().authenticate(request, username='foo', password='foo')
+
+    @override_settings(MINIUSER_LOGIN_THROTTLE_STORE='cache')
+    def test_cache_store(self):
+        """The counters may be kept in the app's cache"""
+
+        self.assertIsNone(self.authenticate('foo', 'wrong'))
+        self.assertIsNone(self.authenticate('foo', 'wrong'))
+        self.assertEqual(len(throttle.memory_store.counters), 0)
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.authenticate('foo', 'foo', '10.0.0.1'))
+
+    @override_settings(MINIUSER_LOGIN_THROTTLE_MAX_KEYS=2)
+    def test_memory_store_bounded(self):
+        """The least recently used keys are evicted"""
+
+        store = throttle.memory_store
+        for key in ('a', 'b', 'a', 'c'):
+            store.hit(key, 1)
+        self.assertEqual(list(store.counters), ['a', 'c'])
+        self.assertEqual(store.get('a', 1), (2, 0))
+        # the counts of the current window become the previous ones
+        self.assertEqual(store.get('a', 2), (0, 2))
+        self.assertEqual(store.get('a', 3), (0, 0))
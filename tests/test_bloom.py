@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Tests for the filter of login names
+
+These tests target the code in miniuser/bloom.py and its usage by
+MiniUserBackend."""
+
+# Python imports
+from unittest import skip  # noqa
+
+# Django imports
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import get_hasher
+from django.core.management import call_command
+from django.test import override_settings, tag
+from django.utils.six import StringIO
+
+# app imports
+from miniuser import bloom
+from miniuser.cache import get_cache
+from miniuser.models import MiniUser
+
+# app imports
+from .utils.testcases import MiniuserTestCase
+
+
+@tag('bloom')
+class BloomFilterTest(MiniuserTestCase):
+    """Tests targeting the bit array"""
+
+    def test_membership(self):
+        """Added keys are always found, others are rejected mostly"""
+
+        keys = ['user{}'.format(i) for i in range(1000)]
+        bloom_filter = bloom.BloomFilter.for_capacity(len(keys), 0.01)
+        for key in keys:
+            bloom_filter.add(key)
+
+        self.assertTrue(all(key in bloom_filter for key in keys))
+        false_positives = sum('other{}'.format(i) in bloom_filter for i in range(1000))
+        self.assertLess(false_positives, 30)
+
+        copy = bloom.BloomFilter.from_dict(bloom_filter.to_dict())
+        self.assertTrue(all(key in copy for key in keys))
+
+
+class CountingHasher(object):
+    """Counts the calls of the default hasher's encode()"""
+
+    def __init__(self):
+        self.hasher = get_hasher()
+        self.calls = 0
+
+    def __enter__(self):
+        self.original = self.hasher.__class__.encode
+        hasher = self
+
+        def encode(instance, *args, **kwargs):
+            hasher.calls += 1
+            return hasher.original(instance, *args, **kwargs)
+
+        self.hasher.__class__.encode = encode
+        return self
+
+    def __exit__(self, *args):
+        self.hasher.__class__.encode = self.original
+
+
+@tag('bloom', 'backends')
+@override_settings(
+    AUTHENTICATION_BACKENDS=['miniuser.backends.MiniUserBackend'],
+    MINIUSER_LOGIN_FILTER=True,
+    MINIUSER_LOGIN_NAME='both',
+)
+class LoginFilterTest(MiniuserTestCase):
+    """Tests targeting the rejection of unknown login names"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = MiniUser.objects.create_user('Foo', email='foo@bar.com', password='foo')
+
+    def setUp(self):
+        get_cache().clear()
+        bloom.login_names.invalidate()
+
+    def tearDown(self):
+        bloom.login_names.invalidate()
+
+    def build(self):
+        """Builds the filter (like miniuser_login_filter) and loads it"""
+
+        bloom.build()
+        bloom.login_names.load()
+
+    def test_known_login_names(self):
+        """Existing login names pass the filter"""
+
+        self.build()
+        self.assertEqual(authenticate(None, username='foo', password='foo'), self.user)
+        self.assertEqual(authenticate(None, username='FOO@bar.com', password='foo'), self.user)
+        self.assertIsNone(authenticate(None, username='foo', password='wrong'))
+
+    def test_unknown_login_names(self):
+        """Unknown login names are rejected without queries, but with a dummy hash"""
+
+        self.build()
+        with self.assertNumQueries(0), CountingHasher() as hasher:
+            self.assertIsNone(authenticate(None, username='bar', password='bar'))
+        self.assertEqual(hasher.calls, 1)
+
+    @override_settings(MINIUSER_LOGIN_FILTER_DUMMY_HASH=False)
+    def test_no_dummy_hash(self):
+        """The dummy hash may be skipped"""
+
+        self.build()
+        with CountingHasher() as hasher:
+            self.assertIsNone(authenticate(None, username='bar', password='bar'))
+        self.assertEqual(hasher.calls, 0)
+
+    def test_added_users(self):
+        """Users, that are created or renamed after the filter was built, are found"""
+
+        self.build()
+        MiniUser.objects.create_user('bar', email='bar@bar.com', password='bar')
+        self.assertTrue(bloom.might_exist('bar'))
+
+        self.user.username = 'baz'
+        self.user.save()
+        self.assertTrue(bloom.might_exist('BAZ'))
+
+        MiniUser.objects.bulk_create([MiniUser(username='qux', email='qux@bar.com')])
+        self.assertTrue(bloom.might_exist('qux@bar.com'))
+
+    def test_other_processes(self):
+        """Login names, that are added by other processes, are recorded in the cache"""
+
+        self.build()
+        stale = bloom.BloomFilter.from_dict(get_cache().get(bloom.FILTER_KEY))
+
+        MiniUser.objects.create_user('bar', email='bar@bar.com', password='bar')
+        # the copy of another process does not know the new user
+        bloom.login_names.bloom = stale
+        self.assertNotIn('u:bar', stale)
+        self.assertTrue(bloom.might_exist('bar'))
+        self.assertFalse(bloom.might_exist('baz'))
+
+    def test_no_filter(self):
+        """Lookups never build the filter; without an up to date filter, every login name passes"""
+
+        with self.assertNumQueries(0):
+            self.assertTrue(bloom.might_exist('bar'))
+
+        with self.assertNumQueries(2):
+            bloom.build()
+        bloom.login_names.invalidate()
+        with self.assertNumQueries(0):
+            self.assertFalse(bloom.might_exist('bar'))
+            self.assertTrue(bloom.might_exist('foo'))
+
+        # outdated filters are not covered by the records of added login names
+        data = get_cache().get(bloom.FILTER_KEY)
+        data['built'] -= 2 * settings.MINIUSER_LOGIN_FILTER_TIMEOUT
+        get_cache().set(bloom.FILTER_KEY, data)
+        bloom.login_names.invalidate()
+        self.assertTrue(bloom.might_exist('bar'))
+
+    def test_command(self):
+        """The management command rebuilds the filter"""
+
+        self.build()
+        MiniUser.objects.filter(pk=self.user.pk).update(username='renamed', username_normalized='renamed')
+        self.assertFalse(bloom.might_exist('renamed'))
+
+        out = StringIO()
+        call_command('miniuser_login_filter', stdout=out)
+        self.assertIn("Built the filter of login names", out.getvalue())
+        self.assertTrue(bloom.might_exist('renamed'))
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Tests for the app's caching
+
+These tests target the code in miniuser/cache.py and the caching related
+parts of miniuser/models.py and miniuser/signals.py."""
+
+# Python imports
+from unittest import skip  # noqa
+
+# Django imports
+from django.test import override_settings, tag
+
+# app imports
+from miniuser import cache
+from miniuser.models import MiniUser
+
+# app imports
+from .utils.testcases import MiniuserTestCase
+
+
+@tag('cache')
+@override_settings(MINIUSER_NATURAL_KEY_CACHE=True, MINIUSER_LOGIN_NAME='both')
+class NaturalKeyCacheTest(MiniuserTestCase):
+    """Tests targeting the cached lookup of users by their login names"""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.user = MiniUser.objects.create_user(username='foo', email='foo@bar.com')
+
+    def test_cached_lookup(self):
+        """Repeated lookups only query by primary key"""
+
+        self.assertEqual(MiniUser.objects.get_by_natural_key('foo'), self.user)
+        with self.assertNumQueries(1) as ctx:
+            self.assertEqual(MiniUser.objects.get_by_natural_key('FOO'), self.user)
+        self.assertIn('"id" =', ctx.captured_queries[0]['sql'])
+
+    def test_cached_miss(self):
+        """Unknown login names are cached aswell and do not require a query"""
+
+        with self.assertRaises(MiniUser.DoesNotExist):
+            MiniUser.objects.get_by_natural_key('bar')
+        with self.assertNumQueries(0):
+            with self.assertRaises(MiniUser.DoesNotExist):
+                MiniUser.objects.get_by_natural_key('bar')
+
+    def test_invalidate_on_create(self):
+        """Creating a user invalidates cached misses and the username precedence"""
+
+        with self.assertRaises(MiniUser.DoesNotExist):
+            MiniUser.objects.get_by_natural_key('bar')
+        self.assertEqual(MiniUser.objects.get_by_natural_key('foo@bar.com'), self.user)
+
+        u = MiniUser.objects.create_user(username='bar', email='bar@bar.com')
+        v = MiniUser.objects.create_user(username='foo@bar.com', email='baz@bar.com')
+        self.assertEqual(MiniUser.objects.get_by_natural_key('bar'), u)
+        self.assertEqual(MiniUser.objects.get_by_natural_key('foo@bar.com'), v)
+
+    def test_invalidate_on_rename(self):
+        """Changing the login names invalidates the cache, other saves do not"""
+
+        self.assertEqual(MiniUser.objects.get_by_natural_key('foo'), self.user)
+
+        generation = cache.get_natural_key_generation()
+        self.user.first_name = 'Foo'
+        self.user.save()
+        self.assertEqual(cache.get_natural_key_generation(), generation)
+
+        self.user.username = 'bar'
+        self.user.save()
+        self.assertNotEqual(cache.get_natural_key_generation(), generation)
+        with self.assertRaises(MiniUser.DoesNotExist):
+            MiniUser.objects.get_by_natural_key('foo')
+
+    def test_invalidate_on_delete(self):
+        """Deleting a user invalidates the cache"""
+
+        self.assertEqual(MiniUser.objects.get_by_natural_key('foo'), self.user)
+        self.user.delete()
+        with self.assertRaises(MiniUser.DoesNotExist):
+            MiniUser.objects.get_by_natural_key('foo')
+
+    def test_invalidate_on_bulk_create(self):
+        """bulk_create() does not send signals, but invalidates the cache"""
+
+        with self.assertRaises(MiniUser.DoesNotExist):
+            MiniUser.objects.get_by_natural_key('bar')
+        MiniUser.objects.bulk_create([MiniUser(username='bar')])
+        self.assertEqual(MiniUser.objects.get_by_natural_key('bar').username, 'bar')
+
+    def test_stale_primary_key(self):
+        """A cached primary key of a vanished user falls back to the lookup"""
+
+        self.assertEqual(MiniUser.objects.get_by_natural_key('foo'), self.user)
+        # a raw delete does not send any signals
+        MiniUser.objects.filter(pk=self.user.pk)._raw_delete(using='default')
+        with self.assertRaises(MiniUser.DoesNotExist):
+            MiniUser.objects.get_by_natural_key('foo')
+
+    def test_evicted_generation(self):
+        """A new generation is created, if the current one is missing"""
+
+        cache.invalidate_natural_keys()
+        generation = cache.get_natural_key_generation()
+        cache.get_cache().delete(cache.NATURAL_KEY_GENERATION)
+        cache.invalidate_natural_keys()
+        self.assertNotEqual(cache.get_natural_key_generation(), None)
+        self.assertGreaterEqual(cache.get_natural_key_generation(), generation)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Tests for the app's management commands
+
+These tests target the code in miniuser/management/commands."""
+
+# Python imports
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import skip  # noqa
+
+# Django imports
+from django.core.management import CommandError, call_command
+from django.test import override_settings, tag
+from django.utils import timezone
+from django.utils.six import StringIO
+
+# app imports
+from miniuser.models import MiniUser
+
+# app imports
+from .utils.testcases import MiniuserTestCase
+
+
+@tag('commands')
+@override_settings(MINIUSER_DEFAULT_ACTIVE=True, MINIUSER_REQUIRE_VALID_EMAIL=False)
+class MiniUserImportTest(MiniuserTestCase):
+    """Tests targeting the miniuser_import command"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def call(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('miniuser_import', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_csv(self):
+        """Users are imported from CSV files, empty values are treated as missing"""
+
+        path = self.write_file('users.csv', (
+            'username,email,password,first_name\n'
+            'foo,Foo@BAR.com,foo,Foo\n'
+            'bar,,,\n'
+            'in valid,baz@bar.com,baz,\n'
+            'qux,no email,,\n'
+        ))
+        out, err = self.call(path, '--batch-size', '1')
+
+        self.assertIn('Created 2 users, skipped 2 records', out)
+        self.assertIn('Record 3: ', err)
+        self.assertIn('Record 4: Enter a valid email address.', err)
+
+        m = MiniUser.objects.get(username='foo')
+        self.assertEqual(m.email, 'foo@bar.com')
+        self.assertEqual(m.first_name, 'Foo')
+        self.assertTrue(m.check_password('foo'))
+        self.assertFalse(MiniUser.objects.get(username='bar').has_usable_password())
+
+    def test_import_jsonl_checkpoint(self):
+        """JSON-lines files are imported and may be resumed from a checkpoint"""
+
+        MiniUser.objects.create_user('dup', email='dup@bar.com')
+        path = self.write_file('users.jsonl', (
+            '{"username": "foo", "email": "foo@bar.com"}\n'
+            'not json\n'
+            '\n'
+            '{"username": "DUP"}\n'
+            '{"username": "bar"}\n'
+        ))
+        checkpoint = os.path.join(self.tmpdir, 'checkpoint')
+
+        out, err = self.call(path, '--batch-size', '1', '--checkpoint', checkpoint)
+        self.assertIn('Created 2 users, skipped 2 records', out)
+        self.assertIn('Record 2: Invalid record', err)
+        self.assertIn('Record 3: A user with that username already exists...', err)
+        with open(checkpoint) as f:
+            self.assertEqual(f.read(), '4\n')
+
+        MiniUser.objects.filter(username='bar').delete()
+        out, err = self.call(path, '--checkpoint', checkpoint)
+        self.assertIn('Created 0 users, skipped 0 records', out)
+
+        out, err = self.call(path, '--start-line', '3')
+        self.assertIn('Created 1 users, skipped 0 records', out)
+        self.assertTrue(MiniUser.objects.filter(username='bar').exists())
+
+
+@tag('commands')
+class MiniUserExportTest(MiniuserTestCase):
+    """Tests targeting the miniuser_export command"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        MiniUser.objects.create_user('foo', email='foo@bar.com', password='foo', first_name='Foo')
+        MiniUser.objects.create_user('bar', email='bar@bar.com')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_export_csv_stdout(self):
+        """Users are exported as CSV to stdout, ordered by primary key"""
+
+        out = StringIO()
+        call_command('miniuser_export', '--fields', 'username,email,first_name', stdout=out)
+        self.assertEqual(
+            out.getvalue().splitlines(),
+            ['username,email,first_name', 'foo,foo@bar.com,Foo', 'bar,bar@bar.com,']
+        )
+
+    def test_export_jsonl_gzip(self):
+        """Users are exported as gzipped JSON-lines, if the file ends with '.gz'"""
+
+        path = os.path.join(self.tmpdir, 'users.jsonl.gz')
+        out = StringIO()
+        call_command('miniuser_export', '--format', 'jsonl', '-o', path, stdout=out)
+        self.assertIn("Exported 2 users", out.getvalue())
+
+        with gzip.open(path, 'rb') as f:
+            records = [json.loads(line.decode('utf-8')) for line in f]
+        self.assertEqual([r['username'] for r in records], ['foo', 'bar'])
+        self.assertNotIn('password', records[0])
+        self.assertIn('last_login', records[0])
+
+    def test_export_unknown_fields(self):
+        """Only fields of the model may be exported"""
+
+        with self.assertRaisesMessage(CommandError, 'Unknown fields: groups'):
+            call_command('miniuser_export', '--fields', 'username,groups')
+
+
+@tag('commands')
+class MiniUserPruneTest(MiniuserTestCase):
+    """Tests targeting the miniuser_prune command"""
+
+    @classmethod
+    def setUpTestData(cls):
+        old = timezone.now() - timedelta(days=100)
+        cls.unused = MiniUser.objects.create_user('unused', email='unused@localhost')
+        cls.recent = MiniUser.objects.create_user('recent', email='recent@localhost')
+        cls.dormant = MiniUser.objects.create_user('dormant', email='dormant@localhost')
+        cls.active = MiniUser.objects.create_user('active', email='active@localhost')
+        cls.staff = MiniUser.objects.create_user('staff', email='staff@localhost')
+        cls.blocked = MiniUser.objects.create_user('blocked', email='blocked@localhost')
+
+        MiniUser.objects.filter(pk=cls.unused.pk).update(is_active=False, registration_date=old)
+        MiniUser.objects.filter(pk=cls.recent.pk).update(is_active=False)
+        MiniUser.objects.filter(pk__in=[cls.dormant.pk, cls.staff.pk]).update(is_active=True, last_login=old)
+        MiniUser.objects.filter(pk=cls.staff.pk).update(is_staff=True)
+        MiniUser.objects.filter(pk=cls.active.pk).update(is_active=True, last_login=timezone.now())
+        # a verified account, that was deactivated on purpose
+        MiniUser.objects.filter(pk=cls.blocked.pk).update(
+            is_active=False, registration_date=old, email_is_verified=True
+        )
+
+    def test_deactivate_dormant(self):
+        """Dormant users are deactivated, staff users are kept"""
+
+        out = StringIO()
+        call_command('miniuser_prune', '--dormant', '30', stdout=out)
+        self.assertIn("Deactivated 1 dormant users", out.getvalue())
+        self.assertEqual(
+            set(MiniUser.objects.filter(is_active=True).values_list('username', flat=True)), {'active', 'staff'}
+        )
+
+    def test_delete(self):
+        """Users, that were never activated, are deleted, deliberately deactivated users are kept"""
+
+        out = StringIO()
+        call_command('miniuser_prune', '--never-activated', '30', '--dormant', '30', '--action', 'delete',
+                     '--batch-size', '1', '--rate', '1000', stdout=out)
+        self.assertIn("Deleted 1 never activated users", out.getvalue())
+        self.assertIn("Deleted 1 dormant users", out.getvalue())
+        self.assertEqual(
+            set(MiniUser.objects.values_list('username', flat=True)), {'recent', 'active', 'staff', 'blocked'}
+        )
+
+    def test_dry_run(self):
+        """The dry run only counts the users"""
+
+        out = StringIO()
+        call_command('miniuser_prune', '--never-activated', '30', '--action', 'delete', '--dry-run', stdout=out)
+        self.assertIn("1 never activated users would be deleted", out.getvalue())
+        self.assertEqual(MiniUser.objects.count(), 6)
+
+    def test_invalid_arguments(self):
+        """The selection and the action have to be meaningful"""
+
+        with self.assertRaisesMessage(CommandError, "Please specify"):
+            call_command('miniuser_prune')
+        with self.assertRaisesMessage(CommandError, "use '--action delete'"):
+            call_command('miniuser_prune', '--never-activated', '30')
+        with self.assertRaisesMessage(CommandError, "must not be negative"):
+            call_command('miniuser_prune', '--dormant', '-1')
+        with self.assertRaisesMessage(CommandError, "--rate"):
+            call_command('miniuser_prune', '--dormant', '30', '--rate', '0')
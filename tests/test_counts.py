@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Tests for counting users
+
+These tests target the code in miniuser/counts.py."""
+
+# Python imports
+from unittest import skip  # noqa
+
+# Django imports
+from django.test import override_settings, tag
+
+# app imports
+from miniuser import cache, counts
+from miniuser.models import MiniUser
+
+# app imports
+from .utils.testcases import MiniuserTestCase
+
+
+@tag('counts')
+class CountsTest(MiniuserTestCase):
+    """Tests targeting the counting modes"""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        MiniUser.objects.create_user('foo', email='foo@bar.com')
+        MiniUser.objects.create_user('bar', email='bar@bar.com', password='bar')
+
+    def test_approximate_count(self):
+        """Approximate counts render as "~N", but compare like integers"""
+
+        c = counts.ApproximateCount(42)
+        self.assertEqual(str(c), '~42')
+        self.assertEqual(c, 42)
+        self.assertTrue(c > 41)
+
+    @override_settings(MINIUSER_ADMIN_COUNT_MODE='exact')
+    def test_exact(self):
+        """Exact counts are not marked as approximate"""
+
+        result = counts.count(MiniUser.objects.all())
+        self.assertEqual(result, 2)
+        self.assertNotIsInstance(result, counts.ApproximateCount)
+
+    @override_settings(MINIUSER_ADMIN_COUNT_MODE='cached')
+    def test_cached(self):
+        """Counts are cached per query, but not marked as approximate"""
+
+        self.assertEqual(counts.count(MiniUser.objects.all()), 2)
+        self.assertEqual(counts.count(MiniUser.objects.filter(is_active=True)), 1)
+
+        MiniUser.objects.create_user('baz', email='baz@bar.com')
+        with self.assertNumQueries(0):
+            result = counts.count(MiniUser.objects.all())
+        self.assertEqual(result, 2)
+        self.assertNotIsInstance(result, counts.ApproximateCount)
+
+        self.assertEqual(counts.count(MiniUser.objects.filter(pk__in=[])), 0)
+
+    @override_settings(MINIUSER_ADMIN_COUNT_MODE='estimate')
+    def test_estimate_fallback(self):
+        """Without planner estimates, the cached count is used"""
+
+        if counts.estimate_count(MiniUser.objects.all()) is not None:
+            self.skipTest('The database provides estimates')
+
+        self.assertEqual(counts.count(MiniUser.objects.all()), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(counts.count(MiniUser.objects.all())), '2')
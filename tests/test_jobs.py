@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Tests for the processing of large selections
+
+These tests target the code in miniuser/jobs.py and its usage by the admin
+actions."""
+
+# Python imports
+import threading
+from datetime import timedelta
+from unittest import skip, skipUnless  # noqa
+
+# Django imports
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.db import connection
+from django.test import TransactionTestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import six, timezone
+
+# app imports
+from miniuser import jobs
+from miniuser.cache import get_cache
+from miniuser.models import MiniUser
+
+# app imports
+from .utils.testcases import MiniuserTestCase
+
+
+@tag('jobs')
+class ChunkTest(MiniuserTestCase):
+    """Tests targeting the chunked processing"""
+
+    @classmethod
+    def setUpTestData(cls):
+        MiniUser.objects.bulk_create(MiniUser(username='user{}'.format(i)) for i in range(7))
+
+    def test_chunks(self):
+        """The pks are yielded in ascending chunks"""
+
+        pks = sorted(MiniUser.objects.values_list('pk', flat=True))
+        chunks = list(jobs.iter_pk_chunks(MiniUser.objects.order_by('-username'), 3))
+        self.assertEqual(chunks, [pks[:3], pks[3:6], pks[6:]])
+
+    def test_process_in_chunks(self):
+        """Updated users, that no longer match the selection, do not shift the chunks"""
+
+        def update(pks):
+            return MiniUser.objects.filter(pk__in=pks).update(is_active=True)
+
+        progress = []
+        updated = jobs.process_in_chunks(MiniUser.objects.filter(is_active=False), update, 3, progress.append)
+
+        self.assertEqual(updated, 7)
+        self.assertFalse(MiniUser.objects.filter(is_active=False).exists())
+        self.assertEqual(progress, [3, 6, 7])
+
+    def test_chunks_by_key(self):
+        """The chunks may be ordered by another column, even if its values are not unique"""
+
+        now = timezone.now()
+        users = MiniUser.objects.order_by('pk')
+        for i, pk in enumerate(users.values_list('pk', flat=True)):
+            users.filter(pk=pk).update(last_login=now - timedelta(days=i // 2))
+
+        expected = list(users.order_by('last_login', 'pk').values_list('pk', flat=True))
+        chunks = list(jobs.iter_pk_chunks(users, 3, key='last_login'))
+        self.assertEqual(chunks, [expected[:3], expected[3:6], expected[6:]])
+
+    @skipUnless(connection.vendor == 'sqlite', "The query plan is checked on SQLite")
+    def test_chunks_by_key_use_index(self):
+        """The chunks of a range query seek on the index of the range (see miniuser_prune)"""
+
+        queryset = MiniUser.objects.filter(is_active=False, registration_date__lt=timezone.now())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(list(jobs.iter_pk_chunks(queryset, 3, key='registration_date'))), 3)
+
+        for query in queries:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            six.assertRegex(self, plan, r'USING (COVERING )?INDEX miniuser_registration_idx')
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+@tag('jobs', 'admin')
+class BackgroundJobTest(TransactionTestCase):
+    """Tests targeting the background jobs
+
+    The jobs run in another thread, which does not see the data of an
+    uncommitted test transaction."""
+
+    def setUp(self):
+        get_cache().clear()
+        self.superuser = MiniUser.objects.create_superuser('django', 'django@localhost', 'django')
+        MiniUser.objects.bulk_create(MiniUser(username='user{}'.format(i)) for i in range(5))
+        self.client.force_login(self.superuser)
+
+    def wait_for_jobs(self):
+        # the jobs are executed one after another, so this waits for all jobs
+        jobs.get_executor().submit(lambda: None).result()
+
+    def test_job(self):
+        """The progress of a job is reported to its owner only"""
+
+        job_id, future = jobs.start_job(
+            1, 'Test', 6, MiniUser.objects.update_status, MiniUser.objects.all(), {'is_staff': True}
+        )
+        future.result()
+
+        self.assertEqual(MiniUser.objects.filter(is_staff=True).count(), 6)
+        self.assertEqual(jobs.pop_jobs(2), [])
+        self.assertEqual(jobs.pop_jobs(1), [
+            {'description': 'Test', 'processed': 6, 'total': 6, 'finished': True, 'failed': False}
+        ])
+        # finished jobs are reported once
+        self.assertEqual(jobs.pop_jobs(1), [])
+
+    def test_failed_job(self):
+        """Exceptions mark the job as failed"""
+
+        job_id, future = jobs.start_job(
+            1, 'Test', 6, MiniUser.objects.update_status, MiniUser.objects.all(), {'foo': True}
+        )
+        with self.assertRaises(ValueError):
+            future.result()
+        self.assertTrue(jobs.get_job(job_id)['failed'])
+
+    def test_interleaved_jobs(self):
+        """Jobs, that are started while pop_jobs() runs, are not dropped"""
+
+        release = threading.Event()
+        first_id, first = jobs.start_job(1, 'First', 0, lambda progress: release.wait(5))
+
+        # pop_jobs() pauses in another thread after reading the list of jobs
+        popping = None
+        paused = threading.Event()
+        resume = threading.Event()
+        get_job = jobs.get_job
+
+        def pausing_get_job(job_id):
+            if threading.current_thread() is popping:
+                paused.set()
+                resume.wait(5)
+            return get_job(job_id)
+
+        popped = []
+        jobs.get_job = pausing_get_job
+        try:
+            popping = threading.Thread(target=lambda: popped.extend(jobs.pop_jobs(1)))
+            popping.start()
+            self.assertTrue(paused.wait(5))
+
+            starting = threading.Thread(target=jobs.start_job, args=(1, 'Second', 0, lambda progress: None))
+            starting.start()
+            starting.join(0.2)
+            resume.set()
+            popping.join(5)
+            starting.join(5)
+        finally:
+            jobs.get_job = get_job
+            release.set()
+        first.result()
+        self.wait_for_jobs()
+
+        self.assertEqual([job['description'] for job in popped], ['First'])
+        self.assertEqual([job['description'] for job in jobs.pop_jobs(1)], ['First', 'Second'])
+
+    @override_settings(MINIUSER_ADMIN_BACKGROUND_THRESHOLD=3, MINIUSER_ADMIN_ACTION_CHUNK_SIZE=2)
+    def test_admin_action(self):
+        """Large selections are activated in the background"""
+
+        url = reverse('admin:miniuser_miniuser_changelist')
+        self.client.post(url, {
+            ACTION_CHECKBOX_NAME: list(MiniUser.objects.filter(is_active=False).values_list('pk', flat=True)),
+            'action': 'action_activate_user',
+        })
+        self.wait_for_jobs()
+
+        self.assertFalse(MiniUser.objects.filter(is_active=False).exists())
+        messages = [str(message) for message in self.client.get(url).context['messages']]
+        self.assertEqual(messages, [
+            'Activation of users: 5 users are processed in the background.',
+            'Activation of users finished: 5 users processed.',
+        ])
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Tests for the coalesced updates of the last login
+
+These tests target the code in miniuser/last_login.py and the app's
+user_logged_in receiver."""
+
+# Python imports
+from datetime import timedelta
+from unittest import skip  # noqa
+
+# Django imports
+from django.contrib.auth import models as auth_models
+from django.contrib.auth.signals import user_logged_in
+from django.db import DatabaseError, connection
+from django.test import override_settings, tag
+from django.test.utils import CaptureQueriesContext, patch_logger
+from django.utils import timezone
+
+# app imports
+from miniuser import cache, last_login, signals
+from miniuser.backends import MiniUserBackend
+from miniuser.models import MiniUser
+
+# app imports
+from .utils.testcases import MiniuserTestCase
+
+
+@tag('last_login')
+@override_settings(MINIUSER_LAST_LOGIN_FLUSH_INTERVAL=3600, MINIUSER_LAST_LOGIN_FLUSH_THRESHOLD=3)
+class LastLoginTest(MiniuserTestCase):
+    """Tests targeting the replacement of Django's update_last_login()"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            MiniUser.objects.create_user('user{}'.format(i), email='user{}@localhost'.format(i)) for i in range(3)
+        ]
+
+    def setUp(self):
+        last_login.buffer.timestamps.clear()
+
+    def login(self, user):
+        user_logged_in.send(sender=user.__class__, request=None, user=user)
+
+    def stored(self, user):
+        return MiniUser.objects.get(pk=user.pk).last_login
+
+    def test_update_last_login_replaced(self):
+        """Only the app's receiver is connected"""
+
+        receivers = [receiver() for key, receiver in user_logged_in.receivers]
+        self.assertIn(signals.update_last_login, receivers)
+        self.assertNotIn(auth_models.update_last_login, receivers)
+
+    def test_update_last_login(self):
+        """By default, every login is written at once"""
+
+        user = self.users[0]
+        self.login(user)
+        self.assertEqual(self.stored(user), user.last_login)
+
+    @override_settings(MINIUSER_LAST_LOGIN_GRANULARITY=5)
+    def test_granularity(self):
+        """Logins within the granularity are not written"""
+
+        user = self.users[0]
+        self.login(user)
+        first = self.stored(user)
+
+        with self.assertNumQueries(0):
+            self.login(user)
+        self.assertEqual(self.stored(user), first)
+
+        user.last_login = timezone.now() - timedelta(minutes=10)
+        with self.assertNumQueries(1):
+            self.login(user)
+        self.assertGreater(self.stored(user), first)
+
+    @override_settings(MINIUSER_LAST_LOGIN_BUFFER=True)
+    def test_buffer(self):
+        """Buffered logins are written by a single query, once the threshold is reached"""
+
+        with self.assertNumQueries(0):
+            self.login(self.users[0])
+            self.login(self.users[1])
+            # the same user is only buffered once
+            self.login(self.users[1])
+        self.assertEqual(len(last_login.buffer), 2)
+        self.assertNotEqual(self.stored(self.users[0]), self.users[0].last_login)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.login(self.users[2])
+        # the UPDATE is wrapped in a savepoint
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 1)
+        self.assertEqual(len(last_login.buffer), 0)
+        for user in self.users:
+            self.assertEqual(self.stored(user), user.last_login)
+
+    @override_settings(MINIUSER_LAST_LOGIN_BUFFER=True)
+    def test_flush(self):
+        """The buffer may be flushed explicitly"""
+
+        self.login(self.users[0])
+        self.assertEqual(last_login.buffer.flush(), 1)
+        self.assertEqual(self.stored(self.users[0]), self.users[0].last_login)
+        with self.assertNumQueries(0):
+            self.assertEqual(last_login.buffer.flush(), 0)
+
+    @override_settings(MINIUSER_LAST_LOGIN_BUFFER=True, MINIUSER_USER_CACHE=True)
+    def test_flush_invalidates_user_cache(self):
+        """The flush invalidates the cached instances of the users"""
+
+        cache.get_cache().clear()
+        MiniUser.objects.filter(pk=self.users[0].pk).update(is_active=True)
+        backend = MiniUserBackend()
+        user = backend.get_user(self.users[0].pk)
+
+        self.login(user)
+        last_login.buffer.flush()
+        self.assertEqual(backend.get_user(user.pk).last_login, user.last_login)
+
+    @override_settings(MINIUSER_LAST_LOGIN_BUFFER=True, MINIUSER_LAST_LOGIN_FLUSH_THRESHOLD=1)
+    def test_failed_flush(self):
+        """Database errors are logged and the buffered logins are kept for the next flush"""
+
+        def fail(*args, **kwargs):
+            raise DatabaseError('database is gone')
+
+        MiniUser.objects.update_last_logins = fail
+        try:
+            with patch_logger('miniuser.last_login', 'exception') as calls:
+                self.login(self.users[0])
+        finally:
+            del MiniUser.objects.update_last_logins
+        self.assertEqual(calls, ['Could not write the last logins of 1 users'])
+        self.assertEqual(len(last_login.buffer), 1)
+        self.assertNotEqual(self.stored(self.users[0]), self.users[0].last_login)
+
+        # the database is still usable and the next flush writes the login
+        self.assertEqual(last_login.buffer.flush(), 1)
+        self.assertEqual(self.stored(self.users[0]), self.users[0].last_login)
+
+    def test_update_last_logins(self):
+        """The timestamps of many users are written in batches"""
+
+        now = timezone.now()
+        timestamps = {user.pk: now - timedelta(days=i) for i, user in enumerate(self.users)}
+        with self.assertNumQueries(2):
+            self.assertEqual(MiniUser.objects.update_last_logins(timestamps, batch_size=2), 3)
+        for user in self.users:
+            self.assertEqual(self.stored(user), timestamps[user.pk])
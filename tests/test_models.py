@@ -4,14 +4,21 @@
 These tests target the code in miniuser/models.py."""
 
 # Python imports
-from unittest import skip  # noqa
+from unittest import skip, skipUnless  # noqa
 
 # Django imports
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission
+from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import override_settings, tag
+from django.test.utils import CaptureQueriesContext
 
 # app imports
+from miniuser import cache
 from miniuser.exceptions import MiniUserConfigurationException
 from miniuser.models import MiniUser
+from miniuser.signals import status_updated
 
 # app imports
 from .utils.testcases import MiniuserTestCase
@@ -123,6 +130,75 @@ class MiniUserManagerTest(MiniuserTestCase):
         self.assertTrue(m.is_staff)
         self.assertTrue(m.is_superuser)
 
+    @tag('miniuser_settings')
+    @override_settings(MINIUSER_DEFAULT_ACTIVE=True, MINIUSER_REQUIRE_VALID_EMAIL=False)
+    def test_bulk_create_users(self):
+        """Users are created in batches, applying the same rules as create_user()"""
+
+        users = ({'username': 'user{}'.format(i), 'email': 'User{}@BAR.com'.format(i)} for i in range(5))
+        with CaptureQueriesContext(connection) as ctx:
+            created, errors = MiniUser.objects.bulk_create_users(users, batch_size=2)
+        self.assertEqual((created, errors), (5, []))
+        # one INSERT per batch
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]), 3)
+
+        m = MiniUser.objects.get(username='user0')
+        self.assertEqual(m.email, 'user0@bar.com')
+        self.assertEqual(m.email_normalized, 'user0@bar.com')
+        self.assertFalse(m.has_usable_password())
+        self.assertFalse(m.is_active)
+
+        created, errors = MiniUser.objects.bulk_create_users([
+            {'username': 'foo', 'password': 'foo', 'first_name': 'Foo'},
+            {'username': 'bar', 'password': 'bar'},
+        ])
+        self.assertEqual((created, errors), (2, []))
+        m = MiniUser.objects.get(username='foo')
+        self.assertTrue(m.check_password('foo'))
+        self.assertTrue(m.is_active)
+        self.assertEqual(m.first_name, 'Foo')
+        self.assertEqual(m.email, None)
+
+    @tag('miniuser_settings')
+    @override_settings(MINIUSER_REQUIRE_VALID_EMAIL=True, MINIUSER_DEFAULT_ACTIVE=False)
+    def test_bulk_create_users_errors(self):
+        """Invalid users and duplicates are reported per row"""
+
+        MiniUser.objects.create_user('foo', email='foo@bar.com')
+
+        created, errors = MiniUser.objects.bulk_create_users([
+            {'username': 'FOO', 'email': 'foo2@bar.com'},
+            {'username': 'bar', 'email': 'FOO@bar.com'},
+            {'username': 'baz', 'email': 'baz@bar.com'},
+            {'username': 'Baz', 'email': 'baz2@bar.com'},
+            {'username': 'qux'},
+            {'email': 'qux@bar.com'},
+        ])
+        self.assertEqual(created, 1)
+        self.assertEqual([index for index, message in errors], [4, 5, 0, 1, 3])
+        self.assertEqual(errors[0][1], 'The email address must be set!')
+        self.assertEqual(errors[2][1], 'A user with that username already exists...')
+        self.assertEqual(errors[3][1], 'This mail address is already in use....')
+
+    @tag('miniuser_settings')
+    @override_settings(MINIUSER_DEFAULT_ACTIVE=True, MINIUSER_REQUIRE_VALID_EMAIL=False)
+    def test_bulk_create_users_hash_workers(self):
+        """Passwords are hashed by a process pool, if hash_workers is given"""
+
+        users = [{'username': 'user{}'.format(i), 'password': 'pw{}'.format(i)} for i in range(5)]
+        users.append({'username': 'nopassword'})
+        users.append({'username': 'encoded', 'encoded_password': make_password('foo')})
+
+        created, errors = MiniUser.objects.bulk_create_users(users, batch_size=2, hash_workers=2)
+        self.assertEqual((created, errors), (7, []))
+
+        for i in range(5):
+            m = MiniUser.objects.get(username='user{}'.format(i))
+            self.assertTrue(m.check_password('pw{}'.format(i)))
+            self.assertTrue(m.is_active)
+        self.assertFalse(MiniUser.objects.get(username='nopassword').is_active)
+        self.assertTrue(MiniUser.objects.get(username='encoded').check_password('foo'))
+
     @tag('miniuser_settings')
     @override_settings(MINIUSER_LOGIN_NAME='username')
     def test_natural_key_username(self):
@@ -156,6 +232,51 @@ class MiniUserManagerTest(MiniuserTestCase):
         m = MiniUser.objects.create_user(username='foo', email='foo@bar.com')
         self.assertEqual(m, MiniUser.objects.get_by_natural_key('foo'))
         self.assertEqual(m, MiniUser.objects.get_by_natural_key('foo@bar.com'))
+        with self.assertRaises(MiniUser.DoesNotExist):
+            n = MiniUser.objects.get_by_natural_key('bar') # noqa
+
+    @tag('miniuser_settings')
+    @override_settings(MINIUSER_LOGIN_NAME='both')
+    def test_natural_key_both_username_wins(self):
+        """A matching username takes precedence over a matching email address
+
+        Both candidates are retrieved with one single query."""
+        m = MiniUser.objects.create_user(username='foo', email='foo@bar.com')
+        n = MiniUser.objects.create_user(username='foo@bar.com', email='bar@bar.com')
+        with self.assertNumQueries(1):
+            self.assertEqual(n, MiniUser.objects.get_by_natural_key('FOO@bar.com'))
+        with self.assertNumQueries(1):
+            self.assertEqual(m, MiniUser.objects.get_by_natural_key('Foo'))
+
+    @skipUnless(connection.vendor == 'sqlite', "The query plan is checked on SQLite")
+    def test_natural_key_uses_index(self):
+        """The lookups of all modes are served by the indexes of the normalized login names"""
+
+        MiniUser.objects.create_user(username='foo', email='foo@bar.com')
+
+        for mode in ('username', 'email', 'both'):
+            with self.settings(MINIUSER_LOGIN_NAME=mode), CaptureQueriesContext(connection) as queries:
+                MiniUser.objects.get_by_natural_key('foo@bar.com' if mode == 'email' else 'foo')
+
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql'])
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            self.assertIn('USING INDEX', plan, mode)
+            self.assertNotIn('SCAN', plan, mode)
+
+    def test_natural_key_empty(self):
+        """Empty login names never match, not even the users without email address"""
+
+        MiniUser.objects.bulk_create_users([{'username': 'foo'}, {'username': 'bar'}])
+        self.assertEqual(MiniUser.objects.filter(email_normalized__isnull=True).count(), 2)
+
+        for mode in ('username', 'email', 'both'):
+            for cached in (False, True):
+                settings = {'MINIUSER_LOGIN_NAME': mode, 'MINIUSER_NATURAL_KEY_CACHE': cached}
+                for login_name in ('', None):
+                    with self.settings(**settings), self.assertNumQueries(0):
+                        with self.assertRaises(MiniUser.DoesNotExist):
+                            MiniUser.objects.get_by_natural_key(login_name)
 
     @tag('miniuser_settings')
     @override_settings(MINIUSER_LOGIN_NAME='foo')
@@ -170,6 +291,74 @@ class MiniUserManagerTest(MiniuserTestCase):
         with self.assertRaisesMessage(MiniUserConfigurationException, "'MINIUSER_LOGIN_NAME' has an undefined value!"):
             n = MiniUser.objects.get_by_natural_key('foo') # noqa
 
+    def test_update_status(self):
+        """Status flags are updated in batches, sending one signal per batch"""
+
+        users = [MiniUser.objects.create_user('user{}'.format(i), 'user{}@localhost'.format(i)) for i in range(5)]
+        received = []
+
+        def receiver(sender, pks, flags, **kwargs):
+            received.append((list(pks), flags))
+
+        status_updated.connect(receiver, sender=MiniUser)
+        try:
+            updated = MiniUser.objects.update_status(
+                MiniUser.objects.filter(pk__in=[u.pk for u in users]), {'is_staff': True}, batch_size=2
+            )
+        finally:
+            status_updated.disconnect(receiver, sender=MiniUser)
+
+        self.assertEqual(updated, 5)
+        self.assertEqual(MiniUser.objects.filter(is_staff=True).count(), 5)
+        self.assertEqual(received, [
+            ([users[0].pk, users[1].pk], {'is_staff': True}),
+            ([users[2].pk, users[3].pk], {'is_staff': True}),
+            ([users[4].pk], {'is_staff': True}),
+        ])
+
+        with self.assertRaisesMessage(ValueError, 'Not a status flag: username'):
+            MiniUser.objects.update_status(MiniUser.objects.all(), {'username': 'foo'})
+
+    @override_settings(MINIUSER_USER_CACHE=True)
+    def test_set_active_invalidates_user_cache(self):
+        """Cached instances are invalidated by status_updated"""
+
+        u = MiniUser.objects.create_user('foo', is_active=True)
+        cache.set_user(u, cache.get_user(u.pk)[1])
+        self.assertEqual(cache.get_user(u.pk)[0], u)
+        MiniUser.objects.set_active(MiniUser.objects.filter(pk=u.pk), False)
+        self.assertFalse(cache.get_user(u.pk)[0])
+
+    def test_delete_users(self):
+        """Users are deleted in batches, including their many-to-many relations"""
+
+        group = Group.objects.create(name='group')
+        permission = Permission.objects.first()
+        users = [MiniUser.objects.create_user('user{}'.format(i), 'user{}@localhost'.format(i)) for i in range(5)]
+        for u in users:
+            u.groups.add(group)
+            u.user_permissions.add(permission)
+        keep = MiniUser.objects.create_user('keep', 'keep@localhost')
+        keep.groups.add(group)
+
+        progress = []
+        with CaptureQueriesContext(connection) as queries:
+            deleted = MiniUser.objects.delete_users(
+                MiniUser.objects.exclude(pk=keep.pk), batch_size=2, progress=progress.append
+            )
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertEqual(list(MiniUser.objects.all()), [keep])
+        self.assertEqual(list(MiniUser.objects.filter(groups=group)), [keep])
+        self.assertFalse(MiniUser.user_permissions.through.objects.exists())
+
+        through_deletes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('DELETE FROM "miniuser_miniuser_groups"')
+        ]
+        self.assertTrue(through_deletes)
+
 
 @tag('model')
 class MiniUserModelTest(MiniuserTestCase):
@@ -180,3 +369,35 @@ class MiniUserModelTest(MiniuserTestCase):
         m = MiniUser.objects.create(username='django')
         self.assertTrue(isinstance(m, MiniUser))
         self.assertEqual(m.__str__(), m.username)
+
+    def test_normalized_login_names(self):
+        """The normalized login names are maintained on save()"""
+        m = MiniUser.objects.create(username='DjAngo', email='Django@LOCALHOST')
+        self.assertEqual(m.username_normalized, 'django')
+        self.assertEqual(m.email_normalized, 'django@localhost')
+
+        m.username = 'Flask'
+        m.email = ''
+        m.save(update_fields=['username', 'email'])
+        m.refresh_from_db()
+        self.assertEqual(m.username_normalized, 'flask')
+        self.assertEqual(m.email_normalized, None)
+
+    def test_normalized_login_names_bulk_create(self):
+        """The normalized login names are maintained by bulk_create()"""
+        MiniUser.objects.bulk_create([MiniUser(username='Foo'), MiniUser(username='BAR', email='Bar@Baz.com')])
+        self.assertEqual(
+            sorted(MiniUser.objects.values_list('username_normalized', 'email_normalized')),
+            [('bar', 'bar@baz.com'), ('foo', None)]
+        )
+
+    def test_validate_unique_normalized(self):
+        """Usernames and email addresses, that only differ by case, are rejected"""
+        MiniUser.objects.create(username='django', email='django@localhost')
+
+        m = MiniUser(username='Django', email='DJANGO@localhost')
+        with self.assertRaises(ValidationError) as cm:
+            m.validate_unique()
+        self.assertEqual(sorted(cm.exception.message_dict), ['email', 'username'])
+
+        MiniUser(username='flask', email='flask@localhost').validate_unique()
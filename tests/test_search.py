@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""django-miniuser: Tests for the search strategies
+
+These tests target the code in miniuser/search.py and the
+miniuser_search_index management command."""
+
+# Python imports
+from unittest import skip, skipUnless  # noqa
+
+# Django imports
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings, tag
+from django.urls import reverse
+from django.utils.six import StringIO
+
+# app imports
+from miniuser import search
+from miniuser.models import MiniUser
+
+# app imports
+from .utils.testcases import MiniuserTestCase
+
+
+class SearchTestCase(MiniuserTestCase):
+    """Provides some users and a search through the admin's list view"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = MiniUser.objects.create_superuser('django', 'django@localhost', 'django')
+        MiniUser.objects.create_user('Alice', email='alice@example.com', first_name='Wonder')
+        MiniUser.objects.create_user('alfred', email='butler@example.org')
+        MiniUser.objects.create_user('bob', email='bob@alpha.com', last_name='Builder')
+
+    def admin_search(self, term):
+        self.client.force_login(self.superuser)
+        response = self.client.get(reverse('admin:miniuser_miniuser_changelist'), {'q': term})
+        return sorted(u.username for u in response.context['cl'].result_list)
+
+
+@tag('search')
+@override_settings(MINIUSER_ADMIN_SEARCH_MODE='prefix')
+class PrefixSearchTest(SearchTestCase):
+    """Tests targeting the 'prefix' mode"""
+
+    def test_prefix(self):
+        """Usernames and email addresses are matched by prefix, case insensitive"""
+
+        self.assertEqual(self.admin_search('AL'), ['Alice', 'alfred'])
+        self.assertEqual(self.admin_search('butler@'), ['alfred'])
+        self.assertEqual(self.admin_search('al bu'), ['alfred'])
+        # no substrings, first or last names
+        self.assertEqual(self.admin_search('lice'), [])
+        self.assertEqual(self.admin_search('Wonder'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Inspects the query plans of SQLite')
+    def test_index_usage(self):
+        """The prefixes are looked up in the indexes of the normalized login names"""
+
+        sql, params = search.prefix_search(MiniUser.objects.all(), 'al').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertNotIn('SCAN miniuser_miniuser', plan.replace('TABLE ', ''))
+
+
+@tag('search')
+@override_settings(MINIUSER_ADMIN_SEARCH_MODE='fts5')
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 requires SQLite')
+class FTS5SearchTest(SearchTestCase):
+    """Tests targeting the 'fts5' mode"""
+
+    def setUp(self):
+        call_command('miniuser_search_index', stdout=StringIO())
+
+    def tearDown(self):
+        call_command('miniuser_search_index', '--drop', stdout=StringIO())
+
+    def test_search(self):
+        """Words of all searched fields are matched by prefix"""
+
+        self.assertEqual(self.admin_search('al'), ['Alice', 'alfred', 'bob'])
+        self.assertEqual(self.admin_search('wond'), ['Alice'])
+        self.assertEqual(self.admin_search('bob@alpha'), ['bob'])
+        self.assertEqual(self.admin_search('exam butl'), ['alfred'])
+
+    def test_triggers(self):
+        """The search index is maintained by triggers"""
+
+        u = MiniUser.objects.create_user('carol', email='carol@example.net')
+        self.assertEqual(self.admin_search('carol'), ['carol'])
+
+        u.username = 'caroline'
+        u.email = 'caroline@example.net'
+        u.save()
+        self.assertEqual(self.admin_search('caroline'), ['caroline'])
+
+        u.delete()
+        self.assertEqual(self.admin_search('carol'), [])
+
+
+@tag('search', 'commands')
+class SearchIndexCommandTest(MiniuserTestCase):
+    """Tests targeting the miniuser_search_index command"""
+
+    def test_no_index_required(self):
+        """The default search does not need any index"""
+
+        with self.assertRaisesMessage(CommandError, "does not require a search index"):
+            call_command('miniuser_search_index')
+
+    @skipUnless(connection.vendor != 'postgresql', 'Requires a database other than PostgreSQL')
+    def test_unsupported_database(self):
+        """Trigram indexes require PostgreSQL"""
+
+        with self.assertRaisesMessage(CommandError, "is not supported"):
+            call_command('miniuser_search_index', '--mode', 'trigram')
@@ -24,3 +24,7 @@ class MiniUserUrlsTest(MiniuserTestCase):
     def test_logout_url(self):
         """Does reverse() return the right url?"""
         self.assertEqual('/logout/', reverse('miniuser:logout'))
+
+    def test_autocomplete_url(self):
+        """Does reverse() return the right url?"""
+        self.assertEqual('/autocomplete/', reverse('miniuser:autocomplete'))